@@ -29,8 +29,12 @@ def create_access_token(data: dict):
 oauth2_scheme = HTTPBearer()
 
 def get_current_user(token: HTTPAuthorizationCredentials = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+    return get_user_from_token(token.credentials, db)
+
+def get_user_from_token(token: str, db: Session):
+    """JWT 문자열로 사용자를 조회합니다. (헤더를 쓸 수 없는 WebSocket에서도 사용)"""
     try:
-        payload = jwt.decode(token.credentials, SECRET_KEY, algorithms=[ALGORITHM])
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         email: str = payload.get("sub")  # username → email
         if email is None:
             raise HTTPException(status_code=401, detail="Invalid token")
@@ -0,0 +1,198 @@
+# app/blobstore.py
+"""
+음성 바이너리용 블롭 저장소 (claim-check)
+
+Celery 메시지/결과 백엔드에는 음성 바이트 대신 짧은 참조 키만 싣습니다.
+바이트는 한 번만 저장소에 쓰고, 다음 작업이나 클라이언트가 키로 꺼내 갑니다.
+
+BLOB_STORE_BACKEND
+- local: BLOB_LOCAL_DIR 아래 파일 (API/워커가 같은 볼륨을 공유하는 개발 환경)
+- redis: BLOB_REDIS_URL에 TTL과 함께 저장
+- s3: S3_BUCKET_NAME의 BLOB_S3_PREFIX 아래 (만료는 버킷 수명 주기 규칙으로 관리)
+
+키 형식: {kind}/{32자리 hex}{확장자}  예) voice-in/3f2a...c1.webm
+"""
+import logging
+import mimetypes
+import os
+import re
+import threading
+import time
+import uuid
+
+from app.clients import REDIS_URL, get_redis
+
+logger = logging.getLogger(__name__)
+
+BLOB_STORE_BACKEND = os.getenv("BLOB_STORE_BACKEND", "local")
+BLOB_TTL_SECONDS = int(os.getenv("BLOB_TTL_SECONDS", "3600"))
+BLOB_LOCAL_DIR = os.getenv("BLOB_LOCAL_DIR", "data/blobs")
+BLOB_REDIS_URL = os.getenv("BLOB_REDIS_URL", REDIS_URL)
+BLOB_S3_PREFIX = os.getenv("BLOB_S3_PREFIX", "blobs")
+BLOB_CHUNK_SIZE = 64 * 1024
+
+_KEY_PATTERN = re.compile(r"^[a-z0-9-]+/[0-9a-f]{32}(\.[a-z0-9]{1,5})?$")
+
+
+def is_valid_key(key: str) -> bool:
+    """외부에서 받은 키가 저장소가 만든 형식인지 확인합니다. (경로 조작 방지)"""
+    return bool(key) and _KEY_PATTERN.match(key) is not None
+
+
+def new_key(kind: str, suffix: str = "") -> str:
+    return f"{kind}/{uuid.uuid4().hex}{suffix.lower()}"
+
+
+def content_type_for(key: str) -> str:
+    return mimetypes.guess_type(key)[0] or "application/octet-stream"
+
+
+class LocalBlobStore:
+    # 만료 파일 정리는 put 시점에 이 간격으로만 수행합니다.
+    SWEEP_INTERVAL = 600
+
+    def __init__(self, root: str = BLOB_LOCAL_DIR, ttl: int = BLOB_TTL_SECONDS):
+        self.root = root
+        self.ttl = ttl
+        self._swept_at = 0.0
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.root, *key.split("/"))
+
+    def put(self, key: str, data: bytes):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        self._sweep()
+
+    def get(self, key: str):
+        try:
+            with open(self._path(key), "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def exists(self, key: str) -> bool:
+        return os.path.exists(self._path(key))
+
+    def iter_chunks(self, key: str):
+        with open(self._path(key), "rb") as f:
+            while chunk := f.read(BLOB_CHUNK_SIZE):
+                yield chunk
+
+    def delete(self, key: str):
+        try:
+            os.remove(self._path(key))
+        except FileNotFoundError:
+            pass
+
+    def _sweep(self):
+        now = time.time()
+        if now - self._swept_at < self.SWEEP_INTERVAL:
+            return
+        self._swept_at = now
+        for dirpath, _, filenames in os.walk(self.root):
+            for name in filenames:
+                path = os.path.join(dirpath, name)
+                try:
+                    if now - os.path.getmtime(path) > self.ttl:
+                        os.remove(path)
+                except OSError:
+                    pass
+
+
+class RedisBlobStore:
+    def __init__(self, url: str = BLOB_REDIS_URL, ttl: int = BLOB_TTL_SECONDS):
+        self.client = get_redis(url)
+        self.ttl = ttl
+
+    def put(self, key: str, data: bytes):
+        self.client.set(f"blob:{key}", data, ex=self.ttl)
+
+    def get(self, key: str):
+        return self.client.get(f"blob:{key}")
+
+    def exists(self, key: str) -> bool:
+        return bool(self.client.exists(f"blob:{key}"))
+
+    def iter_chunks(self, key: str):
+        # 값 전체를 한 번에 읽지 않고 GETRANGE로 나눠 보냅니다.
+        offset = 0
+        while True:
+            chunk = self.client.getrange(f"blob:{key}", offset, offset + BLOB_CHUNK_SIZE - 1)
+            if not chunk:
+                return
+            yield chunk
+            offset += len(chunk)
+
+    def delete(self, key: str):
+        self.client.delete(f"blob:{key}")
+
+
+class S3BlobStore:
+    def __init__(self, bucket: str = None, prefix: str = BLOB_S3_PREFIX):
+        import boto3
+
+        self.bucket = bucket or os.getenv("S3_BUCKET_NAME")
+        self.prefix = prefix
+        self.client = boto3.client(
+            "s3",
+            aws_access_key_id=os.getenv("AWS_ACCESS_KEY_ID"),
+            aws_secret_access_key=os.getenv("AWS_SECRET_ACCESS_KEY"),
+            region_name=os.getenv("AWS_REGION", "ap-northeast-2"),
+        )
+
+    def _object_key(self, key: str) -> str:
+        return f"{self.prefix}/{key}"
+
+    def put(self, key: str, data: bytes):
+        self.client.put_object(
+            Bucket=self.bucket, Key=self._object_key(key), Body=data, ContentType=content_type_for(key)
+        )
+
+    def get(self, key: str):
+        try:
+            return self.client.get_object(Bucket=self.bucket, Key=self._object_key(key))["Body"].read()
+        except self.client.exceptions.NoSuchKey:
+            return None
+
+    def exists(self, key: str) -> bool:
+        try:
+            self.client.head_object(Bucket=self.bucket, Key=self._object_key(key))
+            return True
+        except Exception:
+            return False
+
+    def iter_chunks(self, key: str):
+        body = self.client.get_object(Bucket=self.bucket, Key=self._object_key(key))["Body"]
+        yield from body.iter_chunks(BLOB_CHUNK_SIZE)
+
+    def delete(self, key: str):
+        self.client.delete_object(Bucket=self.bucket, Key=self._object_key(key))
+
+
+_BACKENDS = {"local": LocalBlobStore, "redis": RedisBlobStore, "s3": S3BlobStore}
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_blob_store():
+    """BLOB_STORE_BACKEND 설정에 따른 공용 저장소"""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = _BACKENDS[BLOB_STORE_BACKEND]()
+                logger.info(f"블롭 저장소: {BLOB_STORE_BACKEND}")
+    return _store
+
+
+def put_blob(kind: str, data: bytes, suffix: str = "") -> str:
+    """바이트를 저장하고 참조 키를 반환합니다."""
+    key = new_key(kind, suffix)
+    get_blob_store().put(key, data)
+    return key
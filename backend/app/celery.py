@@ -14,4 +14,10 @@ celery_app.conf.update(
     result_serializer='json',
     timezone='Asia/Seoul',
     enable_utc=True,
+    # 결과에는 참조 키만 담기므로 작게 유지되며, 클라이언트가 가져갈 시간만큼만 보관합니다.
+    result_expires=int(os.getenv("CELERY_RESULT_EXPIRES", "3600")),
+    # 음성 체인처럼 네트워크 대기가 대부분인 작업은 CELERY_WORKER_POOL=threads로
+    # 프로세스 하나에서 여러 태스크를 동시에 처리할 수 있습니다. (동시 실행 수: CELERY_WORKER_CONCURRENCY)
+    worker_pool=os.getenv("CELERY_WORKER_POOL", "prefork"),
+    worker_concurrency=int(os.getenv("CELERY_WORKER_CONCURRENCY", str(os.cpu_count() or 1))),
 )
\ No newline at end of file
@@ -1,32 +1,57 @@
 #app/chat/api.py
 
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form, Query, WebSocket, status
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+from fastapi.responses import StreamingResponse
 from sse_starlette.sse import EventSourceResponse
 import asyncio
+import base64
 import json
+import logging
+import os
+import uuid
+from typing import Optional
 from celery.result import AsyncResult
 
-from app.database import get_db
-from app.auth.utils import get_current_user
+from app.database import get_db, get_async_db, session_scope
+from app.auth.utils import get_current_user, get_user_from_token
 from app.auth.models import User
 from app.chat.schemas import (
     ChatRequest, ChatResponse, ChatLogResponse,
     CreateChatRequest, CreateChatResponse, EvaluateChatResponse, VoiceChatResponse
 )
-from app.chat.models import RoleEnum, Chat
+from app.chat.models import RoleEnum, Chat, ChatLog
 from app.chat.service import (
-    chat_with_ai, evaluate_and_save_chat_result,
+    chat_with_ai, request_evaluation, wait_for_evaluation,
     get_chat_logs_by_report_id, get_chat_logs
 )
-from app.chat.crud import save_chat_log
-from app.chat.stream_handler import get_streaming_chain
+from app.chat.stream_handler import stream_turn
+from app.chat.voice_session import VoiceSession
+from app.chat.state import INITIAL_GREETING, init_chat_state
 from app.report.models import Report
 from app.celery import celery_app
+from app.blobstore import content_type_for, get_blob_store, is_valid_key, put_blob
+from app.cache import LRUCache
+from app.chat.task_events import iter_events
 
 
 router = APIRouter(tags=["Chat"])
 
+# 채팅 로그 페이지 크기 (after/before만 주었을 때의 기본 / 최대)
+CHAT_LOG_PAGE_SIZE = int(os.getenv("CHAT_LOG_PAGE_SIZE", "100"))
+CHAT_LOG_MAX_PAGE_SIZE = 500
+
+# 끝난(SUCCESS/FAILURE/REVOKED) 음성 작업 상태는 바뀌지 않으므로 결과 만료 시간 동안 캐시합니다.
+_terminal_task_status = LRUCache(maxsize=2048, ttl=int(os.getenv("CELERY_RESULT_EXPIRES", "3600")))
+
+
+def page_limit(after: Optional[int], before: Optional[int], limit: Optional[int]) -> Optional[int]:
+    """커서만 주면 기본 페이지 크기, 아무것도 주지 않으면 None(전체 로그, 기존 동작)"""
+    if limit is None and (after is not None or before is not None):
+        return CHAT_LOG_PAGE_SIZE
+    return limit
+
 
 def is_end_message(message: str) -> bool:
     end_keywords = ["끝", "그만", "종료", "마치자", "끝낼래", "대화 그만", "대화 종료"]
@@ -59,72 +84,15 @@ def chat(
 @router.post("/stream")
 async def stream_chat(
         request: ChatRequest,
-        db: Session = Depends(get_db),
         current_user: User = Depends(get_current_user)
 ):
-    import logging
-    print(f"🔥 STREAM API CALLED! Chat ID: {request.chat_id}, Message: {request.message}")
-    logging.info(f"🔥 STREAM API CALLED! Chat ID: {request.chat_id}, Message: {request.message}")
-    async def event_generator():
-        import json
-        import logging
+    logging.info(f"SSE stream requested - chat_id: {request.chat_id}")
 
-        response_text = ""
+    async def event_generator():
         try:
-            # 1. get_streaming_chain 호출을 수정하고, 반환 값의 개수에 따라 분기 처리합니다.
-            result = get_streaming_chain(request.report_id, request.message)
-            is_farewell = False
-            if len(result) == 2:
-                chain, memory = result
-                is_farewell = True
-            else:
-                chain, memory, _ = result  # turn_count는 여기서 사용하지 않습니다.
-
-            # 2. astream을 사용하여 스트리밍을 처리합니다.
-            stream_input = {}
-            if not is_farewell:
-                stream_input = {"question": request.message}
-
-            logging.info(f"SSE stream started for chat_id: {request.chat_id}")
-            chunk_count = 0
-            #async for chunk in chain.astream(stream_input):
-            async for chunk in chain.astream({"question": request.message, "chat_history": memory} if not is_farewell else {"question": request.message}):
-                chunk_count += 1
-                token = ""
-                # LangChain 체인의 종류에 따라 반환되는 chunk의 타입이 다릅니다.
-                if isinstance(chunk, dict) and "answer" in chunk:
-                    token = chunk["answer"]  # ConversationalRetrievalChain의 경우
-                elif hasattr(chunk, 'content'):
-                    token = chunk.content  # LCEL 체인 (farewell)의 경우
-                
-                if token:
-                    # 토큰을 더 작은 단위로 분할하여 스트리밍 효과 강화
-                    if len(token) > 10:  # 긴 토큰을 더 작게 분할
-                        words = token.split()
-                        for i, word in enumerate(words):
-                            if i > 0:
-                                word = " " + word
-                            logging.info(f"Streaming chunk #{chunk_count}.{i+1}: '{word}'")
-                            response_text += word
-                            json_data = json.dumps({"token": word})
-                            yield json_data
-                            await asyncio.sleep(0.1)
-                    else:
-                        logging.info(f"Streaming chunk #{chunk_count}: '{token.strip()}' (length: {len(token)})")
-                        response_text += token
-                        json_data = json.dumps({"token": token})
-                        yield json_data
-                        await asyncio.sleep(0.1)
-                else:
-                    logging.warning(f"Empty token in chunk #{chunk_count}: {chunk}")
-            
-            logging.info(f"SSE stream finished for chat_id: {request.chat_id} - Total chunks: {chunk_count}, Final response length: {len(response_text)}")
-            
-            logging.info(f"SSE stream finished for chat_id: {request.chat_id}")
-            # 스트리밍 성공 시 로그 저장
-            save_chat_log(db, request.chat_id, RoleEnum.user, request.message)
-            if response_text:
-                save_chat_log(db, request.chat_id, RoleEnum.ai, response_text)
+            # 턴 상태 계산/검색/저장은 stream_turn에서 처리합니다. (음성 WebSocket과 공용)
+            async for frame in stream_turn(request.report_id, request.chat_id, request.message):
+                yield json.dumps({"token": frame})
 
         except Exception:
             logging.exception("Error during streaming chat")
@@ -145,27 +113,28 @@ async def stream_chat(
     summary="채팅방 생성 및 AI 인사",
     description="지정한 report_id에 대해 새 채팅방을 생성하고, AI의 첫 인사말을 반환합니다."
 )
-def create_chat(
+async def create_chat(
         request: CreateChatRequest,
-        db: Session = Depends(get_db),
+        db: AsyncSession = Depends(get_async_db),
         current_user: User = Depends(get_current_user)
 ):
     if not request.report_id:
         raise HTTPException(status_code=400, detail="report_id는 필수입니다.")
 
-    report = db.query(Report).filter(Report.report_id == request.report_id).first()
+    report = await db.get(Report, request.report_id)
     if not report:
         raise HTTPException(status_code=404, detail="해당 report_id가 존재하지 않습니다.")
 
-    # 1. 채팅방 생성
+    # 1. 채팅방 생성 (대화 상태 행도 함께 생성)
     chat = Chat(report_id=report.report_id)
     db.add(chat)
-    db.commit()
-    db.refresh(chat)
+    await db.flush()
+    db.add(init_chat_state(chat.chat_id))
 
-    # 2. AI의 첫 인사말 생성 및 저장
-    initial_greeting = "안녕하세요. 지금부터 대화를 시작하겠습니다. 보다 정확한 검사를 위해, 단답형보다는 완전한 문장으로 답변해주시면 감사하겠습니다."
-    save_chat_log(db, chat_id=chat.chat_id, role=RoleEnum.ai, text=initial_greeting)
+    # 2. AI의 첫 인사말 저장 (채팅방/상태와 같은 트랜잭션으로 한 번에 commit)
+    initial_greeting = INITIAL_GREETING
+    db.add(ChatLog(chat_id=chat.chat_id, role=RoleEnum.ai, text=initial_greeting))
+    await db.commit()
 
     # 3. 생성된 chat_id와 인사말 반환
     return CreateChatResponse(
@@ -174,42 +143,81 @@ def create_chat(
     )
 
 
-@router.get("/logs/{report_id}", response_model=list[ChatLogResponse])
-def get_logs_by_report_id(report_id: int, db: Session = Depends(get_db)):
-    return get_chat_logs_by_report_id(db, report_id)
+@router.get(
+    "/logs/{report_id}",
+    response_model=list[ChatLogResponse],
+    summary="리포트별 채팅 로그 조회",
+    description="report_id에 연결된 채팅 로그를 log_id 순으로 반환합니다. "
+                "after(마지막으로 받은 log_id)를 주면 그 이후의 새 로그만, before를 주면 그 이전 로그를 반환합니다. "
+                "after/before/limit을 모두 생략하면 전체 로그를 반환합니다."
+)
+def get_logs_by_report_id(
+        report_id: int,
+        after: Optional[int] = Query(None, description="이 log_id 이후의 로그만 조회 (증분 폴링)"),
+        before: Optional[int] = Query(None, description="이 log_id 이전의 로그를 조회 (이전 페이지)"),
+        limit: Optional[int] = Query(None, ge=1, le=CHAT_LOG_MAX_PAGE_SIZE),
+        db: Session = Depends(get_db)
+):
+    return get_chat_logs_by_report_id(db, report_id, after=after, before=before, limit=page_limit(after, before, limit))
 
 @router.get(
-    "/logs/{chat_id}",
+    "/chats/{chat_id}/logs",
     response_model=list[ChatLogResponse],
     summary="채팅 로그 조회",
-    description="특정 chat_id에 대한 모든 채팅 로그를 반환합니다."
+    description="특정 chat_id의 채팅 로그를 log_id 순으로 반환합니다. after/before/limit으로 페이지를 나눠 조회하고, "
+                "모두 생략하면 전체 로그를 반환합니다."
 )
 def read_chat_logs(
         chat_id: int,
+        after: Optional[int] = Query(None, description="이 log_id 이후의 로그만 조회 (증분 폴링)"),
+        before: Optional[int] = Query(None, description="이 log_id 이전의 로그를 조회 (이전 페이지)"),
+        limit: Optional[int] = Query(None, ge=1, le=CHAT_LOG_MAX_PAGE_SIZE),
         db: Session = Depends(get_db),
         current_user: User = Depends(get_current_user)
 ):
-    return get_chat_logs(db, chat_id)
+    return get_chat_logs(db, chat_id, after=after, before=before, limit=page_limit(after, before, limit))
 
 @router.post(
     "/chats/{chat_id}/evaluate",
     response_model=EvaluateChatResponse,
     summary="채팅 평가 및 결과 저장",
-    description="chat_id와 report_id를 기반으로 AI 분석 결과(소견, 위험도)를 평가하고 저장합니다."
+    description="chat_id와 report_id를 기반으로 AI 분석 결과(소견, 위험도)를 평가하고 저장합니다. "
+                "기본은 작업만 시작하고 PENDING과 task_id를 반환합니다. (GET으로 상태 조회) "
+                "wait=true면 평가가 끝날 때까지(최대 EVAL_WAIT_SECONDS초) 기다려 결과를 반환합니다. "
+                "대화 내용이 바뀌지 않았으면 저장된 결과를 바로 반환합니다."
 )
 def evaluate_chat_and_save(
         chat_id: int,
         report_id: int,
+        wait: bool = False,
         db: Session = Depends(get_db),
         current_user: User = Depends(get_current_user)
 ):
     try:
-        chat_result, chat_risk = evaluate_and_save_chat_result(db, chat_id, report_id)
-        return EvaluateChatResponse(
-            chat_result=chat_result,
-            chat_risk=chat_risk,
-            message="소견 및 위험도가 저장되었습니다."
-        )
+        if wait:
+            return EvaluateChatResponse(**wait_for_evaluation(db, chat_id, report_id))
+        return EvaluateChatResponse(**request_evaluation(db, chat_id, report_id))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except TimeoutError as e:
+        raise HTTPException(status_code=504, detail=str(e))
+    except RuntimeError as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get(
+    "/chats/{chat_id}/evaluate",
+    response_model=EvaluateChatResponse,
+    summary="채팅 평가 상태/결과 조회",
+    description="평가 작업의 상태를 조회합니다. 완료되었으면 소견과 위험도를 함께 반환합니다."
+)
+def get_chat_evaluation(
+        chat_id: int,
+        report_id: int,
+        db: Session = Depends(get_db),
+        current_user: User = Depends(get_current_user)
+):
+    try:
+        return EvaluateChatResponse(**request_evaluation(db, chat_id, report_id, submit=False))
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
 
@@ -227,13 +235,19 @@ async def voice_chat(
 ):
     try:
         audio_content = await file.read()
+        # 음성 바이트는 저장소에 한 번만 쓰고, 작업에는 참조 키만 넘깁니다.
+        ext = os.path.splitext(file.filename or "")[-1].lower()
+        audio_key = await asyncio.to_thread(put_blob, "voice-in", audio_content, ext)
 
         # Celery 작업 체인 생성: STT -> AI Chat -> TTS
         # 각 작업의 결과가 다음 작업의 입력으로 전달됩니다.
+        # 작업 ID(=마지막 TTS 작업 ID)로 단계별 진행 이벤트를 발행합니다.
+        job_id = str(uuid.uuid4())
+        events = {"job_id": job_id}
         chain = (
-            celery_app.signature("stt_task", args=[audio_content, file.filename]) |
-            celery_app.signature("ai_chat_task", args=[report_id, chat_id]) |
-            celery_app.signature("tts_task")
+            celery_app.signature("stt_task", args=[audio_key, file.filename], kwargs=events) |
+            celery_app.signature("ai_chat_task", args=[report_id, chat_id], kwargs=events) |
+            celery_app.signature("tts_task", kwargs=events).set(task_id=job_id)
         )
 
         # 비동기적으로 체인 실행
@@ -246,9 +260,69 @@ async def voice_chat(
         # 파일 처리나 작업 생성 중 오류 발생 시
         raise HTTPException(status_code=500, detail=f"음성 처리 중 오류 발생: {str(e)}")
 
+@router.get("/voice/audio/{audio_key:path}")
+async def download_voice_audio(audio_key: str):
+    """(음성채팅) TTS 결과 음성을 저장소에서 스트리밍으로 내려받습니다."""
+    if not is_valid_key(audio_key):
+        raise HTTPException(status_code=404, detail="음성 파일을 찾을 수 없습니다.")
+    store = get_blob_store()
+    if not await asyncio.to_thread(store.exists, audio_key):
+        raise HTTPException(status_code=404, detail="음성 파일이 만료되었거나 없습니다.")
+    return StreamingResponse(
+        store.iter_chunks(audio_key),
+        media_type=content_type_for(audio_key),
+        headers={"Content-Disposition": "inline; filename=output.mp3"},
+    )
+
+@router.websocket("/voice/ws")
+async def voice_session(
+        websocket: WebSocket,
+        report_id: int,
+        chat_id: int,
+        token: str
+):
+    """음성 대화 WebSocket 세션 (전사 → LLM 토큰 → 문장별 음성을 한 연결로 스트리밍)
+
+    브라우저 WebSocket은 Authorization 헤더를 보낼 수 없으므로 token 쿼리 파라미터로 인증합니다.
+    """
+    def authenticate():
+        with session_scope() as db:
+            get_user_from_token(token, db)
+
+    try:
+        await asyncio.to_thread(authenticate)
+    except HTTPException:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+
+    await websocket.accept()
+    await VoiceSession(websocket, report_id, chat_id).run()
+
 @router.get("/task-status/{task_id}")
-async def get_task_status(task_id: str):
-    """(음성채팅) 작업 상태 조회"""
+async def get_task_status(task_id: str, inline_audio: bool = True):
+    """(음성채팅) 작업 상태 조회
+
+    음성은 audio_url(/chat/voice/audio/{key})로 내려받습니다.
+    inline_audio=true(기본)면 기존 클라이언트 호환을 위해 audio_content_base64도 함께 담습니다.
+    """
+    response = _terminal_task_status.get(task_id)
+    if response is None:
+        response = await asyncio.to_thread(_lookup_task_status, task_id)
+        if response["status"] in ("SUCCESS", "FAILURE", "REVOKED"):
+            _terminal_task_status.set(task_id, response)
+
+    result = response["result"]
+    if isinstance(result, dict) and result.get("audio_key"):
+        result = {**result, "audio_url": f"/chat/voice/audio/{result['audio_key']}"}
+        if inline_audio:
+            audio = await asyncio.to_thread(get_blob_store().get, result["audio_key"])
+            if audio is not None:
+                result["audio_content_base64"] = base64.b64encode(audio).decode("utf-8")
+        response = {**response, "result": result}
+
+    return response
+
+def _lookup_task_status(task_id: str) -> dict:
     task_result = AsyncResult(task_id, app=celery_app)
 
     response = {
@@ -264,3 +338,18 @@ async def get_task_status(task_id: str):
         }
 
     return response
+
+@router.get("/voice/{task_id}/events")
+async def voice_task_events(task_id: str):
+    """(음성채팅) 작업 진행 이벤트 SSE
+
+    stt_done(전사) → ai_done(응답 텍스트) → done(audio_url) 순서로 보내고, 실패하면 failed를 보냅니다.
+    늦게 연결해도 지난 이벤트부터 다시 받습니다.
+    """
+    async def event_generator():
+        async for event in iter_events(task_id):
+            if event.get("audio_key"):
+                event["audio_url"] = f"/chat/voice/audio/{event['audio_key']}"
+            yield {"event": event["stage"], "data": json.dumps(event, ensure_ascii=False)}
+
+    return EventSourceResponse(event_generator())
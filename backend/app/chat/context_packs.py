@@ -0,0 +1,174 @@
+# app/chat/context_packs.py
+"""
+MMSE 영역별 컨텍스트 팩
+
+대화는 시스템 프롬프트에 따라 정해진 MMSE 영역(시간/장소 지남력, 기억, 계산, 언어, 읽기)으로 유도됩니다.
+영역마다 대표 검색어로 Chroma 컬렉션을 미리 검색해 순위가 매겨진 문서 묶음(팩)을 파일로 저장해 두고,
+채팅 턴에서는 발화를 영역에 매핑해 팩을 바로 주입합니다. 어느 영역에도 해당하지 않는 발화만 실시간 검색합니다.
+
+팩 생성(오프라인): python -m app.chat.context_packs
+"""
+import json
+import logging
+import os
+import threading
+from datetime import datetime
+
+from langchain_core.documents import Document
+from prometheus_client import Counter
+
+from app.clients import COLLECTION_NAME, get_chroma_client, get_vectordb
+
+logger = logging.getLogger(__name__)
+
+CONTEXT_PACK_PATH = os.getenv("CONTEXT_PACK_PATH", "data/context_packs.json")
+CONTEXT_PACK_SIZE = int(os.getenv("CONTEXT_PACK_SIZE", "4"))
+# 검색어 하나당 가져올 후보 문서 수
+CONTEXT_PACK_CANDIDATES = 8
+
+# 영역별 대표 검색어(논문 검색용, 영어)와 발화 매핑용 키워드(한국어)
+DOMAINS = {
+    "orientation_time": {
+        "queries": [
+            "MMSE orientation to time questions",
+            "temporal orientation day date season dementia screening",
+        ],
+        "keywords": ["요일", "날짜", "며칠", "몇 월", "몇월", "계절", "봄", "여름", "가을", "겨울", "년도", "몇 시"],
+    },
+    "orientation_place": {
+        "queries": [
+            "MMSE orientation to place questions",
+            "spatial orientation where are you now dementia assessment",
+        ],
+        "keywords": ["어디", "우리 집", "우리집", "동네", "노인정", "경로당", "병원", "시장", "살고", "주소", "몇 층"],
+    },
+    "registration": {
+        "queries": [
+            "MMSE registration and delayed recall of three words",
+            "word list recall memory test dementia",
+        ],
+        "keywords": ["기억", "단어", "외우", "사과", "연필", "자동차", "생각나", "잊어", "까먹"],
+    },
+    "calculation": {
+        "queries": [
+            "MMSE serial sevens attention and calculation",
+            "serial subtraction arithmetic cognitive impairment",
+        ],
+        "keywords": ["빼", "더하", "계산", "100", "93", "86", "7씩", "숫자", "거스름돈"],
+    },
+    "language": {
+        "queries": [
+            "MMSE language naming repetition writing a sentence",
+            "spontaneous speech and sentence writing in dementia",
+        ],
+        "keywords": ["문장", "써보", "적어", "이름이", "이름은", "표현"],
+    },
+    "reading": {
+        "queries": [
+            "MMSE reading comprehension close your eyes",
+            "reading and following written commands dementia",
+        ],
+        "keywords": ["읽", "글자", "글씨", "신문", "책", "눈을 감"],
+    },
+}
+
+CONTEXT_SOURCE = Counter("chat_context_source_total", "채팅 턴 컨텍스트 출처", ["source", "domain"])
+
+
+def build_context_packs(path: str = CONTEXT_PACK_PATH, size: int = CONTEXT_PACK_SIZE) -> dict:
+    """영역별 대표 검색어로 컬렉션을 검색해 팩을 만들고 JSON 파일로 저장합니다."""
+    vectordb = get_vectordb()
+    packs = {}
+    for domain, spec in DOMAINS.items():
+        # 여러 검색어 결과를 문서 내용 기준으로 합치고, 가장 높은 점수 + 등장 횟수로 순위를 매깁니다.
+        ranked = {}
+        for query in spec["queries"]:
+            results = vectordb.similarity_search_with_relevance_scores(query, k=CONTEXT_PACK_CANDIDATES)
+            for doc, score in results:
+                entry = ranked.setdefault(doc.page_content, {"metadata": doc.metadata, "score": score, "hits": 0})
+                entry["score"] = max(entry["score"], score)
+                entry["hits"] += 1
+        top = sorted(ranked.items(), key=lambda item: (item[1]["hits"], item[1]["score"]), reverse=True)[:size]
+        packs[domain] = [
+            {"content": content, "metadata": entry["metadata"], "score": round(entry["score"], 4)}
+            for content, entry in top
+        ]
+
+    collection = get_chroma_client().get_collection(name=COLLECTION_NAME)
+    data = {
+        "collection": COLLECTION_NAME,
+        "version": (collection.metadata or {}).get("version", "unversioned"),
+        "built_at": datetime.now().isoformat(),
+        "packs": packs,
+    }
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
+    logger.info(f"컨텍스트 팩 생성 완료 - {path}, version: {data['version']}")
+    return data
+
+
+_packs = {}
+_packs_mtime = None
+_packs_lock = threading.Lock()
+
+
+def load_context_packs(path: str = CONTEXT_PACK_PATH) -> dict:
+    """팩 파일을 읽어 {domain: [Document]}로 반환합니다. 파일이 바뀌면 다시 읽습니다."""
+    global _packs, _packs_mtime
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        return {}
+    if mtime == _packs_mtime:
+        return _packs
+    with _packs_lock:
+        if mtime != _packs_mtime:
+            with open(path, encoding="utf-8") as f:
+                data = json.load(f)
+            _packs = {
+                domain: [Document(page_content=item["content"], metadata=item.get("metadata") or {}) for item in items]
+                for domain, items in data.get("packs", {}).items()
+            }
+            _packs_mtime = mtime
+    return _packs
+
+
+def _domain_hits(text: str) -> dict:
+    hits = {domain: sum(1 for kw in spec["keywords"] if kw in text) for domain, spec in DOMAINS.items()}
+    return {domain: count for domain, count in hits.items() if count}
+
+
+def match_domain(text: str):
+    hits = _domain_hits(text)
+    return max(hits, key=hits.get) if hits else None
+
+
+def resolve_domain(message: str, chat_history: list[tuple[str, str]] = None):
+    """이번 턴이 어느 MMSE 영역인지 판단합니다. 해당 없음(주제 이탈)이면 None
+
+    사용자 발화에 영역 키워드가 있어야 합니다. 발화가 여러 영역에 걸치면 직전 AI 질문의 영역을 우선합니다.
+    """
+    hits = _domain_hits(message or "")
+    if not hits:
+        return None
+    last_ai = next((text for role, text in reversed(chat_history or []) if role == "ai"), "")
+    question_domain = match_domain(last_ai)
+    if question_domain in hits:
+        return question_domain
+    return max(hits, key=hits.get)
+
+
+def get_context_pack(domain: str):
+    """영역 팩 문서 목록. 팩이 없으면 None"""
+    if not domain:
+        return None
+    return load_context_packs().get(domain) or None
+
+
+if __name__ == "__main__":
+    result = build_context_packs()
+    for name, items in result["packs"].items():
+        print(f"- {name}: {len(items)} docs")
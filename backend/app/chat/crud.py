@@ -7,4 +7,24 @@ def save_chat_log(db: Session, chat_id: int, role: RoleEnum, text: str):
     db.add(log)
     db.commit()
     db.refresh(log)
-    return log
\ No newline at end of file
+    return log
+
+def get_chat_history_rows(db: Session, chat_id: int, before_log_id: int = None):
+    """대화 이력을 (role, text) 목록으로 조회합니다. (메모리 저장소 채우기용)"""
+    query = db.query(ChatLog.role, ChatLog.text).filter(ChatLog.chat_id == chat_id)
+    if before_log_id is not None:
+        query = query.filter(ChatLog.log_id < before_log_id)
+    return [(role.value, text) for role, text in query.order_by(ChatLog.log_id.asc()).all()]
+
+def get_chat_logs_page(db: Session, chat_id: int, after: int = None, before: int = None, limit: int = None):
+    """log_id 기준 키셋 페이지네이션 (after: 이후 새 로그, before: 이전 로그). 항상 log_id 오름차순으로 반환"""
+    query = db.query(ChatLog).filter(ChatLog.chat_id == chat_id)
+    if after is not None:
+        query = query.filter(ChatLog.log_id > after)
+    if before is not None:
+        # 이전 페이지는 before 직전부터 거꾸로 limit개를 읽은 뒤 순서를 되돌립니다.
+        query = query.filter(ChatLog.log_id < before).order_by(ChatLog.log_id.desc())
+        logs = query.limit(limit).all() if limit else query.all()
+        return list(reversed(logs))
+    query = query.order_by(ChatLog.log_id.asc())
+    return query.limit(limit).all() if limit else query.all()
@@ -0,0 +1,101 @@
+# app/chat/log_writer.py
+"""
+chat_log 배치 저장
+
+한 턴에서 생기는 로그(사용자 발화, AI 응답)와 인지 신호를 모아 두었다가
+multi-row INSERT 1회 + 신호/턴 상태 갱신 + commit 1회로 저장합니다.
+턴은 같은 트랜잭션에서 chat_state 행을 잠그고 1 올린 값(claim_turn)으로 확정하며, 신호도 그 턴으로 저장합니다.
+스트리밍 종료 시와 서버 종료(lifespan) 시 남은 배치를 반드시 flush 합니다.
+"""
+import logging
+import weakref
+
+from sqlalchemy import insert
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.chat.models import ChatLog, ChatSignal, RoleEnum
+from app.chat.state import Turn, claim_turn, claim_turn_async
+from app.database import AsyncSessionLocal
+
+logger = logging.getLogger(__name__)
+
+# 아직 flush 되지 않은 배치 (서버 종료 시 flush_pending_async에서 처리)
+_pending = weakref.WeakSet()
+
+
+class ChatLogBatch:
+    def __init__(self, chat_id: int, turn: Turn = None):
+        self.chat_id = chat_id
+        self.turn = turn
+        self.rows = []
+        self.signals = None
+        _pending.add(self)
+
+    def add(self, role: RoleEnum, text: str):
+        self.rows.append({"chat_id": self.chat_id, "role": role, "text": text})
+
+    def set_signals(self, tags: list[str], quote: str):
+        """이번 턴 사용자 답변의 인지 신호 (턴 번호가 있을 때만 저장)"""
+        self.signals = {"tags": tags, "quote": (quote or "")[:100]}
+
+    def _statements(self, turn: Turn = None):
+        """확정된 턴(turn)을 받아 로그/신호 저장 문장을 만듭니다."""
+        statements = []
+        if self.rows:
+            statements.append(insert(ChatLog).values(self.rows))
+        if turn is not None and self.signals is not None:
+            stmt = mysql_insert(ChatSignal).values(chat_id=self.chat_id, turn=turn.turn, **self.signals)
+            statements.append(stmt.on_duplicate_key_update(tags=stmt.inserted.tags, quote=stmt.inserted.quote))
+        return statements
+
+    def _check_turn(self, turn: Turn):
+        if turn != self.turn:
+            logger.warning(
+                f"동시 메시지로 턴이 바뀌었습니다 - chat_id: {self.chat_id}, 예상: {self.turn}, 확정: {turn}"
+            )
+
+    def _done(self):
+        self.rows = []
+        self.turn = None
+        self.signals = None
+        _pending.discard(self)
+
+    def flush(self, db: Session):
+        if self.rows or self.turn is not None:
+            turn = None
+            if self.turn is not None:
+                turn = claim_turn(db, self.chat_id)
+                self._check_turn(turn)
+            for stmt in self._statements(turn):
+                db.execute(stmt)
+            db.commit()
+        self._done()
+
+    async def flush_async(self, db: AsyncSession = None):
+        if self.rows or self.turn is not None:
+            if db is None:
+                async with AsyncSessionLocal() as session:
+                    await self._execute_async(session)
+            else:
+                await self._execute_async(db)
+        self._done()
+
+    async def _execute_async(self, db: AsyncSession):
+        turn = None
+        if self.turn is not None:
+            turn = await claim_turn_async(db, self.chat_id)
+            self._check_turn(turn)
+        for stmt in self._statements(turn):
+            await db.execute(stmt)
+        await db.commit()
+
+
+async def flush_pending_async():
+    """서버 종료 시 아직 저장되지 않은 배치를 모두 저장합니다."""
+    for batch in list(_pending):
+        try:
+            await batch.flush_async()
+        except Exception:
+            logger.exception(f"chat_log 배치 flush 실패 - chat_id: {batch.chat_id}")
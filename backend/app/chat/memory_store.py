@@ -1,8 +1,192 @@
-from langchain.memory import ConversationBufferMemory
+# app/chat/memory_store.py
+"""
+대화 메모리 저장소
 
-_memory_dict = {}
+대화 이력은 (role, text) 튜플 목록의 간단한 형태로 저장합니다.
+오래된 턴을 대신하는 누적 요약(app/chat/prompt_budget.py)도 같은 저장소에 둡니다.
+- memory: 프로세스 내 LRU/TTL 저장소 (대화 수/메시지 수 상한)
+- redis: docker-compose의 Redis를 사용하는 공유 저장소 (API 워커 여러 개, Celery 워커와 공유)
+"""
+import json
+import logging
+import os
+import threading
+import time
 
-def get_memory(report_id):
-    if report_id not in _memory_dict:
-        _memory_dict[report_id] = ConversationBufferMemory(memory_key="chat_history", return_messages=True)
-    return _memory_dict[report_id] 
\ No newline at end of file
+from prometheus_client import Counter, Gauge
+
+from app.cache import LRUCache
+from app.clients import get_redis
+
+logger = logging.getLogger(__name__)
+
+MEMORY_BACKEND = os.getenv("CHAT_MEMORY_BACKEND", "memory")  # memory | redis
+MEMORY_MAX_CONVERSATIONS = int(os.getenv("CHAT_MEMORY_MAX_CONVERSATIONS", "1000"))
+MEMORY_MAX_MESSAGES = int(os.getenv("CHAT_MEMORY_MAX_MESSAGES", "40"))
+MEMORY_TTL_SECONDS = int(os.getenv("CHAT_MEMORY_TTL_SECONDS", str(60 * 60 * 6)))
+# Redis 저장소의 대화 수(SCAN)를 다시 세는 최소 간격(초)
+MEMORY_SIZE_REFRESH_SECONDS = float(os.getenv("CHAT_MEMORY_SIZE_REFRESH_SECONDS", "60"))
+
+MEMORY_LOOKUPS = Counter(
+    "chat_memory_lookups_total", "대화 메모리 조회 수", ["backend", "result"]
+)
+MEMORY_SIZE = Gauge(
+    "chat_memory_conversations", "저장 중인 대화 수", ["backend"]
+)
+
+
+class InProcessMemoryStore:
+    backend = "memory"
+
+    def __init__(self, max_conversations=MEMORY_MAX_CONVERSATIONS,
+                 max_messages=MEMORY_MAX_MESSAGES, ttl=MEMORY_TTL_SECONDS):
+        self.max_messages = max_messages
+        self._cache = LRUCache(maxsize=max_conversations, ttl=ttl)
+        self._summaries = LRUCache(maxsize=max_conversations, ttl=ttl)
+        self._lock = threading.Lock()
+        MEMORY_SIZE.labels(self.backend).set_function(lambda: len(self._cache))
+
+    def get_history(self, key):
+        """대화 이력을 반환합니다. 저장된 이력이 없으면 None"""
+        history = self._cache.get(key)
+        MEMORY_LOOKUPS.labels(self.backend, "miss" if history is None else "hit").inc()
+        return list(history) if history is not None else None
+
+    def extend(self, key, messages, only_if_present=False):
+        with self._lock:
+            history = self._cache.get(key)
+            if history is None and only_if_present:
+                return
+            history = list(history or ())
+            history.extend((role, text) for role, text in messages)
+            self._cache.set(key, tuple(history[-self.max_messages:]))
+
+    def append(self, key, role, text):
+        self.extend(key, [(role, text)])
+
+    def clear(self, key):
+        self._cache.pop(key)
+        self._summaries.pop(key)
+
+    def get_summary(self, key):
+        """(요약, 요약에 포함된 메시지 수) 또는 None"""
+        return self._summaries.get(key)
+
+    def set_summary(self, key, summary, covered):
+        self._summaries.set(key, (summary, covered))
+
+    @property
+    def hit_rate(self):
+        return self._cache.hit_rate
+
+
+class RedisMemoryStore:
+    backend = "redis"
+
+    def __init__(self, max_messages=MEMORY_MAX_MESSAGES, ttl=MEMORY_TTL_SECONDS, prefix="chat_memory:"):
+        self.max_messages = max_messages
+        self.ttl = ttl
+        self.prefix = prefix
+        self.hits = 0
+        self.misses = 0
+        self._size = 0
+        self._size_checked_at = None
+        self._size_lock = threading.Lock()
+        MEMORY_SIZE.labels(self.backend).set_function(self.size)
+
+    def _key(self, key):
+        return f"{self.prefix}{key}"
+
+    def get_history(self, key):
+        items = get_redis().lrange(self._key(key), 0, -1)
+        if not items:
+            self.misses += 1
+            MEMORY_LOOKUPS.labels(self.backend, "miss").inc()
+            return None
+        self.hits += 1
+        MEMORY_LOOKUPS.labels(self.backend, "hit").inc()
+        return [tuple(json.loads(item)) for item in items]
+
+    def extend(self, key, messages, only_if_present=False):
+        items = [json.dumps([role, text], ensure_ascii=False) for role, text in messages]
+        if not items:
+            return
+        redis_key = self._key(key)
+        pipe = get_redis().pipeline()
+        if only_if_present:
+            pipe.rpushx(redis_key, *items)
+        else:
+            pipe.rpush(redis_key, *items)
+        pipe.ltrim(redis_key, -self.max_messages, -1)
+        pipe.expire(redis_key, self.ttl)
+        pipe.execute()
+
+    def append(self, key, role, text):
+        self.extend(key, [(role, text)])
+
+    def clear(self, key):
+        get_redis().delete(self._key(key), self._summary_key(key))
+
+    def _summary_key(self, key):
+        return f"chat_summary:{key}"
+
+    def get_summary(self, key):
+        raw = get_redis().get(self._summary_key(key))
+        return tuple(json.loads(raw)) if raw else None
+
+    def set_summary(self, key, summary, covered):
+        get_redis().set(self._summary_key(key), json.dumps([summary, covered], ensure_ascii=False), ex=self.ttl)
+
+    def size(self):
+        """저장 중인 대화 수. SCAN은 MEMORY_SIZE_REFRESH_SECONDS마다 한 번만 하고,
+        Redis 오류가 나면 /metrics 가 실패하지 않도록 마지막 값을 돌려줍니다."""
+        now = time.monotonic()
+        if self._size_checked_at is not None and now - self._size_checked_at < MEMORY_SIZE_REFRESH_SECONDS:
+            return self._size
+        if not self._size_lock.acquire(blocking=False):
+            return self._size
+        try:
+            self._size = sum(1 for _ in get_redis().scan_iter(match=f"{self.prefix}*", count=500))
+        except Exception as e:
+            logger.warning(f"대화 메모리 크기 조회 실패: {e}")
+        finally:
+            self._size_checked_at = now
+            self._size_lock.release()
+        return self._size
+
+    @property
+    def hit_rate(self):
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_memory_store():
+    """CHAT_MEMORY_BACKEND 설정에 따른 프로세스 공용 메모리 저장소"""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = RedisMemoryStore() if MEMORY_BACKEND == "redis" else InProcessMemoryStore()
+    return _store
+
+
+def get_chat_history(key, load_history):
+    """저장소에서 대화 이력을 꺼내고, 없으면 load_history()로 DB에서 읽어 채웁니다."""
+    store = get_memory_store()
+    history = store.get_history(key)
+    if history is None:
+        history = list(load_history())
+        store.extend(key, history)
+    return history
+
+
+def remember_turn(key, user_text, ai_text):
+    """이번 턴을 이력 끝에 덧붙입니다. 저장된 이력이 없으면 다음 조회 때 DB에서 채워집니다."""
+    messages = [("user", user_text)]
+    if ai_text:
+        messages.append(("ai", ai_text))
+    get_memory_store().extend(key, messages, only_if_present=True)
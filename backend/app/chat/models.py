@@ -1,7 +1,8 @@
 #app/chat/models.py
-from sqlalchemy import Column, BigInteger, ForeignKey, Enum, Text, DateTime, func, Integer
+from sqlalchemy import Column, BigInteger, ForeignKey, Enum, Text, DateTime, func, Integer, String, JSON, Index
 from sqlalchemy.orm import relationship
 from app.database import Base
+from app.report.models import RiskLevel
 import enum
 from sqlalchemy.ext.declarative import declared_attr
 
@@ -9,6 +10,12 @@ class RoleEnum(enum.Enum):
     user = "user"
     ai = "ai"
 
+class ChatStage(enum.Enum):
+    greeting = "greeting"        # 첫 턴: 고정 인사/요일 질문
+    questioning = "questioning"  # 중간 턴: 유도 질문
+    farewell = "farewell"        # 마지막 턴: 작별 인사
+    closed = "closed"            # 종료 이후
+
 class Chat(Base):
     __tablename__ = "chat"
 
@@ -16,6 +23,8 @@ class Chat(Base):
     report_id = Column(Integer, ForeignKey("reports.report_id"), nullable=False)
 
     logs = relationship("ChatLog", back_populates="chat")
+    state = relationship("ChatState", back_populates="chat", uselist=False)
+    evaluation = relationship("ChatEvaluation", back_populates="chat", uselist=False)
 
 class BaseTimeEntity:
     @declared_attr
@@ -33,3 +42,38 @@ class ChatLog(Base, BaseTimeEntity):
     role = Column(Enum(RoleEnum), nullable=False)
     text = Column(Text, nullable=False)
     chat = relationship("Chat", back_populates="logs")
+
+    # 채팅별 로그를 log_id 순으로 조회(키셋 페이지네이션)하기 위한 복합 인덱스
+    __table_args__ = (Index("ix_chat_log_chat_id_log_id", "chat_id", "log_id"),)
+
+class ChatState(Base):
+    """채팅별 대화 상태 (현재 단계 + 사용자 턴 수)"""
+    __tablename__ = "chat_state"
+
+    chat_id = Column(Integer, ForeignKey("chat.chat_id"), primary_key=True)
+    stage = Column(Enum(ChatStage), nullable=False, default=ChatStage.greeting)
+    turn_count = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now(), nullable=False)
+    chat = relationship("Chat", back_populates="state")
+
+class ChatEvaluation(Base):
+    """대화 평가 결과 캐시 (대화 내용 해시 기준)"""
+    __tablename__ = "chat_evaluation"
+
+    chat_id = Column(Integer, ForeignKey("chat.chat_id"), primary_key=True)
+    report_id = Column(Integer, ForeignKey("reports.report_id"), nullable=False)
+    transcript_hash = Column(String(64), nullable=False)
+    chat_result = Column(Text, nullable=False)
+    chat_risk = Column(Enum(RiskLevel, native_enum=True), nullable=False)
+    updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now(), nullable=False)
+    chat = relationship("Chat", back_populates="evaluation")
+
+class ChatSignal(Base):
+    """사용자 답변별 인지 신호 (턴 단위, app/chat/signals.py 참고)"""
+    __tablename__ = "chat_signal"
+
+    chat_id = Column(Integer, ForeignKey("chat.chat_id"), primary_key=True)
+    turn = Column(Integer, primary_key=True)
+    tags = Column(JSON, nullable=False)
+    quote = Column(String(100), nullable=False)
+    created_at = Column(DateTime, server_default=func.now(), nullable=False)
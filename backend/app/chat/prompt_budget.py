@@ -0,0 +1,139 @@
+# app/chat/prompt_budget.py
+"""
+토큰 예산 기반 프롬프트 조립
+
+중간 턴 프롬프트는 시스템 프롬프트 + 참고 논문(Context) + 대화 이력 + 사용자 발화로 구성됩니다.
+섹션별 토큰 수를 세어 입력 예산(PROMPT_TOKEN_BUDGET)을 넘지 않도록 맞춥니다.
+- 대화 이력: 최근 PROMPT_RECENT_MESSAGES개만 그대로 넣고, 그 이전 턴은 누적 요약으로 대체
+- 참고 논문: 남은 예산만큼 검색 순위대로 채우고, 넘치는 문서는 잘라냄
+누적 요약은 턴이 끝난 뒤 백그라운드에서 새로 밀려난 메시지만 더해 갱신합니다.
+"""
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from langchain.prompts import PromptTemplate
+from prometheus_client import Histogram
+
+from app.llm_router import get_router
+from app.chat.memory_store import get_memory_store
+from app.chat.retrieval import format_chat_history
+
+logger = logging.getLogger(__name__)
+
+PROMPT_TOKEN_BUDGET = int(os.getenv("PROMPT_TOKEN_BUDGET", "4000"))
+PROMPT_RECENT_MESSAGES = int(os.getenv("PROMPT_RECENT_MESSAGES", "6"))
+# 참고 논문에 최소한으로 남겨 둘 토큰 수
+PROMPT_MIN_CONTEXT_TOKENS = int(os.getenv("PROMPT_MIN_CONTEXT_TOKENS", "300"))
+
+PROMPT_TOKENS = Histogram(
+    "chat_prompt_tokens", "채팅 프롬프트 섹션별 추정 토큰 수", ["section"],
+    buckets=(100, 250, 500, 1000, 2000, 3000, 4000, 6000, 8000),
+)
+
+summary_prompt = PromptTemplate.from_template(
+    "다음은 사용자와 AI의 대화 요약과 그 뒤에 이어진 대화입니다.\n"
+    "두 내용을 합쳐 사용자가 말한 사실(요일/날짜, 장소, 기억한 단어, 계산 답 등)과 "
+    "대화 흐름이 드러나도록 다섯 문장 이내의 한국어 요약으로 다시 작성하세요.\n\n"
+    "기존 요약:\n{summary}\n\n이어진 대화:\n{messages}\n\n요약:"
+)
+
+_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="chat-summary")
+_encoding = None
+
+
+def count_tokens(text: str) -> int:
+    """토큰 수 추정 (tiktoken cl100k_base, 사용할 수 없으면 글자 수 기반 근사)"""
+    global _encoding
+    if not text:
+        return 0
+    if _encoding is None:
+        try:
+            import tiktoken
+            _encoding = tiktoken.get_encoding("cl100k_base")
+        except Exception:
+            _encoding = False
+    if _encoding:
+        return len(_encoding.encode(text))
+    return len(text) // 2 + 1
+
+
+def _truncate(text: str, max_tokens: int) -> str:
+    """max_tokens 이하가 되도록 뒤쪽을 잘라냅니다."""
+    if count_tokens(text) <= max_tokens:
+        return text
+    if _encoding:
+        return _encoding.decode(_encoding.encode(text)[:max_tokens])
+    return text[: max_tokens * 2]
+
+
+def assemble_prompt_inputs(chat_id: int, fixed_text: str, docs, chat_history: list[tuple[str, str]],
+                           budget: int = PROMPT_TOKEN_BUDGET) -> dict:
+    """예산 안에서 {"context", "chat_history"} 프롬프트 입력을 만듭니다.
+
+    fixed_text: 항상 들어가는 부분(시스템 프롬프트 + 사용자 발화 + 템플릿 문구)
+    """
+    fixed_tokens = count_tokens(fixed_text)
+
+    # 1. 대화 이력: 요약이 덮는 앞부분은 요약으로, 최근 메시지는 그대로
+    summary, covered = get_memory_store().get_summary(chat_id) or ("", 0)
+    covered = min(covered, max(len(chat_history) - PROMPT_RECENT_MESSAGES, 0))
+    if not summary:
+        covered = 0
+    recent = list(chat_history[covered:])
+
+    history_budget = max(budget - fixed_tokens - PROMPT_MIN_CONTEXT_TOKENS, 0)
+    summary_text = f"(이전 대화 요약) {summary}\n" if summary else ""
+    history_text = summary_text + format_chat_history(recent)
+    # 예산을 넘으면 오래된 메시지부터 뺍니다. (빠진 메시지는 다음 요약 갱신 때 요약에 포함됩니다)
+    while recent and count_tokens(history_text) > history_budget:
+        recent.pop(0)
+        history_text = summary_text + format_chat_history(recent)
+    history_tokens = count_tokens(history_text)
+
+    # 2. 참고 논문: 남은 예산만큼 순위대로 채우고 마지막 문서는 잘라냄
+    context_budget = max(budget - fixed_tokens - history_tokens, PROMPT_MIN_CONTEXT_TOKENS)
+    parts, used = [], 0
+    for doc in docs:
+        remaining = context_budget - used
+        if remaining <= 0:
+            break
+        text = _truncate(doc.page_content, remaining)
+        parts.append(text)
+        used += count_tokens(text)
+    context_text = "\n\n".join(parts)
+
+    PROMPT_TOKENS.labels("fixed").observe(fixed_tokens)
+    PROMPT_TOKENS.labels("history").observe(history_tokens)
+    PROMPT_TOKENS.labels("context").observe(used)
+    PROMPT_TOKENS.labels("total").observe(fixed_tokens + history_tokens + used)
+    return {"context": context_text, "chat_history": history_text}
+
+
+def update_summary(chat_id: int, chat_history: list[tuple[str, str]]):
+    """최근 메시지 창에서 밀려난 메시지만 기존 요약에 더해 요약을 갱신합니다."""
+    store = get_memory_store()
+    summary, covered = store.get_summary(chat_id) or ("", 0)
+    target = len(chat_history) - PROMPT_RECENT_MESSAGES
+    if target <= covered:
+        return
+    messages = chat_history[covered:target]
+    result = get_router().invoke("summary", lambda llm: summary_prompt | llm, {
+        "summary": summary or "(없음)",
+        "messages": format_chat_history(messages),
+    }, temperature=0)
+    store.set_summary(chat_id, result.content.strip(), target)
+
+
+def schedule_summary_update(chat_id: int, chat_history: list[tuple[str, str]]):
+    """요약 갱신은 응답 경로를 막지 않도록 백그라운드 스레드에서 수행합니다."""
+    if len(chat_history) <= PROMPT_RECENT_MESSAGES:
+        return
+
+    def run():
+        try:
+            update_summary(chat_id, chat_history)
+        except Exception:
+            logger.exception(f"대화 요약 갱신 실패 - chat_id: {chat_id}")
+
+    _executor.submit(run)
@@ -0,0 +1,70 @@
+# app/chat/retrieval.py
+"""
+채팅 턴 단위 검색(retrieval) 단계
+
+한 턴에 임베딩 1회 + 벡터 조회 1회만 수행하고, 결과 문서를 생성 프롬프트에 바로 넘깁니다.
+(ConversationalRetrievalChain은 질문 재구성 LLM 호출과 자체 검색을 추가로 수행했습니다.)
+"""
+import logging
+import os
+from langchain.chains.conversational_retrieval.prompts import CONDENSE_QUESTION_PROMPT
+from app.clients import get_vectordb, get_query_embeddings
+from app.rag.local_index import get_local_index
+from app.chat.context_packs import CONTEXT_SOURCE, get_context_pack, resolve_domain
+
+logger = logging.getLogger(__name__)
+
+# 검색 문서 개수
+RETRIEVAL_K = int(os.getenv("RETRIEVAL_K", "4"))
+# 대화 이력 메시지가 이 개수 이상일 때만 질문 재구성(condense) LLM 호출을 수행합니다. (0: 사용 안 함)
+CONDENSE_MIN_HISTORY = int(os.getenv("CONDENSE_MIN_HISTORY", "0"))
+# 벡터 검색 방식 (chroma: Chroma 서버 질의, local: 메모리 맵 로컬 인덱스)
+VECTOR_INDEX_MODE = os.getenv("VECTOR_INDEX_MODE", "chroma")
+
+
+def format_chat_history(chat_history: list[tuple[str, str]]) -> str:
+    """[(role, text), ...] 형태의 대화 이력을 프롬프트용 문자열로 변환합니다."""
+    return "\n".join(
+        f"사용자: {text}" if role == "user" else f"AI: {text}" for role, text in chat_history
+    )
+
+
+def format_docs(docs) -> str:
+    return "\n\n".join(doc.page_content for doc in docs)
+
+
+def should_condense(chat_history: list[tuple[str, str]]) -> bool:
+    return CONDENSE_MIN_HISTORY > 0 and len(chat_history) >= CONDENSE_MIN_HISTORY
+
+
+def condense_question(question: str, chat_history: list[tuple[str, str]], llm) -> str:
+    """대화 이력을 반영해 검색용 독립 질문으로 재구성합니다."""
+    result = (CONDENSE_QUESTION_PROMPT | llm).invoke({
+        "question": question,
+        "chat_history": format_chat_history(chat_history),
+    })
+    return result.content.strip() or question
+
+
+def retrieve_documents(question: str, chat_history: list[tuple[str, str]] = None, llm=None, k: int = RETRIEVAL_K):
+    """턴당 한 번만 호출되는 검색 단계. 필요할 때만 질문을 재구성합니다."""
+    query = question
+    if llm is not None and chat_history and should_condense(chat_history):
+        query = condense_question(question, chat_history, llm)
+    if VECTOR_INDEX_MODE == "local":
+        try:
+            return get_local_index().search(get_query_embeddings().embed_query(query), k=k)
+        except Exception:
+            logger.warning("로컬 벡터 인덱스 검색 실패, Chroma로 대체합니다.", exc_info=True)
+    return get_vectordb().similarity_search(query, k=k)
+
+
+def retrieve_context(question: str, chat_history: list[tuple[str, str]] = None, llm=None, k: int = RETRIEVAL_K):
+    """MMSE 영역에 해당하는 턴은 미리 만든 컨텍스트 팩을, 주제 이탈 발화만 실시간 검색 결과를 사용합니다."""
+    domain = resolve_domain(question, chat_history)
+    docs = get_context_pack(domain)
+    if docs:
+        CONTEXT_SOURCE.labels("pack", domain).inc()
+        return docs[:k]
+    CONTEXT_SOURCE.labels("live", domain or "none").inc()
+    return retrieve_documents(question, chat_history, llm=llm, k=k)
@@ -1,6 +1,8 @@
 # app/chat/schemas.py
 from __future__ import annotations
 
+from typing import Optional
+
 from pydantic import BaseModel
 from datetime import datetime
 from enum import Enum
@@ -19,6 +21,7 @@ class ChatResponse(BaseModel):
 
 
 class ChatLogResponse(BaseModel):
+    log_id: int
     role: RoleEnum
     text: str
 
@@ -35,8 +38,10 @@ class CreateChatResponse(BaseModel):
     message: str
 
 class EvaluateChatResponse(BaseModel):
-    chat_result: str
-    chat_risk: str
+    status: str = "SUCCESS"
+    task_id: Optional[str] = None
+    chat_result: Optional[str] = None
+    chat_risk: Optional[str] = None
     message: str
 
 class VoiceChatResponse(BaseModel):
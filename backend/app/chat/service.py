@@ -1,25 +1,36 @@
 # app/chat/service.py
 
 import ast
+import hashlib
 import os
 import re
-import chromadb
 from sqlalchemy.orm import Session
-from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain.prompts import ChatPromptTemplate, SystemMessagePromptTemplate, HumanMessagePromptTemplate, PromptTemplate
-from langchain_community.vectorstores import Chroma
-from langchain_google_genai import GoogleGenerativeAIEmbeddings
-from langchain.chains import ConversationalRetrievalChain
+from celery.exceptions import TimeoutError as CeleryTimeoutError
+from celery.result import AsyncResult
+from app.celery import celery_app
+from app.clients import get_redis
+from app.llm_router import get_router
+from app.chat.retrieval import retrieve_context
+from app.chat.prompt_budget import assemble_prompt_inputs, schedule_summary_update
 from app.chat.models import Chat
-from app.chat.memory_store import get_memory
-from app.chat.crud import save_chat_log
-from app.chat.models import RoleEnum, ChatLog
+from app.chat.memory_store import get_chat_history, remember_turn
+from app.chat.crud import get_chat_history_rows, get_chat_logs_page
+from app.chat.log_writer import ChatLogBatch
+from app.chat.models import RoleEnum, ChatLog, ChatStage, ChatEvaluation, ChatSignal
+from app.chat.signals import extract_signals, summarize_signals
+from app.chat.state import next_turn, FIRST_TURN_MESSAGE, CLOSED_MESSAGE, MAX_TURNS
 from app.chat.schemas import ChatLogResponse
 from app.database import get_db
 from app.report.models import Report, RiskLevel
 from datetime import datetime
 
 
+# 평가 작업 중복 제출 방지 락 유지 시간(초)
+EVAL_LOCK_SECONDS = int(os.getenv("EVAL_LOCK_SECONDS", "600"))
+# 평가 요청에 wait=true를 주었을 때 작업 완료를 기다리는 최대 시간(초)
+EVAL_WAIT_SECONDS = float(os.getenv("EVAL_WAIT_SECONDS", "90"))
+
 today_str = datetime.now().strftime("%Y년 %m월 %d일")
 
 def extract_score_and_result(ai_response):
@@ -40,22 +51,26 @@ google_api_key = os.environ.get("GOOGLE_API_KEY")
 if not google_api_key:
     raise RuntimeError("GOOGLE_API_KEY 환경변수가 설정되어 있지 않습니다.")
 
-client = chromadb.HttpClient(host="chroma-server", port=8000)
-vectordb = Chroma(
-    client=client,
-    collection_name="dementia_gemini_v1",
-    embedding_function=GoogleGenerativeAIEmbeddings(model="models/embedding-001", google_api_key=google_api_key)
-)
-
 def chat_with_ai(report_id: int, chat_id: int, message: str, db: Session) -> str:
-    save_chat_log(db, chat_id=chat_id, role=RoleEnum.user, text=message)
-    db.flush()
-    turn_count = db.query(ChatLog).filter(ChatLog.chat_id == chat_id, ChatLog.role == RoleEnum.user).count()
+    # 이번 턴 상태 계산. 사용자 발화/AI 응답/턴 증가는 마지막에 한 번에 저장합니다.
+    turn = next_turn(db, chat_id)
+    turn_count = turn.turn
+    batch = ChatLogBatch(chat_id, turn)
+    batch.add(RoleEnum.user, message)
+
+    # 현재 발화 이전까지의 대화 이력 (메모리 저장소에 없으면 DB에서 한 번만 읽어옵니다)
+    # 직전 AI 질문을 기준으로 이번 답변의 인지 신호를 추출해 로그와 함께 저장합니다.
+    chat_history = []
+    if turn.stage in (ChatStage.questioning, ChatStage.farewell):
+        chat_history = get_chat_history(
+            chat_id, lambda: get_chat_history_rows(db, chat_id)
+        )
+        batch.set_signals(extract_signals(message, chat_history), message)
 
     response = ""
-    llm = ChatGoogleGenerativeAI(model="gemini-1.5-pro-latest", temperature=0.5, google_api_key=google_api_key)
+    router = get_router()
 
-    if turn_count == 7:
+    if turn.stage == ChatStage.farewell:
         farewell_prompt_text = """
 당신은 따뜻한 작별인사 전문가입니다. 당신의 임무는 사용자와의 대화를 자연스럽게 마무리하는 것입니다.
 
@@ -69,18 +84,13 @@ def chat_with_ai(report_id: int, chat_id: int, message: str, db: Session) -> str
 사용자의 마지막 말: {question}
 """
         farewell_prompt = PromptTemplate.from_template(farewell_prompt_text)
-        farewell_chain = farewell_prompt | llm
-        ai_response = farewell_chain.invoke({"question": message})
+        ai_response = router.invoke("chat", lambda llm: farewell_prompt | llm, {"question": message}, temperature=0.5)
         response = ai_response.content
 
-    elif turn_count == 1:
-        response = (
-            "안녕하세요. 지금부터 대화를 시작하겠습니다. 보다 정확한 이해를 위해, 단답형보다는 완전한 문장으로 답변해주시면 감사하겠습니다.\n\n"
-            "먼저, 오늘은 무슨 요일인지 말씀해주시겠어요?"
-        )
+    elif turn.stage == ChatStage.greeting:
+        response = FIRST_TURN_MESSAGE
 
-    elif turn_count <= 6:
-        memory = get_memory(report_id)
+    elif turn.stage == ChatStage.questioning:
         system_prompt_template = """
 당신은 사용자의 이야기를 들어주는 친근한 대화 파트너입니다. 당신의 유일한 역할은 사용자의 말을 듣고 다양한 리액션과 질문만 하세요. 자신에 대한 생각을 말하지마세요. 제발
 
@@ -137,51 +147,74 @@ def chat_with_ai(report_id: int, chat_id: int, message: str, db: Session) -> str
             HumanMessagePromptTemplate.from_template("이전 대화 요약(chat_history):\n{chat_history}\n\n사용자 발화: {question}\n\n위 규칙을 참고하여 다음 질문을 하세요.")
         ])
 
-        retriever = vectordb.as_retriever()
-        docs = retriever.get_relevant_documents(message)
-
-        logs = get_chat_logs(db, chat_id)
-        chat_history = [
-            ("user" if log.role == RoleEnum.user else "ai", log.text) for log in logs
-        ]
-
-        chain = ConversationalRetrievalChain.from_llm(
-            llm=llm,
-            retriever=retriever,
-            combine_docs_chain_kwargs={"prompt": prompt},
+        # MMSE 영역 턴은 컨텍스트 팩을, 주제 이탈 발화만 실시간 검색 결과를 생성 호출에 전달합니다.
+        docs = retrieve_context(
+            message, chat_history,
+            llm=router.chat_model("chat", router.models_for("chat")[0], temperature=0.5)
         )
-
-        result = chain.invoke({
-            "question": message,
-            "chat_history": chat_history
-        })
-
-        answer = result["answer"] if isinstance(result, dict) and "answer" in result else str(result)
-        response = answer
+        # 토큰 예산 안에서 참고 논문과 대화 이력(오래된 턴은 누적 요약)을 채웁니다.
+        inputs = assemble_prompt_inputs(chat_id, system_prompt + message, docs, chat_history)
+        result = router.invoke("chat", lambda llm: prompt | llm, {**inputs, "question": message}, temperature=0.5)
+        response = result.content
+        schedule_summary_update(chat_id, chat_history + [("user", message), ("ai", response)])
 
     else:
-        response = "이미 대화가 종료되었습니다. 아래 종료 버튼을 눌러 평가를 완료해주세요."
+        response = CLOSED_MESSAGE
 
-    save_chat_log(db, chat_id=chat_id, role=RoleEnum.ai, text=response)
+    batch.add(RoleEnum.ai, response)
+    batch.flush(db)
+    remember_turn(chat_id, message, response)
     return response
 
-def get_chat_logs_by_report_id(db: Session, report_id: int) -> list[ChatLogResponse]:
+def get_chat_logs_by_report_id(db: Session, report_id: int, after: int = None, before: int = None, limit: int = None) -> list[ChatLogResponse]:
     chat = db.query(Chat).filter(Chat.report_id == report_id).first()
     if not chat:
         return []
-    logs = db.query(ChatLog).filter(ChatLog.chat_id == chat.chat_id).order_by(ChatLog.updated_at.asc()).all()
-    return [ChatLogResponse.from_orm(log) for log in logs]
+    return get_chat_logs(db, chat.chat_id, after=after, before=before, limit=limit)
 
-def get_chat_logs(db: Session, chat_id: int) -> list[ChatLogResponse]:
-    logs = db.query(ChatLog).filter(ChatLog.chat_id == chat_id).order_by(ChatLog.updated_at.asc()).all()
+def get_chat_logs(db: Session, chat_id: int, after: int = None, before: int = None, limit: int = None) -> list[ChatLogResponse]:
+    logs = get_chat_logs_page(db, chat_id, after=after, before=before, limit=limit)
     return [ChatLogResponse.from_orm(log) for log in logs]
 
-def evaluate_and_save_chat_result(db, chat_id: int, report_id: int):
+def load_transcript(db, chat_id: int) -> str:
     logs = db.query(ChatLog).filter(ChatLog.chat_id == chat_id).order_by(ChatLog.log_id.asc()).all()
-    conversation = "".join([
+    return "".join([
         f"사용자: {log.text}\n" if log.role.value == "user" else f"AI: {log.text}\n" for log in logs
     ])
 
+def transcript_hash(conversation: str, report_id: int) -> str:
+    return hashlib.sha256(f"{report_id}\n{conversation}".encode("utf-8")).hexdigest()
+
+def get_cached_evaluation(db, chat_id: int, digest: str):
+    """대화 내용이 바뀌지 않았으면 저장된 평가 결과를 반환합니다."""
+    evaluation = db.get(ChatEvaluation, chat_id)
+    if evaluation and evaluation.transcript_hash == digest:
+        return evaluation
+    return None
+
+RISK_LABELS = {
+    "양호": RiskLevel.GOOD,
+    "경계": RiskLevel.CAUTION,
+    "위험": RiskLevel.DANGER
+}
+
+def parse_evaluation(response_text: str):
+    # chat_result: <양호> ~ 소견까지 한 블록 추출
+    m = re.search(r"(<(양호|경계|위험)>[\s\S]*?소견[:：]?\s*[^\n]+)", response_text)
+    chat_result = m.group(1).strip() if m else ""
+
+    # chat_risk_str: <양호> 또는 위험도 라벨 기반으로 판단
+    m1 = re.search(r"<(양호|경계|위험)>", response_text)
+    if m1:
+        chat_risk_str = m1.group(1).strip()
+    else:
+        m2 = re.search(r"위험도[:：]?\s*(양호|경계|위험)", response_text)
+        chat_risk_str = m2.group(1).strip() if m2 else "양호"
+
+    return chat_result, RISK_LABELS.get(chat_risk_str, RiskLevel.GOOD)
+
+def evaluate_full_transcript(conversation: str):
+    """전체 대화를 프롬프트에 넣어 평가합니다. (인지 신호가 없는 이전 대화용)"""
     eval_prompt = PromptTemplate(
         input_variables=["conversation"],
         template=(
@@ -204,34 +237,160 @@ def evaluate_and_save_chat_result(db, chat_id: int, report_id: int):
         )
     )
 
-    llm = ChatGoogleGenerativeAI(model="gemini-1.5-pro-latest", temperature=0.7, google_api_key=google_api_key)
-    eval_chain = eval_prompt | llm
-    eval_response = eval_chain.invoke({"conversation": conversation})
+    eval_response = get_router().invoke(
+        "evaluation", lambda llm: eval_prompt | llm, {"conversation": conversation}, temperature=0.7
+    )
     response_text = eval_response.content
 
-    # chat_result: <양호> ~ 소견까지 한 블록 추출
-    m = re.search(r"(<(양호|경계|위험)>[\s\S]*?소견[:：]?\s*[^\n]+)", response_text)
-    chat_result = m.group(1).strip() if m else ""
+    return parse_evaluation(response_text)
 
-    # chat_risk_str: <양호> 또는 위험도 라벨 기반으로 판단
-    m1 = re.search(r"<(양호|경계|위험)>", response_text)
-    if m1:
-        chat_risk_str = m1.group(1).strip()
+def load_signal_rows(db, chat_id: int):
+    signals = db.query(ChatSignal).filter(ChatSignal.chat_id == chat_id).order_by(ChatSignal.turn.asc()).all()
+    return [(signal.turn, signal.tags or [], signal.quote) for signal in signals]
+
+def count_user_turns(db, chat_id: int) -> int:
+    return db.query(ChatLog).filter(ChatLog.chat_id == chat_id, ChatLog.role == RoleEnum.user).count()
+
+def evaluate_from_signals(signal_rows):
+    """턴별 인지 신호를 LLM이 확인해 위험도와 소견을 정합니다. (전체 대화 대신 짧은 프롬프트 한 번)
+
+    규칙 기반 신호는 오탐이 있을 수 있으므로, 신호 수에 따른 등급은 상한으로만 쓰고
+    LLM이 실제로 특징적인 응답이라고 확인한 것만으로 판정한 등급과 비교해 낮은 쪽을 씁니다.
+    """
+    flagged_count, summary = summarize_signals(signal_rows)
+    # 기존 평가 기준과 동일: 특징적인 응답이 2개 이상이면 경계, 4개 이상이면 위험
+    if flagged_count >= 4:
+        max_risk_str = "위험"
+    elif flagged_count >= 2:
+        max_risk_str = "경계"
     else:
-        m2 = re.search(r"위험도[:：]?\s*(양호|경계|위험)", response_text)
-        chat_risk_str = m2.group(1).strip() if m2 else "양호"
+        max_risk_str = "양호"
 
-    risk_enum = {
-        "양호": RiskLevel.GOOD,
-        "경계": RiskLevel.CAUTION,
-        "위험": RiskLevel.DANGER
-    }.get(chat_risk_str, RiskLevel.GOOD)
+    eval_prompt = PromptTemplate(
+        input_variables=["summary"],
+        template=(
+            "아래는 사용자와의 대화에서 규칙으로 자동 추출한 답변별 신호 목록입니다. 잘못 붙은 신호가 있을 수 있습니다.\n"
+            "{summary}\n\n"
+            "1. 각 답변이 실제로 '치매가 있는 사람이 자주 보이는 특징적인 응답'인지 확인하세요.\n"
+            "   답변이 짧더라도 자연스럽고 맥락에 맞으면 특징적인 응답으로 세지 마세요.\n"
+            "2. 확인된 응답이 2개 이상이면 '경계', 4개 이상이면 '위험', 그 미만이면 '양호'로 정하세요.\n"
+            "3. 확인된 응답을 근거로 소견을 한두 문장으로 작성하고, 아래 형식만 출력하세요:\n\n"
+            "<양호/경계/위험>\n"
+            "소견: 대화 검사 결과, ...\n\n"
+            "위험도: <양호/경계/위험>\n"
+        )
+    )
+    response_text = get_router().invoke(
+        "evaluation", lambda llm: eval_prompt | llm, {"summary": summary}, temperature=0.7
+    ).content
+
+    chat_result, risk_enum = parse_evaluation(response_text)
+    levels = list(RISK_LABELS.values())
+    if levels.index(risk_enum) > levels.index(RISK_LABELS[max_risk_str]):
+        risk_enum = RISK_LABELS[max_risk_str]
+        chat_result = ""
+    if not chat_result:
+        risk_str = next(label for label, level in RISK_LABELS.items() if level == risk_enum)
+        m = re.search(r"소견[:：]?\s*([^\n]+)", response_text)
+        chat_result = f"<{risk_str}>\n소견: {m.group(1).strip() if m else response_text.strip()}"
+    return chat_result, risk_enum
+
+def evaluate_and_save_chat_result(db, chat_id: int, report_id: int):
+    conversation = load_transcript(db, chat_id)
+    digest = transcript_hash(conversation, report_id)
+
+    # 같은 대화로 이미 평가했다면 LLM을 다시 호출하지 않습니다.
+    cached = get_cached_evaluation(db, chat_id, digest)
+    if cached:
+        return cached.chat_result, cached.chat_risk
+
+    # 턴마다 저장된 인지 신호가 모든 답변에 있으면 신호만 집계해 짧은 프롬프트로 소견을 작성합니다.
+    signal_rows = load_signal_rows(db, chat_id)
+    # (첫 턴 인사와 종료 이후 발화는 신호 대상이 아닙니다)
+    if signal_rows and len(signal_rows) >= min(count_user_turns(db, chat_id), MAX_TURNS) - 1:
+        chat_result, risk_enum = evaluate_from_signals(signal_rows)
+    else:
+        chat_result, risk_enum = evaluate_full_transcript(conversation)
 
     report = db.query(Report).filter(Report.report_id == report_id).first()
     if not report:
         raise ValueError("리포트가 존재하지 않습니다.")
     report.chat_result = chat_result
     report.chat_risk = risk_enum
+    db.merge(ChatEvaluation(
+        chat_id=chat_id,
+        report_id=report_id,
+        transcript_hash=digest,
+        chat_result=chat_result,
+        chat_risk=risk_enum
+    ))
     db.commit()
 
-    return chat_result, risk_enum
\ No newline at end of file
+    return chat_result, risk_enum
+
+def evaluation_task_id(chat_id: int, digest: str) -> str:
+    """대화 내용별로 고정된 작업 ID (같은 대화는 같은 작업을 가리킵니다)"""
+    return f"chat-eval-{chat_id}-{digest[:16]}"
+
+def request_evaluation(db, chat_id: int, report_id: int, submit: bool = True) -> dict:
+    """캐시된 평가 결과를 반환하거나, 평가 작업을 (한 번만) 제출하고 작업 상태를 반환합니다."""
+    if not db.get(Report, report_id):
+        raise ValueError("리포트가 존재하지 않습니다.")
+
+    digest = transcript_hash(load_transcript(db, chat_id), report_id)
+    cached = get_cached_evaluation(db, chat_id, digest)
+    if cached:
+        return {
+            "status": "SUCCESS",
+            "chat_result": cached.chat_result,
+            "chat_risk": cached.chat_risk.value,
+            "message": "소견 및 위험도가 저장되었습니다."
+        }
+
+    task_id = evaluation_task_id(chat_id, digest)
+    task_result = AsyncResult(task_id, app=celery_app)
+    lock_key = f"lock:{task_id}"
+    if submit:
+        redis_client = get_redis()
+        if task_result.failed():
+            # 실패한 작업은 다시 제출할 수 있도록 락과 결과를 지웁니다.
+            redis_client.delete(lock_key)
+            task_result.forget()
+        if redis_client.set(lock_key, "1", nx=True, ex=EVAL_LOCK_SECONDS):
+            celery_app.send_task("evaluate_chat_task", args=[chat_id, report_id], task_id=task_id)
+
+    response = {
+        "status": task_result.status,
+        "task_id": task_id,
+        "message": "평가가 진행 중입니다."
+    }
+    if task_result.failed():
+        response["message"] = f"평가 중 오류가 발생했습니다: {task_result.info}"
+    return response
+
+
+def wait_for_evaluation(db, chat_id: int, report_id: int, timeout: float = EVAL_WAIT_SECONDS) -> dict:
+    """평가 작업을 제출하고 끝날 때까지(최대 timeout초) 기다려 결과를 반환합니다.
+
+    결과는 작업 반환값에서 읽습니다. (같은 세션으로 다시 조회하면 트랜잭션 스냅샷 때문에 새 행이 보이지 않을 수 있음)
+    """
+    response = request_evaluation(db, chat_id, report_id)
+    if response["status"] == "SUCCESS" and response.get("chat_risk"):
+        return response
+    # 기다리는 동안 DB 연결을 잡고 있지 않도록 세션을 닫습니다.
+    db.close()
+
+    task_result = AsyncResult(response["task_id"], app=celery_app)
+    try:
+        result = task_result.get(timeout=timeout, propagate=False)
+    except CeleryTimeoutError:
+        raise TimeoutError("평가가 아직 진행 중입니다. 잠시 후 다시 시도해주세요.")
+    if task_result.failed():
+        raise RuntimeError(f"평가 중 오류가 발생했습니다: {task_result.info}")
+    return {
+        "status": "SUCCESS",
+        "task_id": response["task_id"],
+        "chat_result": result["chat_result"],
+        "chat_risk": result["chat_risk"],
+        "message": "소견 및 위험도가 저장되었습니다."
+    }
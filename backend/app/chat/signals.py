@@ -0,0 +1,179 @@
+# app/chat/signals.py
+"""
+턴 단위 인지 신호 추출
+
+대화가 진행되는 동안 사용자 답변마다 규칙 기반으로 짧은 신호(태그)를 붙여 chat_signal에 저장합니다.
+최종 평가는 전체 대화 대신 이 신호만 집계해 짧은 프롬프트 한 번으로 소견을 작성합니다.
+
+- dont_know: "모르겠어요", "기억 안 나" 등 회피/기억 실패 응답
+- wrong_weekday / wrong_date: 요일·날짜 질문에 틀린 답
+- serial_sevens_error: 100에서 7씩 빼기 오답
+- off_topic: 요일·날짜/7씩 빼기 질문에 그와 무관한 답
+- repetition: 앞서 한 답변을 그대로 반복
+정답이 정해진 질문(요일/날짜/7씩 빼기)을 직접 물었을 때만 오답·주제 이탈을 판단합니다.
+("오늘 점심은 뭐 드셨어요?"처럼 '오늘'이 들어간 일상 질문은 대상이 아닙니다)
+"""
+import re
+from datetime import datetime
+
+from app.embedding_cache import normalize_utterance
+
+# 최종 평가에서 '치매가 있는 사람이 자주 보이는 응답'으로 집계하는 신호
+SIGNAL_LABELS = {
+    "dont_know": "모른다/기억나지 않는다는 응답",
+    "wrong_weekday": "요일을 틀리게 답함",
+    "wrong_date": "날짜를 틀리게 답함",
+    "serial_sevens_error": "7씩 빼기 계산 오답",
+    "off_topic": "질문과 무관한 답변",
+    "repetition": "앞선 답변을 반복",
+}
+
+DONT_KNOW_PATTERNS = [
+    "모르겠", "몰라", "모름", "기억 안", "기억이 안", "기억 나지", "기억이 나지", "생각 안", "생각이 안",
+    "생각이 나지", "잊어버", "까먹",
+]
+WEEKDAYS = ["월요일", "화요일", "수요일", "목요일", "금요일", "토요일", "일요일"]
+
+# 직전 AI 질문 종류
+_WEEKDAY_QUESTION = re.compile(r"(?:무슨|몇|어떤|어느)\s*요일")
+_DATE_QUESTION = re.compile(r"몇\s*월|며칠(?:인|이에|이죠|이지|일까|이냐)|날짜")
+_SEVENS_QUESTION = re.compile(r"(?:7|칠)\s*(?:을|를|씩)?\s*빼")
+
+_DIGITS = re.compile(r"\d+")
+# 날짜 표현: 뒤에 '전/후/동안' 같은 기간 말이 오면 날짜로 보지 않습니다. (예: "3일 전")
+_DATE_SUFFIX = r"(?=$|[^가-힣]|이요|요|이에요|예요|입니다|이고|이죠|이지|인가|인데|인것|인 것|일까|쯤|정도|같)"
+_MONTH = re.compile(r"(?<!\d)(\d{1,2})\s*월" + _DATE_SUFFIX)
+_DAY = re.compile(r"(?<!\d)(\d{1,2})\s*일" + _DATE_SUFFIX)
+
+_KOREAN_DIGITS = {"일": 1, "이": 2, "삼": 3, "사": 4, "오": 5, "육": 6, "칠": 7, "팔": 8, "구": 9}
+_NATIVE_TENS = {"열": 10, "스물": 20, "서른": 30, "마흔": 40, "쉰": 50, "예순": 60, "일흔": 70, "여든": 80, "아흔": 90}
+_NATIVE_ONES = {
+    "하나": 1, "한": 1, "둘": 2, "두": 2, "셋": 3, "세": 3, "넷": 4, "네": 4,
+    "다섯": 5, "여섯": 6, "일곱": 7, "여덟": 8, "아홉": 9,
+}
+# 숫자 바로 뒤에 올 수 있는 말 (조사/어미/단위). 그 밖의 글자가 붙으면 단어의 일부로 봅니다. (예: "백화점")
+_NUMBER_SUFFIX = (
+    r"(?=$|[^가-힣]|이요|요|이에요|예요|입니다|이다|이고|이지|이죠|죠|이네|이랑|랑|하고|에서|에|을|를|이|은|는|도|"
+    r"쯤|정도|개|원|번|살|점|빼|다음|인가|인데|일까|이겠)"
+)
+_DIGIT_CHARS = "일이삼사오육칠팔구"
+# 한자어 숫자: 백/십이 들어간 것만 (예: 구십삼, 백, 이백). 끝자리는 짧은 쪽부터 시도해 "백이요"를 100으로 읽습니다.
+_SINO_NUMBER = re.compile(
+    rf"(?:(?P<h>[{_DIGIT_CHARS}])?(?P<hm>백))?(?:(?P<t>[{_DIGIT_CHARS}])?(?P<tm>십))?(?P<o>[{_DIGIT_CHARS}])??"
+    + _NUMBER_SUFFIX
+)
+# 고유어 숫자: 십의 자리 말이 있는 것만 (예: 아흔셋, 여든 여섯). "네"(대답) 같은 한 자리 말은 숫자로 보지 않습니다.
+_NATIVE_NUMBER = re.compile(
+    rf"(?P<tens>{'|'.join(_NATIVE_TENS)})(?:\s?(?P<ones>{'|'.join(sorted(_NATIVE_ONES, key=len, reverse=True))}))?"
+    + _NUMBER_SUFFIX
+)
+
+
+def _sino_to_int(m: re.Match):
+    if not (m.group("hm") or m.group("tm")):
+        return None
+    value = 0
+    if m.group("hm"):
+        value += _KOREAN_DIGITS.get(m.group("h"), 1) * 100
+    if m.group("tm"):
+        value += _KOREAN_DIGITS.get(m.group("t"), 1) * 10
+    return value + _KOREAN_DIGITS.get(m.group("o"), 0)
+
+
+def extract_numbers(text: str) -> list[int]:
+    """답변에 나온 숫자(아라비아 숫자, '구십삼'/'아흔셋' 같은 한글 숫자)를 등장 순서대로 반환합니다."""
+    found = [(m.start(), int(m.group())) for m in _DIGITS.finditer(text)]
+    for m in _SINO_NUMBER.finditer(text):
+        value = _sino_to_int(m)
+        if value is not None:
+            found.append((m.start(), value))
+    for m in _NATIVE_NUMBER.finditer(text):
+        found.append((m.start(), _NATIVE_TENS[m.group("tens")] + _NATIVE_ONES.get(m.group("ones"), 0)))
+    return [value for _, value in sorted(found)]
+
+
+def _last_ai_message(chat_history) -> str:
+    return next((text for role, text in reversed(chat_history or []) if role == "ai"), "")
+
+
+def question_kind(question: str):
+    """정답이 정해진 질문이면 "weekday" / "date" / "serial_sevens", 아니면 None"""
+    if _SEVENS_QUESTION.search(question):
+        return "serial_sevens"
+    if _WEEKDAY_QUESTION.search(question):
+        return "weekday"
+    if _DATE_QUESTION.search(question):
+        return "date"
+    return None
+
+
+def _check_weekday(message: str, today: datetime) -> list[str]:
+    weekdays = [day for day in WEEKDAYS if day in message]
+    if not weekdays:
+        return [] if "요일" in message else ["off_topic"]
+    # 여러 요일을 말하면 (예: "3일 전이 일요일이었으니 수요일") 그중에 오늘 요일이 있으면 정답
+    return [] if WEEKDAYS[today.weekday()] in weekdays else ["wrong_weekday"]
+
+
+def _check_date(message: str, today: datetime) -> list[str]:
+    months = [int(m) for m in _MONTH.findall(message)]
+    days = [int(d) for d in _DAY.findall(message)]
+    if not months and not days:
+        return [] if extract_numbers(message) else ["off_topic"]
+    if (months and today.month not in months) or (days and today.day not in days):
+        return ["wrong_date"]
+    return []
+
+
+def _check_serial_sevens(message: str, question: str) -> list[str]:
+    numbers = [n for n in extract_numbers(message) if n != 7]
+    if not numbers:
+        return []
+    # 질문에 마지막으로 나온 숫자가 시작 숫자 (예: "100에서 7을 빼면 93, 93에서 7을 빼면?" → 93), 없으면 100
+    start = ([n for n in extract_numbers(question) if n != 7] or [100])[-1]
+    expected = start - 7
+    for number in numbers:
+        if number != expected:
+            return ["serial_sevens_error"]
+        expected = number - 7
+    return []
+
+
+def extract_signals(message: str, chat_history: list[tuple[str, str]] = None, today: datetime = None) -> list[str]:
+    """사용자 답변 하나에 대한 신호 태그 목록 (직전 AI 질문을 기준으로 판단)"""
+    today = today or datetime.now()
+    text = message or ""
+    question = _last_ai_message(chat_history)
+    kind = question_kind(question)
+    tags = []
+
+    dont_know = any(pattern in text for pattern in DONT_KNOW_PATTERNS)
+    if dont_know:
+        tags.append("dont_know")
+
+    if kind == "weekday":
+        tags += _check_weekday(text, today)
+    elif kind == "date":
+        tags += _check_date(text, today)
+    elif kind == "serial_sevens":
+        tags += _check_serial_sevens(text, question)
+        if not extract_numbers(text):
+            tags.append("off_topic")
+    if dont_know and "off_topic" in tags:
+        tags.remove("off_topic")
+
+    normalized = normalize_utterance(text)
+    previous = {normalize_utterance(t) for role, t in (chat_history or []) if role == "user"}
+    if normalized and normalized in previous:
+        tags.append("repetition")
+    return tags
+
+
+def summarize_signals(rows) -> tuple[int, str]:
+    """[(turn, tags, quote)] 목록을 (신호가 있었던 답변 수, 프롬프트용 요약)으로 변환합니다."""
+    flagged = [(turn, tags, quote) for turn, tags, quote in rows if tags]
+    lines = [
+        f"- {turn}번째 답변 \"{quote}\": " + ", ".join(SIGNAL_LABELS.get(tag, tag) for tag in tags)
+        for turn, tags, quote in flagged
+    ]
+    return len(flagged), "\n".join(lines) or "- 특이 신호 없음"
@@ -0,0 +1,120 @@
+# app/chat/state.py
+"""
+대화 상태 머신 (greeting → questioning → farewell → closed)
+
+채팅마다 chat_state 행 하나에 현재 단계와 사용자 턴 수를 저장합니다.
+턴 증가는 chat_log 저장과 같은 트랜잭션(ChatLogBatch.flush)에서 행 잠금(SELECT ... FOR UPDATE) 후
+turn_count = turn_count + 1로 처리되며, REST/SSE 경로가 함께 사용합니다.
+"""
+from typing import NamedTuple
+
+from sqlalchemy import func, select, update
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.chat.models import ChatLog, ChatStage, ChatState, RoleEnum
+
+# 총 사용자 턴 수 (마지막 턴에서 작별 인사)
+MAX_TURNS = 7
+
+FIRST_TURN_MESSAGE = (
+    "안녕하세요. 지금부터 대화를 시작하겠습니다. 보다 정확한 이해를 위해, 단답형보다는 완전한 문장으로 답변해주시면 감사하겠습니다.\n\n"
+    "먼저, 오늘은 무슨 요일인지 말씀해주시겠어요?"
+)
+CLOSED_MESSAGE = "이미 대화가 종료되었습니다. 아래 종료 버튼을 눌러 평가를 완료해주세요."
+# 채팅방 생성 시 저장하는 AI 첫 인사말
+INITIAL_GREETING = "안녕하세요. 지금부터 대화를 시작하겠습니다. 보다 정확한 검사를 위해, 단답형보다는 완전한 문장으로 답변해주시면 감사하겠습니다."
+# 매번 같은 문장이라 음성을 미리 합성해 두는 문구
+FIXED_MESSAGES = (INITIAL_GREETING, FIRST_TURN_MESSAGE, CLOSED_MESSAGE)
+
+
+class Turn(NamedTuple):
+    turn: int          # 이번 사용자 발화가 몇 번째 턴인지 (1부터)
+    stage: ChatStage   # 이번 턴의 단계
+
+
+def stage_for_turn(turn: int) -> ChatStage:
+    if turn <= 1:
+        return ChatStage.greeting
+    if turn < MAX_TURNS:
+        return ChatStage.questioning
+    if turn == MAX_TURNS:
+        return ChatStage.farewell
+    return ChatStage.closed
+
+
+def init_chat_state(chat_id: int) -> ChatState:
+    """채팅방 생성 시 함께 저장할 초기 상태"""
+    return ChatState(chat_id=chat_id, stage=ChatStage.greeting, turn_count=0)
+
+
+def _next_turn(turn_count: int) -> Turn:
+    turn = (turn_count or 0) + 1
+    return Turn(turn=turn, stage=stage_for_turn(turn))
+
+
+def _user_turn_count_query(chat_id: int):
+    return select(func.count(ChatLog.log_id)).where(
+        ChatLog.chat_id == chat_id, ChatLog.role == RoleEnum.user
+    )
+
+
+def next_turn(db: Session, chat_id: int) -> Turn:
+    """이번 사용자 발화의 턴 번호와 단계를 계산합니다. (PK 조회 1회, 쓰기 없음)
+
+    응답 생성에 쓰는 예상 턴이며, 실제 턴 증가는 chat_log 저장 트랜잭션에서 claim_turn()으로 반영됩니다.
+    """
+    turn_count = db.scalar(select(ChatState.turn_count).where(ChatState.chat_id == chat_id))
+    if turn_count is None:
+        # chat_state 도입 이전에 만들어진 채팅: 기존 로그로 한 번만 계산합니다.
+        turn_count = db.scalar(_user_turn_count_query(chat_id))
+    return _next_turn(turn_count)
+
+
+async def next_turn_async(db: AsyncSession, chat_id: int) -> Turn:
+    """next_turn의 비동기 버전 (SSE 경로)"""
+    turn_count = await db.scalar(select(ChatState.turn_count).where(ChatState.chat_id == chat_id))
+    if turn_count is None:
+        turn_count = await db.scalar(_user_turn_count_query(chat_id))
+    return _next_turn(turn_count)
+
+
+def _locked_turn_count_query(chat_id: int):
+    return select(ChatState.turn_count).where(ChatState.chat_id == chat_id).with_for_update()
+
+
+def _increment_statements(chat_id: int, turn_count, user_count) -> tuple[Turn, object]:
+    """잠근 turn_count(없으면 기존 로그 수) 기준의 이번 턴과, 턴을 1 올리는 문장"""
+    if turn_count is not None:
+        turn = _next_turn(turn_count)
+        return turn, (
+            update(ChatState)
+            .where(ChatState.chat_id == chat_id)
+            .values(turn_count=ChatState.turn_count + 1, stage=turn.stage)
+        )
+    # chat_state 도입 이전에 만들어진 채팅: 기존 로그 수 기준으로 행을 만듭니다.
+    turn = _next_turn(user_count)
+    stmt = mysql_insert(ChatState).values(chat_id=chat_id, turn_count=turn.turn, stage=turn.stage)
+    return turn, stmt.on_duplicate_key_update(turn_count=ChatState.turn_count + 1, stage=stmt.inserted.stage)
+
+
+def claim_turn(db: Session, chat_id: int) -> Turn:
+    """(chat_log 저장 트랜잭션 안에서) chat_state 행을 잠그고 턴을 1 올린 뒤, 확정된 턴을 반환합니다.
+
+    같은 채팅에 메시지가 동시에 들어와도(중복 전송, REST/SSE 동시 사용) 턴이 빠짐없이 하나씩 증가합니다.
+    """
+    turn_count = db.scalar(_locked_turn_count_query(chat_id))
+    user_count = db.scalar(_user_turn_count_query(chat_id)) if turn_count is None else None
+    turn, stmt = _increment_statements(chat_id, turn_count, user_count)
+    db.execute(stmt)
+    return turn
+
+
+async def claim_turn_async(db: AsyncSession, chat_id: int) -> Turn:
+    """claim_turn의 비동기 버전 (SSE 경로)"""
+    turn_count = await db.scalar(_locked_turn_count_query(chat_id))
+    user_count = await db.scalar(_user_turn_count_query(chat_id)) if turn_count is None else None
+    turn, stmt = _increment_statements(chat_id, turn_count, user_count)
+    await db.execute(stmt)
+    return turn
@@ -1,28 +1,31 @@
 # app/chat/stream_handler.py
 
+import asyncio
+import logging
 import os
-import chromadb
+import time
 from datetime import datetime
-from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain.chains import ConversationalRetrievalChain
-from langchain_community.vectorstores import Chroma
-from langchain_google_genai import GoogleGenerativeAIEmbeddings
 from langchain.prompts import ChatPromptTemplate, SystemMessagePromptTemplate, HumanMessagePromptTemplate
-from app.chat.memory_store import get_memory
+from typing import AsyncIterator
+from langchain_core.runnables import Runnable
+from app.chat.memory_store import get_chat_history, remember_turn
+from app.chat.models import ChatStage, RoleEnum
+from app.chat.log_writer import ChatLogBatch
+from app.chat.signals import extract_signals
+from app.chat.state import next_turn_async
+from app.chat.streaming import stream_frames
+from app.chat.state import Turn, FIRST_TURN_MESSAGE, CLOSED_MESSAGE
+from app.chat.crud import get_chat_history_rows
+from app.database import session_scope, AsyncSessionLocal
+from app.llm_router import get_router
+from app.chat.retrieval import retrieve_context
+from app.chat.prompt_budget import assemble_prompt_inputs, schedule_summary_update
 
 # ✅ 환경변수에서 Google API 키 로드
 google_api_key = os.environ.get("GOOGLE_API_KEY")
 if not google_api_key:
     raise RuntimeError("GOOGLE_API_KEY 환경변수가 설정되어 있지 않습니다.")
 
-# ✅ Chroma 벡터 DB 클라이언트 생성
-client = chromadb.HttpClient(host="chroma-server", port=8000)
-vectordb = Chroma(
-    client=client,
-    collection_name="dementia_gemini_v1",
-    embedding_function=GoogleGenerativeAIEmbeddings(model="models/embedding-001", google_api_key=google_api_key)
-)
-
 # ✅ 대화용 system prompt
 system_prompt = """
 당신은 사용자의 이야기를 들어주는 친근한 대화 파트너입니다...
@@ -100,74 +103,63 @@ prompt = ChatPromptTemplate.from_messages([
     )
 ])
 
-def get_streaming_chain(report_id: int, question: str):
-    from langchain_core.runnables import Runnable
-    from typing import AsyncIterator
-    import asyncio
+class FixedMessageRunnable(Runnable[dict, str]):
+    """LLM 호출 없이 고정 문구를 그대로 스트리밍하는 Runnable (첫 턴 / 종료 이후)"""
 
-    memory = get_memory(report_id)
-    today = datetime.now().strftime("%Y년 %m월 %d일")
+    def __init__(self, message: str):
+        self.message = message
 
-    messages = memory.chat_memory.messages
-    chat_history = []
-    for m in messages:
-        if m.type == "human":
-            chat_history.append(("user", m.content))
-        elif m.type == "ai":
-            chat_history.append(("ai", m.content))
+    def invoke(self, input: dict, config=None) -> str:
+        return self.message
 
-    turn_count = len([m for m in messages if m.type == "human"])
+    async def astream(self, input: dict, config=None, **kwargs) -> AsyncIterator[str]:
+        yield self.message
 
-    # ✅ 마지막 턴: 작별 응답
-    if turn_count == 6:
-        llm = ChatGoogleGenerativeAI(
-            model="gemini-1.5-pro-latest",
-            temperature=0.1,
-            streaming=True,
-            google_api_key=google_api_key
-        )
-        chain = farewell_prompt | llm
-        chain = chain.bind(question=question)
-        return chain, memory
 
-    # ✅ 첫 턴: 고정 인사 멘트 스트리밍용
-    if turn_count == 0:
-        from typing import AsyncIterator
-        from langchain_core.runnables import Runnable
+def _load_history_from_db(chat_id: int):
+    with session_scope() as db:
+        return get_chat_history_rows(db, chat_id)
 
-        class FirstTurnRunnable(Runnable[dict, str]):
-            def invoke(self, input: dict, config=None) -> str:
-                return (
-                    "안녕하세요. 지금부터 대화를 시작하겠습니다. 보다 정확한 이해를 위해, "
-                    "단답형보다는 완전한 문장으로 답변해주시면 감사하겠습니다.\n\n"
-                    "먼저, 오늘은 무슨 요일인지 말씀해주시겠어요?"
-                )
+def get_streaming_chain(report_id: int, question: str, chat_id: int, turn: Turn):
+    """turn: next_turn_async로 계산한 이번 턴의 상태"""
+    today = datetime.now().strftime("%Y년 %m월 %d일")
 
-            async def astream(self, input: dict, config=None) -> AsyncIterator[str]:
-                await asyncio.sleep(0.01)  # 안정성용 딜레이 (선택사항)
-                yield (
-                    "안녕하세요. 지금부터 대화를 시작하겠습니다. 보다 정확한 이해를 위해, "
-                    "단답형보다는 완전한 문장으로 답변해주시면 감사하겠습니다.\n\n"
-                    "먼저, 오늘은 무슨 요일인지 말씀해주시겠어요?"
-                )
+    # ✅ 첫 턴: 고정 인사 멘트 스트리밍용
+    if turn.stage == ChatStage.greeting:
+        return FixedMessageRunnable(FIRST_TURN_MESSAGE), [], turn.turn
 
-        return FirstTurnRunnable(), memory
+    # ✅ 종료 이후: 고정 종료 안내
+    if turn.stage == ChatStage.closed:
+        return FixedMessageRunnable(CLOSED_MESSAGE), [], turn.turn
 
+    # 메모리 저장소(프로세스 내 LRU 또는 Redis)의 대화 이력. 없으면 DB에서 채웁니다.
+    # (마지막 턴도 인지 신호 추출에 직전 AI 질문이 필요하므로 함께 반환합니다.)
+    chat_history = get_chat_history(
+        chat_id, lambda: _load_history_from_db(chat_id)
+    )
+
+    # ✅ 마지막 턴: 작별 응답
+    if turn.stage == ChatStage.farewell:
+        llm = get_router().streaming_model("chat", temperature=0.1)
+        chain = farewell_prompt | llm
+        return chain, chat_history, turn.turn
 
     # ✅ 일반 대화 흐름
-    llm = ChatGoogleGenerativeAI(
-        model="gemini-1.5-pro-latest",
+    router = get_router()
+    llm = router.streaming_model(
+        "chat",
         temperature=0,
-        streaming=True,
-        google_api_key=google_api_key,
         max_output_tokens=2048,
         top_p=0.8,
         top_k=40
     )
-    retriever = vectordb.as_retriever()
-    docs = retriever.get_relevant_documents(question)
+    # MMSE 영역 턴은 컨텍스트 팩을, 주제 이탈 발화만 실시간 검색 결과를 프롬프트에 채워 넣습니다.
+    docs = retrieve_context(
+        question, chat_history,
+        llm=router.chat_model("chat", router.models_for("chat")[0], temperature=0)
+    )
 
-    system_prompt_filled = system_prompt.format(turn_count=turn_count + 1, today=today)
+    system_prompt_filled = system_prompt.format(turn_count=turn.turn, today=today)
     full_prompt = ChatPromptTemplate.from_messages([
         SystemMessagePromptTemplate.from_template(system_prompt_filled + "\n\n참고 논문(Context): {context}"),
         HumanMessagePromptTemplate.from_template(
@@ -175,11 +167,51 @@ def get_streaming_chain(report_id: int, question: str):
         )
     ])
 
-    chain = ConversationalRetrievalChain.from_llm(
-        llm=llm,
-        retriever=retriever,
-        combine_docs_chain_kwargs={"prompt": full_prompt},
-        verbose=True
+    # 토큰 예산 안에서 참고 논문과 대화 이력(오래된 턴은 누적 요약)을 채웁니다.
+    full_prompt = full_prompt.partial(
+        **assemble_prompt_inputs(chat_id, system_prompt_filled + question, docs, chat_history)
     )
-
-    return chain, chat_history, turn_count
+    chain = full_prompt | llm
+
+    return chain, chat_history, turn.turn
+
+
+async def stream_turn(report_id: int, chat_id: int, message: str, started_at: float = None):
+    """한 턴을 스트리밍으로 처리합니다. (SSE / 음성 WebSocket 공용)
+
+    응답 프레임을 도착하는 대로 yield 하고, 스트림이 끝나면(정상/오류/연결 끊김)
+    사용자 발화 + AI 응답 + 턴 상태를 한 번에 저장합니다.
+    """
+    started_at = started_at or time.perf_counter()
+
+    # 1. 이번 턴 상태 계산 (REST 경로와 같은 상태 머신 사용)
+    async with AsyncSessionLocal() as async_db:
+        turn = await next_turn_async(async_db, chat_id)
+    batch = ChatLogBatch(chat_id, turn)
+    batch.add(RoleEnum.user, message)
+
+    # 2. 검색 등 블로킹 작업이 포함되어 있으므로 스레드에서 체인을 준비합니다.
+    chain, chat_history, _ = await asyncio.to_thread(get_streaming_chain, report_id, message, chat_id, turn)
+    if turn.stage in (ChatStage.questioning, ChatStage.farewell):
+        batch.set_signals(extract_signals(message, chat_history), message)
+
+    # 3. 제공자 토큰을 도착하는 대로 프레임 단위로 전달합니다.
+    response_text = ""
+    frame_count = 0
+    try:
+        async for frame in stream_frames(chain.astream({"question": message}), started_at):
+            frame_count += 1
+            response_text += frame
+            yield frame
+    finally:
+        if response_text:
+            batch.add(RoleEnum.ai, response_text)
+        await asyncio.shield(batch.flush_async())
+
+    logging.info(
+        f"Stream finished for chat_id: {chat_id} - frames: {frame_count}, "
+        f"length: {len(response_text)}, elapsed: {time.perf_counter() - started_at:.2f}s"
+    )
+    await asyncio.to_thread(remember_turn, chat_id, message, response_text)
+    if turn.stage == ChatStage.questioning and response_text:
+        schedule_summary_update(chat_id, chat_history + [("user", message), ("ai", response_text)])
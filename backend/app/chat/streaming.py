@@ -0,0 +1,123 @@
+# app/chat/streaming.py
+"""
+LLM 토큰 스트리밍 유틸
+
+- 제공자(provider) 토큰을 도착하는 즉시 전달합니다. (인위적인 sleep 없음)
+- 아주 작은 토큰은 시간/바이트 윈도우 안에서 하나의 프레임으로 합칩니다.
+- 클라이언트가 느리게 읽으면 그동안 쌓인 토큰을 다음 프레임에 모아 보냅니다. (back-pressure)
+"""
+import asyncio
+import os
+import time
+from typing import AsyncIterator
+
+from prometheus_client import Histogram
+
+# 프레임 병합 윈도우 (0이면 대기 없이 즉시 전송)
+STREAM_FLUSH_INTERVAL_MS = float(os.getenv("STREAM_FLUSH_INTERVAL_MS", "30"))
+STREAM_FLUSH_BYTES = int(os.getenv("STREAM_FLUSH_BYTES", "48"))
+
+STREAM_TTFT_SECONDS = Histogram(
+    "chat_stream_time_to_first_token_seconds",
+    "스트리밍 시작부터 첫 토큰 프레임 전송까지 걸린 시간",
+    buckets=(0.1, 0.25, 0.5, 1, 2, 3, 5, 8, 13, 20),
+)
+STREAM_DURATION_SECONDS = Histogram(
+    "chat_stream_duration_seconds",
+    "스트리밍 시작부터 마지막 프레임 전송까지 걸린 시간",
+    buckets=(0.5, 1, 2, 3, 5, 8, 13, 20, 30, 60),
+)
+
+_END = object()
+
+
+def extract_token(chunk) -> str:
+    """LangChain 체인 종류별로 다른 chunk 타입에서 텍스트를 꺼냅니다."""
+    if isinstance(chunk, str):
+        return chunk
+    if isinstance(chunk, dict) and "answer" in chunk:
+        return chunk["answer"] or ""
+    return getattr(chunk, "content", "") or ""
+
+
+async def coalesce_tokens(
+    chunks: AsyncIterator,
+    interval_ms: float = STREAM_FLUSH_INTERVAL_MS,
+    max_bytes: int = STREAM_FLUSH_BYTES,
+) -> AsyncIterator[str]:
+    """토큰을 프레임 단위로 합쳐서 내보냅니다.
+
+    제공자 스트림은 별도 태스크에서 계속 읽어 큐에 쌓고, 소비 측은 프레임을 보낼 때마다
+    큐에 쌓인 토큰을 모두 가져갑니다. 따라서 클라이언트가 느리면 프레임이 커지고,
+    빠르면 interval_ms / max_bytes 기준으로 잘게 전송됩니다.
+    """
+    queue: asyncio.Queue = asyncio.Queue()
+
+    async def produce():
+        try:
+            async for chunk in chunks:
+                token = extract_token(chunk)
+                if token:
+                    await queue.put(token)
+            await queue.put(_END)
+        except Exception as e:
+            await queue.put(e)
+
+    producer = asyncio.create_task(produce())
+    interval = interval_ms / 1000
+    finished = False
+    error = None
+    try:
+        while not finished:
+            item = await queue.get()
+            if item is _END:
+                break
+            if isinstance(item, Exception):
+                raise item
+
+            parts = [item]
+            size = len(item.encode("utf-8"))
+            deadline = time.monotonic() + interval
+            while True:
+                # 이미 도착한 토큰은 기다리지 않고 모두 합칩니다.
+                if not queue.empty():
+                    item = queue.get_nowait()
+                elif size < max_bytes and (remaining := deadline - time.monotonic()) > 0:
+                    try:
+                        item = await asyncio.wait_for(queue.get(), remaining)
+                    except asyncio.TimeoutError:
+                        break
+                else:
+                    break
+
+                if item is _END:
+                    finished = True
+                    break
+                if isinstance(item, Exception):
+                    # 이미 받은 토큰을 먼저 내보낸 뒤 예외를 전달합니다.
+                    error = item
+                    finished = True
+                    break
+                parts.append(item)
+                size += len(item.encode("utf-8"))
+
+            yield "".join(parts)
+        if error is not None:
+            raise error
+    finally:
+        if not producer.done():
+            producer.cancel()
+
+
+async def stream_frames(chunks: AsyncIterator, started_at: float = None) -> AsyncIterator[str]:
+    """coalesce_tokens에 첫 토큰 시간(TTFT)과 전체 스트리밍 시간 메트릭을 더한 래퍼"""
+    started_at = started_at if started_at is not None else time.perf_counter()
+    first = True
+    try:
+        async for frame in coalesce_tokens(chunks):
+            if first:
+                STREAM_TTFT_SECONDS.observe(time.perf_counter() - started_at)
+                first = False
+            yield frame
+    finally:
+        STREAM_DURATION_SECONDS.observe(time.perf_counter() - started_at)
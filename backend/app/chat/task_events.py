@@ -0,0 +1,83 @@
+# app/chat/task_events.py
+"""
+음성 작업(Celery 체인) 진행 이벤트
+
+STT → AI 응답 → TTS 각 단계가 끝날 때마다 워커가 Redis에 이벤트를 발행합니다.
+- voice_job:{job_id}:events (list): 지금까지의 이벤트 (늦게 연결한 구독자 재생용, TTL)
+- voice_job:{job_id} (pub/sub 채널): 새 이벤트 알림
+이벤트 seq는 목록 위치(1부터)이며, 구독자는 재생한 seq 이후 이벤트만 전달합니다.
+
+단계: stt_done {transcript} → ai_done {response} → done {audio_key} / failed {stage, message}
+"""
+import json
+import logging
+import os
+import time
+
+from app.clients import get_async_redis, get_redis
+
+logger = logging.getLogger(__name__)
+
+VOICE_EVENT_TTL_SECONDS = int(os.getenv("VOICE_EVENT_TTL_SECONDS", os.getenv("CELERY_RESULT_EXPIRES", "3600")))
+# SSE 연결 하나가 기다리는 최대 시간(초)
+VOICE_EVENT_WAIT_SECONDS = float(os.getenv("VOICE_EVENT_WAIT_SECONDS", "120"))
+TERMINAL_STAGES = ("done", "failed")
+
+
+def _channel(job_id: str) -> str:
+    return f"voice_job:{job_id}"
+
+
+def _events_key(job_id: str) -> str:
+    return f"voice_job:{job_id}:events"
+
+
+def publish_event(job_id: str, stage: str, **data):
+    """(워커) 단계 이벤트를 기록하고 구독자에게 알립니다. 실패해도 작업은 계속 진행합니다."""
+    if not job_id:
+        return
+    event = json.dumps({"stage": stage, **data}, ensure_ascii=False)
+    try:
+        client = get_redis()
+        key = _events_key(job_id)
+        with client.pipeline() as pipe:
+            pipe.rpush(key, event)
+            pipe.expire(key, VOICE_EVENT_TTL_SECONDS)
+            seq, _ = pipe.execute()
+        client.publish(_channel(job_id), json.dumps({"seq": seq, "event": event}))
+    except Exception:
+        logger.exception(f"음성 작업 이벤트 발행 실패 - job_id: {job_id}, stage: {stage}")
+
+
+async def iter_events(job_id: str, wait_seconds: float = VOICE_EVENT_WAIT_SECONDS):
+    """(API) 지난 이벤트를 재생한 뒤 새 이벤트를 기다리며 하나씩 넘겨줍니다. 종료 단계에서 끝납니다."""
+    client = get_async_redis()
+    pubsub = client.pubsub()
+    # 재생과 구독 사이에 발행된 이벤트를 놓치지 않도록 먼저 구독합니다.
+    await pubsub.subscribe(_channel(job_id))
+    try:
+        last_seq = 0
+        for raw in await client.lrange(_events_key(job_id), 0, -1):
+            last_seq += 1
+            event = json.loads(raw)
+            yield event
+            if event["stage"] in TERMINAL_STAGES:
+                return
+
+        deadline = time.monotonic() + wait_seconds
+        while (remaining := deadline - time.monotonic()) > 0:
+            message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=min(remaining, 15))
+            if message is None:
+                continue
+            data = json.loads(message["data"])
+            if data["seq"] <= last_seq:
+                continue
+            last_seq = data["seq"]
+            event = json.loads(data["event"])
+            yield event
+            if event["stage"] in TERMINAL_STAGES:
+                return
+        yield {"stage": "timeout"}
+    finally:
+        await pubsub.unsubscribe(_channel(job_id))
+        await pubsub.reset()
@@ -0,0 +1,182 @@
+# app/chat/voice_session.py
+"""
+음성 대화 WebSocket 세션
+
+하나의 연결에서 음성 업로드 → 전사(transcript) → LLM 토큰 → 문장 단위 음성을 차례로 흘려보냅니다.
+Celery 체인 + 작업 상태 폴링 대신, 각 단계가 결과를 만드는 즉시 클라이언트에 전달합니다.
+응답은 별도 태스크에서 진행하므로, 응답을 보내는 동안에도 다음 발화 음성과 cancel 을 계속 받습니다.
+
+클라이언트 → 서버
+- binary: 녹음된 음성 조각 (발화 하나가 끝날 때까지 이어 붙임)
+- {"type": "start", "filename": "voice.webm"}: 새 발화 시작 (파일 확장자로 형식 판단)
+- {"type": "start", "format": "pcm16"}: PCM16 16kHz 모노로 녹음 중에 보내면 말하는 동안 구간별로 미리 전사
+- {"type": "end_audio"}: 발화 끝 → 전사 후 응답
+- {"type": "text", "message": "..."}: 음성 대신 텍스트로 응답 요청
+- {"type": "cancel"}: 진행 중인 응답 중단 (받은 만큼은 저장)
+
+서버 → 클라이언트
+- {"type": "partial_transcript", "text"}: (pcm16) 지금까지의 부분 전사 결과
+- {"type": "transcript", "text"}: 사용자 발화 전사 결과
+- {"type": "token", "token"}: LLM 응답 프레임
+- {"type": "audio", "seq", "text"} + binary(mp3): 응답 문장 하나의 음성
+- {"type": "done", "response"}: 턴 종료 / {"type": "cancelled"}: 응답 중단 / {"type": "error", "message"}: 오류
+"""
+import asyncio
+import json
+import logging
+import os
+import time
+
+from fastapi import HTTPException, WebSocket, WebSocketDisconnect
+
+from app.chat.stream_handler import stream_turn
+from app.trans.stt import transcribe_bytes
+from app.trans.stt_stream import IncrementalTranscriber
+from app.trans.tts import split_sentences, synthesize_speech
+
+logger = logging.getLogger(__name__)
+
+VOICE_MAX_AUDIO_BYTES = int(os.getenv("VOICE_MAX_AUDIO_BYTES", str(10 * 1024 * 1024)))
+
+
+class VoiceSession:
+    def __init__(self, websocket: WebSocket, report_id: int, chat_id: int):
+        self.websocket = websocket
+        self.report_id = report_id
+        self.chat_id = chat_id
+        self.audio = bytearray()
+        self.filename = "voice.webm"
+        self.transcriber = None
+        self.turn_task = None
+        # 응답 태스크와 수신 루프가 함께 보내므로 (audio 이벤트 + 음성) 묶음이 섞이지 않게 합니다.
+        self._send_lock = asyncio.Lock()
+
+    async def send_event(self, event_type: str, **data):
+        async with self._send_lock:
+            await self.websocket.send_text(json.dumps({"type": event_type, **data}, ensure_ascii=False))
+
+    async def run(self):
+        try:
+            while True:
+                message = await self.websocket.receive()
+                if message["type"] == "websocket.disconnect":
+                    return
+                if message.get("bytes") is not None and self.transcriber:
+                    await self.transcriber.feed(message["bytes"])
+                elif message.get("bytes") is not None:
+                    self.audio.extend(message["bytes"])
+                    if len(self.audio) > VOICE_MAX_AUDIO_BYTES:
+                        self.audio.clear()
+                        await self.send_event("error", message="음성 파일이 너무 큽니다.")
+                elif message.get("text"):
+                    try:
+                        data = json.loads(message["text"])
+                    except ValueError:
+                        data = None
+                    if not isinstance(data, dict):
+                        await self.send_event("error", message="잘못된 메시지 형식입니다.")
+                        continue
+                    await self.handle_command(data)
+        except WebSocketDisconnect:
+            return
+        finally:
+            if self.transcriber:
+                self.transcriber.cancel()
+            if self.turn_task and not self.turn_task.done():
+                self.turn_task.cancel()
+
+    async def send_partial(self, text: str):
+        await self.send_event("partial_transcript", text=text)
+
+    @property
+    def replying(self) -> bool:
+        return self.turn_task is not None and not self.turn_task.done()
+
+    async def handle_command(self, data: dict):
+        command = data.get("type")
+        if command == "start":
+            self.audio.clear()
+            self.filename = data.get("filename") or self.filename
+            if self.transcriber:
+                self.transcriber.cancel()
+            self.transcriber = IncrementalTranscriber(self.send_partial) if data.get("format") == "pcm16" else None
+        elif command == "cancel":
+            if self.replying:
+                self.turn_task.cancel()
+                await asyncio.gather(self.turn_task, return_exceptions=True)
+                await self.send_event("cancelled")
+        elif command in ("end_audio", "text"):
+            if self.replying:
+                await self.send_event("error", message="이전 응답이 아직 끝나지 않았습니다.")
+                return
+            if command == "text":
+                source = data.get("message", "")
+            elif self.transcriber:
+                source, self.transcriber = self.transcriber, None
+            else:
+                source, self.audio = bytes(self.audio), bytearray()
+            self.turn_task = asyncio.create_task(self.run_turn(source))
+        else:
+            await self.send_event("error", message=f"알 수 없는 메시지 형식입니다: {command}")
+
+    async def run_turn(self, source):
+        """(응답 태스크) 필요하면 전사한 뒤 응답합니다. source: 텍스트 / 녹음 음성 / 증분 전사기"""
+        try:
+            if isinstance(source, IncrementalTranscriber):
+                text = await source.finish()
+                if not text:
+                    await self.send_event("error", message="음성을 인식하지 못했습니다.")
+                    return
+            elif isinstance(source, bytes):
+                if not source:
+                    await self.send_event("error", message="음성 데이터가 없습니다.")
+                    return
+                text = await asyncio.to_thread(transcribe_bytes, source, self.filename)
+            else:
+                text = source
+            await self.reply(text)
+        except (WebSocketDisconnect, asyncio.CancelledError):
+            raise
+        except HTTPException as e:
+            await self.send_event("error", message=str(e.detail))
+        except Exception:
+            logger.exception(f"음성 세션 처리 중 오류 - chat_id: {self.chat_id}")
+            await self.send_event("error", message="음성 대화 처리 중 오류가 발생했습니다.")
+
+    async def reply(self, message: str):
+        """전사 결과를 보내고, 응답 토큰과 문장별 음성을 스트리밍합니다."""
+        started_at = time.perf_counter()
+        await self.send_event("transcript", text=message)
+
+        # 토큰 스트리밍과 음성 합성을 겹쳐서 진행합니다. 완성된 문장부터 순서대로 합성해 보냅니다.
+        sentences = asyncio.Queue()
+        speaker = asyncio.create_task(self._speak(sentences))
+        response_text, pending = "", ""
+        try:
+            async for frame in stream_turn(self.report_id, self.chat_id, message, started_at):
+                response_text += frame
+                await self.send_event("token", token=frame)
+                done, pending = split_sentences(pending + frame)
+                for sentence in done:
+                    sentences.put_nowait(sentence)
+            if pending.strip():
+                sentences.put_nowait(pending.strip())
+            sentences.put_nowait(None)
+            await speaker
+        finally:
+            if not speaker.done():
+                speaker.cancel()
+
+        await self.send_event("done", response=response_text)
+        logger.info(f"음성 턴 완료 - chat_id: {self.chat_id}, elapsed: {time.perf_counter() - started_at:.2f}s")
+
+    async def _speak(self, sentences: asyncio.Queue):
+        seq = 0
+        while (sentence := await sentences.get()) is not None:
+            audio = await synthesize_speech(sentence)
+            async with self._send_lock:
+                await self.websocket.send_text(
+                    json.dumps({"type": "audio", "seq": seq, "text": sentence}, ensure_ascii=False)
+                )
+                await self.websocket.send_bytes(audio)
+            seq += 1
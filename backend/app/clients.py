@@ -0,0 +1,168 @@
+# app/clients.py
+"""
+LLM / 임베딩 / 벡터DB 클라이언트 레지스트리
+
+요청마다 클라이언트를 새로 만들면 TLS 핸드셰이크와 초기화 비용을 매번 치르게 됩니다.
+여기서 만든 클라이언트는 프로세스 단위로 한 번만 생성(lazy)되고, 이후 요청에서 재사용됩니다.
+"""
+import asyncio
+import os
+import threading
+import weakref
+
+import chromadb
+import httpx
+import redis
+import redis.asyncio as aioredis
+from openai import OpenAI
+from langchain_community.vectorstores import Chroma
+from langchain_google_genai import ChatGoogleGenerativeAI, GoogleGenerativeAIEmbeddings
+
+from app.embedding_cache import CachedQueryEmbeddings, EMBEDDING_CACHE_REDIS
+
+REDIS_URL = os.getenv("REDIS_URL", "redis://redis:6379/1")
+CHROMA_HOST = os.getenv("CHROMA_HOST", "chroma-server")
+CHROMA_PORT = int(os.getenv("CHROMA_PORT", "8000"))
+COLLECTION_NAME = os.getenv("CHROMA_COLLECTION", "dementia_gemini_v1")
+EMBEDDING_MODEL = "models/embedding-001"
+
+# keep-alive 커넥션 풀 설정
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "100"))
+HTTP_MAX_KEEPALIVE = int(os.getenv("HTTP_MAX_KEEPALIVE", "20"))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "60"))
+HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", "60"))
+# HTTP/2를 쓰면 한 커넥션에서 여러 요청을 동시에 보냅니다. (h2 패키지 필요)
+HTTP2_ENABLED = os.getenv("HTTP2_ENABLED", "true").lower() == "true"
+try:
+    import h2  # noqa: F401
+except ImportError:
+    # h2가 없으면 httpx.AsyncClient(http2=True)가 ImportError를 내므로 HTTP/1.1로 동작합니다.
+    HTTP2_ENABLED = False
+
+_clients = {}
+_lock = threading.Lock()
+# 이벤트 루프별 AsyncClient (루프 객체를 키로 써서, 루프가 사라진 뒤 id()가 재사용돼도 섞이지 않게 합니다)
+_async_http_clients = weakref.WeakKeyDictionary()
+
+
+def _get_or_create(key, factory):
+    """key에 해당하는 클라이언트가 없을 때만 factory로 생성합니다."""
+    client = _clients.get(key)
+    if client is not None:
+        return client
+    with _lock:
+        client = _clients.get(key)
+        if client is None:
+            client = factory()
+            _clients[key] = client
+    return client
+
+
+def _google_api_key() -> str:
+    return os.environ.get("GOOGLE_API_KEY")
+
+
+def _http_limits() -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=HTTP_MAX_CONNECTIONS,
+        max_keepalive_connections=HTTP_MAX_KEEPALIVE,
+        keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+    )
+
+
+def get_chat_model(
+    model: str = "gemini-1.5-pro-latest",
+    temperature: float = 0.5,
+    streaming: bool = False,
+    api_key: str = None,
+    **options,
+) -> ChatGoogleGenerativeAI:
+    """모델/temperature/streaming/추가 옵션 조합별로 공유되는 Gemini 챗 모델"""
+    key = ("chat", model, temperature, streaming, api_key, tuple(sorted(options.items())))
+    return _get_or_create(key, lambda: ChatGoogleGenerativeAI(
+        model=model,
+        temperature=temperature,
+        streaming=streaming,
+        google_api_key=api_key or _google_api_key(),
+        **options,
+    ))
+
+
+def get_embeddings(model: str = EMBEDDING_MODEL) -> GoogleGenerativeAIEmbeddings:
+    return _get_or_create(("embeddings", model), lambda: GoogleGenerativeAIEmbeddings(
+        model=model,
+        google_api_key=_google_api_key(),
+    ))
+
+
+def get_query_embeddings(model: str = EMBEDDING_MODEL) -> CachedQueryEmbeddings:
+    """검색 질의용 임베딩 (정규화된 발화 기준 LRU + 선택적 Redis 캐시)"""
+    return _get_or_create(("query_embeddings", model), lambda: CachedQueryEmbeddings(
+        get_embeddings(model),
+        model=model,
+        redis_client=get_redis() if EMBEDDING_CACHE_REDIS else None,
+    ))
+
+
+def get_chroma_client(host: str = CHROMA_HOST, port: int = CHROMA_PORT):
+    return _get_or_create(("chroma", host, port), lambda: chromadb.HttpClient(host=host, port=port))
+
+
+def get_vectordb(collection_name: str = COLLECTION_NAME) -> Chroma:
+    return _get_or_create(("vectordb", collection_name), lambda: Chroma(
+        client=get_chroma_client(),
+        collection_name=collection_name,
+        embedding_function=get_query_embeddings(),
+    ))
+
+
+def get_http_client() -> httpx.Client:
+    """keep-alive 커넥션 풀을 유지하는 공용 동기 HTTP 클라이언트"""
+    return _get_or_create(("http",), lambda: httpx.Client(
+        limits=_http_limits(),
+        timeout=HTTP_TIMEOUT,
+        follow_redirects=True,
+    ))
+
+
+def get_async_http_client() -> httpx.AsyncClient:
+    """keep-alive 커넥션 풀을 유지하는 공용 비동기 HTTP 클라이언트 (HTTP/2)
+
+    AsyncClient는 만든 이벤트 루프에 묶이므로 루프마다 하나씩 둡니다.
+    (API 서버 루프, Celery 워커 프로세스의 상주 루프)
+    """
+    loop = asyncio.get_running_loop()
+    client = _async_http_clients.get(loop)
+    if client is not None:
+        return client
+    with _lock:
+        client = _async_http_clients.get(loop)
+        if client is None:
+            # 닫힌 루프의 클라이언트는 더 쓸 수 없으므로 버립니다. (커넥션이 루프를 참조해 약한 참조만으로는 안 지워짐)
+            for closed_loop in [other for other in _async_http_clients if other.is_closed()]:
+                del _async_http_clients[closed_loop]
+            client = httpx.AsyncClient(
+                limits=_http_limits(),
+                timeout=HTTP_TIMEOUT,
+                follow_redirects=True,
+                http2=HTTP2_ENABLED,
+            )
+            _async_http_clients[loop] = client
+    return client
+
+
+def get_openai_client() -> OpenAI:
+    return _get_or_create(("openai",), lambda: OpenAI(
+        api_key=os.getenv("OPENAI_API_KEY"),
+        http_client=httpx.Client(limits=_http_limits(), timeout=HTTP_TIMEOUT),
+    ))
+
+
+def get_redis(url: str = REDIS_URL) -> redis.Redis:
+    """공용 Redis 클라이언트 (커넥션 풀 공유, 캐시/메모리 저장소용)"""
+    return _get_or_create(("redis", url), lambda: redis.Redis.from_url(url))
+
+
+def get_async_redis(url: str = REDIS_URL) -> aioredis.Redis:
+    """공용 asyncio Redis 클라이언트 (API 이벤트 루프 전용, pub/sub 구독용)"""
+    return _get_or_create(("async_redis", url), lambda: aioredis.Redis.from_url(url))
@@ -1,6 +1,6 @@
 from fastapi import APIRouter, UploadFile, File, Form, Depends, HTTPException
-from sqlalchemy.orm import Session
-from app.database import get_db
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.database import get_async_db
 from . import service
 from app.auth.utils import get_current_user
 from app.auth.models import User
@@ -16,14 +16,14 @@ router = APIRouter()
 async def upload_drawing_test(
     reportId: int = Form(..., description="리포트 ID"),
     file: UploadFile = File(..., description="업로드할 시계 그림 이미지 파일"),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ):
     """
     드로잉 테스트(시계 그림)를 업로드하고 AI 분석 결과를 반환
     """
     # 리포트 소유권 확인
-    report = db.query(Report).filter(Report.report_id == reportId).first()
+    report = await db.get(Report, reportId)
     if not report:
         raise HTTPException(status_code=404, detail="Report not found")
     
@@ -1,4 +1,5 @@
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from . import models
 
 # 드로잉 테스트 결과 저장
@@ -18,6 +19,23 @@ def create_drawing_test(
     db.refresh(db_drawing)
     return db_drawing
 
+# 드로잉 테스트 결과 저장 (비동기 세션)
+async def create_drawing_test_async(
+    db: AsyncSession,
+    report_id: int,
+    image_url: str,
+    risk_score: int,
+):
+    db_drawing = models.DrawingTest(
+        report_id=report_id,
+        image_url=image_url,
+        risk_score=risk_score,
+    )
+    db.add(db_drawing)
+    await db.commit()
+    await db.refresh(db_drawing)
+    return db_drawing
+
 # report_id로 드로잉 테스트 결과 1건 조회
 def get_drawing_test_by_report_id(db: Session, report_id: int):
     return db.query(models.DrawingTest)\
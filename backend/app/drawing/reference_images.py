@@ -0,0 +1,100 @@
+# app/drawing/reference_images.py
+"""
+시계 그리기(Shulman) 점수별 예시 이미지 few-shot 블록 캐시
+
+예시 이미지는 바뀌지 않으므로 업로드마다 파일을 읽고 base64로 인코딩하지 않고,
+(설명 문구 + 축소된 이미지 data URL) 블록을 한 번만 만들어 불변 튜플로 재사용합니다.
+파일의 mtime/크기가 바뀌면 다음 호출에서 다시 만듭니다.
+"""
+import base64
+import io
+import logging
+import os
+import threading
+
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+REFERENCE_DIR = "static/uploads/drawings"
+# (점수 설명, 파일명)
+REFERENCE_IMAGES = (
+    ("5점", "시계5점-1.PNG"),
+    ("4점", "시계4점-1.PNG"),
+    ("3점", "시계3점-1.PNG"),
+    ("2점", "시계2점-1.PNG"),
+    ("2점", "시계2점-3.PNG"),
+    ("1점", "시계1점-1.PNG"),
+    ("1점", "시계1점-2.PNG"),
+    ("1점", "시계1점-3.PNG"),
+    ("0점", "시계0점-1.PNG"),
+)
+# 예시 이미지의 긴 변 최대 픽셀 (넘으면 축소)
+DRAWING_REFERENCE_MAX_SIDE = int(os.getenv("DRAWING_REFERENCE_MAX_SIDE", "768"))
+
+_block = ()
+_signature = None
+_lock = threading.Lock()
+
+
+def _resolve(filename: str, directory: str = REFERENCE_DIR):
+    """파일 경로. 확장자 대소문자가 다른 파일(.PNG/.png)도 찾습니다. 없으면 None"""
+    path = os.path.join(directory, filename)
+    if os.path.exists(path):
+        return path
+    try:
+        names = os.listdir(directory)
+    except FileNotFoundError:
+        return None
+    match = next((name for name in names if name.lower() == filename.lower()), None)
+    return os.path.join(directory, match) if match else None
+
+
+def _file_signature(paths) -> tuple:
+    signature = []
+    for path in paths:
+        try:
+            stat = os.stat(path)
+            signature.append((path, stat.st_mtime_ns, stat.st_size))
+        except (OSError, TypeError):
+            signature.append((path, None, None))
+    return tuple(signature)
+
+
+def encode_image(path: str, max_side: int = DRAWING_REFERENCE_MAX_SIDE) -> str:
+    """이미지를 (필요하면 축소해) PNG data URL로 만듭니다."""
+    with open(path, "rb") as f:
+        data = f.read()
+    with Image.open(io.BytesIO(data)) as image:
+        if max(image.size) > max_side:
+            image.thumbnail((max_side, max_side), Image.LANCZOS)
+            buffer = io.BytesIO()
+            image.save(buffer, format="PNG", optimize=True)
+            data = buffer.getvalue()
+    return f"data:image/png;base64,{base64.b64encode(data).decode('utf-8')}"
+
+
+def _build(paths) -> tuple:
+    block = []
+    for (score_text, filename), path in zip(REFERENCE_IMAGES, paths):
+        if path is None:
+            logger.warning(f"시계 예시 이미지가 없습니다: {filename}")
+            continue
+        block.append({"type": "text", "text": f"아래 이미지는 {score_text} 예시입니다."})
+        block.append({"type": "image_url", "image_url": {"url": encode_image(path)}})
+    return tuple(block)
+
+
+def get_reference_block() -> tuple:
+    """점수별 예시(설명 + 이미지) 메시지 블록. 호출 측에서 수정하지 말고 이어 붙여서 사용합니다."""
+    global _block, _signature
+    paths = [_resolve(filename) for _, filename in REFERENCE_IMAGES]
+    signature = _file_signature(paths)
+    if signature == _signature:
+        return _block
+    with _lock:
+        if signature != _signature:
+            _block = _build(paths)
+            _signature = signature
+            logger.info(f"시계 예시 이미지 블록 생성 - {len(_block) // 2}장")
+    return _block
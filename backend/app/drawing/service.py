@@ -1,12 +1,14 @@
 import os
+import asyncio
 import base64
 import json
-import requests
 from dotenv import load_dotenv
-from openai import OpenAI
 from . import crud, utils
-from sqlalchemy.orm import Session
-from fastapi import Depends, HTTPException
+from app.clients import get_http_client, get_openai_client
+from app.llm_router import get_router
+from app.drawing.reference_images import get_reference_block
+from sqlalchemy.ext.asyncio import AsyncSession
+from fastapi import HTTPException
 import re
 from ..report.models import Report, RiskLevel
 from urllib.parse import urlparse
@@ -60,44 +62,15 @@ PROMPT = (
 
 
 def call_gpt_vision(image_url: str):
-    client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-
-    example_image_info = [
-        ("5점", "static/uploads/drawings/시계5점-1.PNG"),
-        ("4점", "static/uploads/drawings/시계4점-1.PNG"),
-        ("3점", "static/uploads/drawings/시계3점-1.PNG"),
-        ("2점", "static/uploads/drawings/시계2점-1.PNG"),
-        ("2점", "static/uploads/drawings/시계2점-3.PNG"),
-        ("1점", "static/uploads/drawings/시계1점-1.PNG"),
-        ("1점", "static/uploads/drawings/시계1점-2.PNG"),
-        ("1점", "static/uploads/drawings/시계1점-3.PNG"),
-        ("0점", "static/uploads/drawings/시계0점-1.PNG"),
-    ]
-
-    def img_to_base64(path):
-        try:
-            with open(path, "rb") as f:
-                return base64.b64encode(f.read()).decode('utf-8')
-        except FileNotFoundError as e:
-            print(f"Error: Missing example image file: {path}")
-            return None
+    router = get_router()
 
     # S3 URL에서 이미지 다운로드
-    response = requests.get(image_url)
+    response = get_http_client().get(image_url)
     response.raise_for_status()
     image_data = base64.b64encode(response.content).decode('utf-8')
 
-    content_list = [
-        {"type": "text", "text": PROMPT}
-    ]
-    for score_text, img_path in example_image_info:
-        content_list.append({"type": "text", "text": f"아래 이미지는 {score_text} 예시입니다."})
-        img_base64 = img_to_base64(img_path)
-        if img_base64:
-            content_list.append({"type": "image_url", "image_url": {"url": f"data:image/png;base64,{img_base64}"}})
-        else:
-            print(f"Warning: Could not load image {img_path}")
-
+    # 프롬프트 + 점수별 예시 블록은 캐시된 불변 블록을 그대로 앞에 붙입니다.
+    content_list = [{"type": "text", "text": PROMPT}, *get_reference_block()]
     content_list.append({"type": "text", "text": "아래 이미지는 사용자가 그린 그림입니다."})
     content_list.append({"type": "image_url", "image_url": {"url": f"data:image/png;base64,{image_data}"}})
 
@@ -108,11 +81,15 @@ def call_gpt_vision(image_url: str):
         }
     ]
 
-    response = client.chat.completions.create(
-        model="gpt-4o",
+    # 모델 선택/마감 시간/대체 모델은 LLM 라우터의 vision 정책을 따릅니다.
+    policy = router.policies["vision"]
+    response = router.call("vision", lambda model, timeout: get_openai_client().with_options(
+        timeout=timeout, max_retries=policy.retries
+    ).chat.completions.create(
+        model=model,
         messages=messages,
         max_tokens=700,
-    )
+    ))
     content = response.choices[0].message.content or ""
 
     # === 코드블록(```json ... ```) 안에 있으면 JSON만 추출해서 파싱 ===
@@ -152,18 +129,18 @@ def get_drawing_risk_level(drawing_score: int) -> RiskLevel:
 async def handle_upload(
         file,                  # UploadFile
         report_id: int,        # Form 데이터(reportId)
-        db: Session = Depends()
+        db: AsyncSession
 ):
     """
     file: 업로드된 이미지 파일
     report_id: 연결할 리포트 ID
-    db: DB 세션
+    db: 비동기 DB 세션
     """
     import logging
     logger = logging.getLogger(__name__)
 
     # 리포트 존재 여부 확인
-    db_report = db.query(Report).filter(Report.report_id == report_id).first()
+    db_report = await db.get(Report, report_id)
     if not db_report:
         raise HTTPException(status_code=404, detail="Report not found")
 
@@ -180,16 +157,16 @@ async def handle_upload(
         s3_key = parsed.path.lstrip("/")  # 'drawings/abc.png'
         presigned_url = utils.generate_presigned_url(s3_key)
 
-        # GPT Vision 분석 (원래 S3 URL로 전송)
+        # GPT Vision 분석 (원래 S3 URL로 전송) - 블로킹 호출이므로 스레드에서 실행
         logger.info("GPT Vision 분석 시작")
-        risk_score, drawing_score, drawingtest_result = call_gpt_vision(image_url)
+        risk_score, drawing_score, drawingtest_result = await asyncio.to_thread(call_gpt_vision, image_url)
         logger.info(f"GPT Vision 분석 완료 - 점수: {drawing_score}")
 
         risk_level = get_drawing_risk_level(drawing_score)
 
         # drawing_test 테이블에는 이미지 URL과 risk_score만 저장
         logger.info("DB에 drawing_test 저장 시작")
-        db_obj = crud.create_drawing_test(
+        db_obj = await crud.create_drawing_test_async(
             db=db,
             report_id=report_id,
             image_url=image_url,
@@ -197,15 +174,13 @@ async def handle_upload(
         )
         logger.info("DB에 drawing_test 저장 완료")
 
-        # Report 테이블 업데이트 - ORM 사용으로 변경
+        # Report 테이블 업데이트
         logger.info("Report 테이블 업데이트 시작")
-        report = db.query(Report).filter(Report.report_id == report_id).first()
-        if report:
-            report.drawing_score = drawing_score
-            report.drawingtest_result = drawingtest_result
-            report.drawing_risk = risk_level
-            db.commit()
-            logger.info("Report 테이블 업데이트 완료")
+        db_report.drawing_score = drawing_score
+        db_report.drawingtest_result = drawingtest_result
+        db_report.drawing_risk = risk_level
+        await db.commit()
+        logger.info("Report 테이블 업데이트 완료")
 
         # API 응답은 기존과 동일하게 모든 정보를 포함
         return {
@@ -0,0 +1,127 @@
+# app/embedding_cache.py
+"""
+질의(query) 임베딩 캐시
+
+어르신들의 답변은 "잘 모르겠어요", 요일 답변처럼 반복되는 경우가 많습니다.
+정규화한 발화 텍스트를 키로 임베딩을 캐시해서, 같은 발화는 임베딩 API를 다시 호출하지 않습니다.
+- 1단계: 프로세스 내 LRU (TTL)
+- 2단계: Redis (EMBEDDING_CACHE_REDIS=1 일 때, 워커 간 공유)
+"""
+import hashlib
+import logging
+import os
+import re
+import unicodedata
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from prometheus_client import Counter
+
+from app.cache import LRUCache
+
+logger = logging.getLogger(__name__)
+
+EMBEDDING_CACHE_SIZE = int(os.getenv("EMBEDDING_CACHE_SIZE", "5000"))
+EMBEDDING_CACHE_TTL_SECONDS = int(os.getenv("EMBEDDING_CACHE_TTL_SECONDS", str(60 * 60 * 24)))
+EMBEDDING_CACHE_REDIS = os.getenv("EMBEDDING_CACHE_REDIS", "0") == "1"
+
+# 시작 시 미리 임베딩해 둘 자주 나오는 발화
+COMMON_UTTERANCES = [
+    "잘 모르겠어요", "모르겠어요", "몰라요", "기억이 안 나요", "기억 안 나", "생각이 안 나요",
+    "글쎄요", "딱히 없어요", "그냥 그랬어요", "할 말 없어요", "네", "아니요",
+    "월요일이에요", "화요일이에요", "수요일이에요", "목요일이에요", "금요일이에요", "토요일이에요", "일요일이에요",
+    "오늘은 월요일", "오늘은 화요일", "오늘은 수요일", "오늘은 목요일", "오늘은 금요일", "오늘은 토요일", "오늘은 일요일",
+    "집에 있어요", "집에서 지내요", "노인정에 가요", "경로당에 다녀왔어요",
+]
+
+EMBEDDING_CACHE_LOOKUPS = Counter(
+    "embedding_cache_lookups_total", "질의 임베딩 캐시 조회 수", ["tier", "result"]
+)
+
+_TRAILING_PUNCT = re.compile(r"[\s.,!?~…·]+$")
+_SPACES = re.compile(r"\s+")
+
+
+def normalize_utterance(text: str) -> str:
+    """캐시 키용 정규화: 유니코드 NFC, 소문자, 공백 축약, 끝 문장부호 제거"""
+    text = unicodedata.normalize("NFC", text or "").strip().lower()
+    text = _SPACES.sub(" ", text)
+    return _TRAILING_PUNCT.sub("", text)
+
+
+class CachedQueryEmbeddings(Embeddings):
+    """embed_query 결과를 캐시하는 임베딩 래퍼 (embed_documents는 그대로 위임)"""
+
+    def __init__(self, embeddings: Embeddings, model: str, redis_client=None,
+                 maxsize: int = EMBEDDING_CACHE_SIZE, ttl: int = EMBEDDING_CACHE_TTL_SECONDS):
+        self.embeddings = embeddings
+        self.model = model
+        self.redis = redis_client
+        self.ttl = ttl
+        self._cache = LRUCache(maxsize=maxsize, ttl=ttl)
+
+    def _redis_key(self, normalized: str) -> str:
+        digest = hashlib.sha1(normalized.encode("utf-8")).hexdigest()
+        return f"emb:{self.model}:{digest}"
+
+    def _lookup(self, normalized: str):
+        vector = self._cache.get(normalized)
+        if vector is not None:
+            EMBEDDING_CACHE_LOOKUPS.labels("memory", "hit").inc()
+            return vector
+        EMBEDDING_CACHE_LOOKUPS.labels("memory", "miss").inc()
+
+        if self.redis is not None:
+            try:
+                raw = self.redis.get(self._redis_key(normalized))
+            except Exception:
+                logger.warning("임베딩 캐시 Redis 조회 실패", exc_info=True)
+                raw = None
+            if raw:
+                EMBEDDING_CACHE_LOOKUPS.labels("redis", "hit").inc()
+                vector = np.frombuffer(raw, dtype=np.float32).tolist()
+                self._cache.set(normalized, vector)
+                return vector
+            EMBEDDING_CACHE_LOOKUPS.labels("redis", "miss").inc()
+        return None
+
+    def _store(self, normalized: str, vector):
+        self._cache.set(normalized, vector)
+        if self.redis is not None:
+            try:
+                self.redis.set(
+                    self._redis_key(normalized),
+                    np.asarray(vector, dtype=np.float32).tobytes(),
+                    ex=self.ttl,
+                )
+            except Exception:
+                logger.warning("임베딩 캐시 Redis 저장 실패", exc_info=True)
+
+    def embed_query(self, text: str):
+        normalized = normalize_utterance(text)
+        vector = self._lookup(normalized)
+        if vector is None:
+            vector = self.embeddings.embed_query(normalized or text)
+            self._store(normalized, vector)
+        return vector
+
+    def embed_documents(self, texts):
+        return self.embeddings.embed_documents(texts)
+
+    def prewarm(self, utterances=COMMON_UTTERANCES) -> int:
+        """자주 나오는 발화를 미리 임베딩해 캐시에 채웁니다. 새로 채운 개수를 반환"""
+        missing = []
+        for text in utterances:
+            normalized = normalize_utterance(text)
+            if normalized and normalized not in missing and self._lookup(normalized) is None:
+                missing.append(normalized)
+        if not missing:
+            return 0
+        # 문서용(embed_documents)과 질의용 임베딩은 task type이 달라 질의 방식으로 계산합니다.
+        for normalized in missing:
+            self._store(normalized, self.embeddings.embed_query(normalized))
+        return len(missing)
+
+    @property
+    def hit_rate(self) -> float:
+        return self._cache.hit_rate
@@ -0,0 +1,213 @@
+# app/llm_router.py
+"""
+지연 시간 기반 LLM 모델 라우터
+
+채팅/평가/리포트/그림 분석의 모든 LLM 호출은 이 모듈을 거칩니다.
+작업(task)마다 정책(주 모델, 대체 모델, 마감 시간, 재시도 횟수, 헤지 시작 시간)을 두고,
+모델별 최근 지연 시간(EWMA)과 연속 실패를 추적합니다.
+
+- 주 모델이 hedge_after초 안에 응답하지 않으면 대체 모델을 동시에 호출해 먼저 끝난 결과를 사용
+- deadline을 넘기면 TimeoutError (각 클라이언트에는 남은 시간을 timeout으로 설정해 스레드가 오래 묶이지 않음)
+  단, 마감 후에도 이미 시작한 호출은 스레드에서 timeout까지 계속 진행되고 결과는 버려집니다.
+- 주 모델이 느려지거나 연속 실패하면 일정 시간 동안 대체 모델을 먼저 사용
+
+정책은 LLM_{TASK}_PRIMARY / _FALLBACK / _DEADLINE / _HEDGE_AFTER / _RETRIES 환경변수로 바꿀 수 있습니다.
+"""
+import logging
+import math
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import NamedTuple
+
+from prometheus_client import Counter, Histogram
+
+from app.clients import get_chat_model
+
+logger = logging.getLogger(__name__)
+
+# 느려진 모델을 건너뛰는 시간(초)과 판정 기준
+DEGRADE_COOLDOWN_SECONDS = float(os.getenv("LLM_DEGRADE_COOLDOWN_SECONDS", "60"))
+DEGRADE_FAILURES = int(os.getenv("LLM_DEGRADE_FAILURES", "3"))
+LATENCY_EWMA_ALPHA = 0.2
+
+LLM_CALLS = Counter("llm_router_calls_total", "LLM 라우터 호출 결과", ["task", "model", "result"])
+LLM_LATENCY = Histogram(
+    "llm_router_latency_seconds", "LLM 호출 지연 시간", ["task", "model"],
+    buckets=(0.5, 1, 2, 4, 8, 15, 30, 60, 120),
+)
+
+
+class ModelPolicy(NamedTuple):
+    primary: str
+    fallback: str
+    deadline: float      # 전체 호출 마감 시간(초)
+    hedge_after: float   # 주 모델이 이 시간 안에 응답하지 않으면 대체 모델 동시 호출
+    retries: int         # 클라이언트 내부 재시도 횟수
+    provider: str = "gemini"           # gemini | openai
+    api_key_env: str = "GOOGLE_API_KEY"
+
+
+def _policy(task: str, **defaults) -> ModelPolicy:
+    prefix = f"LLM_{task.upper()}_"
+    return ModelPolicy(
+        primary=os.getenv(prefix + "PRIMARY", defaults["primary"]),
+        fallback=os.getenv(prefix + "FALLBACK", defaults["fallback"]),
+        deadline=float(os.getenv(prefix + "DEADLINE", defaults["deadline"])),
+        hedge_after=float(os.getenv(prefix + "HEDGE_AFTER", defaults["hedge_after"])),
+        retries=int(os.getenv(prefix + "RETRIES", defaults.get("retries", 1))),
+        provider=defaults.get("provider", "gemini"),
+        api_key_env=defaults.get("api_key_env", "GOOGLE_API_KEY"),
+    )
+
+
+POLICIES = {
+    "chat": _policy("chat", primary="gemini-1.5-pro-latest", fallback="gemini-1.5-flash-latest",
+                    deadline=20, hedge_after=8),
+    "evaluation": _policy("evaluation", primary="gemini-1.5-pro-latest", fallback="gemini-1.5-flash-latest",
+                          deadline=60, hedge_after=25),
+    "report": _policy("report", primary="gemini-2.5-flash", fallback="gemini-1.5-flash-latest",
+                      deadline=30, hedge_after=12, api_key_env="GEMINI_API_KEY"),
+    "summary": _policy("summary", primary="gemini-1.5-flash-latest", fallback="gemini-1.5-flash-8b",
+                       deadline=30, hedge_after=10),
+    "vision": _policy("vision", primary="gpt-4o", fallback="gpt-4o-mini",
+                      deadline=60, hedge_after=30, provider="openai", api_key_env="OPENAI_API_KEY"),
+}
+
+
+class _ModelStats:
+    def __init__(self):
+        self.ewma = None
+        self.failures = 0
+        self.degraded_until = 0.0
+
+
+class ModelRouter:
+    def __init__(self, policies=POLICIES):
+        self.policies = policies
+        self._stats = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(
+            max_workers=int(os.getenv("LLM_ROUTER_THREADS", "32")), thread_name_prefix="llm-router"
+        )
+
+    def _stats_for(self, task: str, model: str) -> _ModelStats:
+        # 같은 모델이라도 작업마다 프롬프트 크기가 달라 통계를 따로 둡니다.
+        with self._lock:
+            return self._stats.setdefault((task, model), _ModelStats())
+
+    def record(self, task: str, model: str, latency: float, ok: bool):
+        """호출 결과를 모델별 지연 시간/실패 통계에 반영합니다."""
+        policy = self.policies[task]
+        stats = self._stats_for(task, model)
+        LLM_CALLS.labels(task, model, "ok" if ok else "error").inc()
+        with self._lock:
+            if ok:
+                LLM_LATENCY.labels(task, model).observe(latency)
+                stats.ewma = latency if stats.ewma is None else (
+                    LATENCY_EWMA_ALPHA * latency + (1 - LATENCY_EWMA_ALPHA) * stats.ewma
+                )
+                stats.failures = 0
+            else:
+                stats.failures += 1
+            if stats.failures >= DEGRADE_FAILURES or (stats.ewma or 0) > policy.hedge_after:
+                stats.degraded_until = time.monotonic() + DEGRADE_COOLDOWN_SECONDS
+
+    def latency(self, task: str, model: str):
+        """작업별 모델의 최근 지연 시간(EWMA, 초). 기록이 없으면 None"""
+        return self._stats_for(task, model).ewma
+
+    def is_degraded(self, task: str, model: str) -> bool:
+        return self._stats_for(task, model).degraded_until > time.monotonic()
+
+    def models_for(self, task: str) -> tuple[str, str]:
+        """(먼저 호출할 모델, 헤지/대체 모델). 주 모델이 느려진 상태면 순서를 바꿉니다."""
+        policy = self.policies[task]
+        if self.is_degraded(task, policy.primary) and not self.is_degraded(task, policy.fallback):
+            return policy.fallback, policy.primary
+        return policy.primary, policy.fallback
+
+    def _timed(self, task: str, model: str, fn, timeout: float):
+        started = time.perf_counter()
+        try:
+            result = fn(model, timeout)
+        except Exception:
+            self.record(task, model, time.perf_counter() - started, ok=False)
+            raise
+        self.record(task, model, time.perf_counter() - started, ok=True)
+        return result
+
+    def call(self, task: str, fn):
+        """fn(model, timeout)을 정책에 따라 호출합니다. (헤지 + 대체 + 마감 시간)"""
+        policy = self.policies[task]
+        first, second = self.models_for(task)
+        started = time.monotonic()
+
+        futures = {self._executor.submit(self._timed, task, first, fn, policy.deadline): first}
+        done, _ = wait(futures, timeout=policy.hedge_after)
+        if done and next(iter(done)).exception() is None:
+            return next(iter(done)).result()
+        if done:
+            logger.warning(f"[{task}] {first} 호출 실패, {second}로 대체합니다: {next(iter(done)).exception()}")
+            futures = {}
+        else:
+            logger.warning(f"[{task}] {first} 응답 지연({policy.hedge_after}s), {second}를 함께 호출합니다.")
+
+        # 대체 호출에는 남은 시간만 줍니다. (hedge_after + deadline 만큼 늘어나지 않게)
+        # 모델 객체가 timeout별로 캐시되므로 초 단위로 올림해 종류를 제한합니다.
+        remaining = max(math.ceil(policy.deadline - (time.monotonic() - started)), 1)
+        futures[self._executor.submit(self._timed, task, second, fn, remaining)] = second
+
+        last_error = None
+        while futures:
+            remaining = policy.deadline - (time.monotonic() - started)
+            done, _ = wait(futures, timeout=max(remaining, 0), return_when=FIRST_COMPLETED)
+            if not done:
+                break
+            for future in done:
+                futures.pop(future)
+                if future.exception() is None:
+                    return future.result()
+                last_error = future.exception()
+        if last_error is not None and not futures:
+            raise last_error
+        LLM_CALLS.labels(task, first, "deadline").inc()
+        raise TimeoutError(f"[{task}] LLM 호출이 {policy.deadline}초 안에 끝나지 않았습니다.")
+
+    def chat_model(self, task: str, model: str, timeout: float = None, **options):
+        """정책의 timeout/재시도/API 키를 적용한 Gemini 챗 모델"""
+        policy = self.policies[task]
+        return get_chat_model(
+            model=model,
+            api_key=os.environ.get(policy.api_key_env),
+            timeout=timeout or policy.deadline,
+            max_retries=policy.retries,
+            **options,
+        )
+
+    def invoke(self, task: str, build, input, **options):
+        """build(llm)로 만든 체인(prompt | llm)을 정책에 따라 실행합니다."""
+        return self.call(
+            task, lambda model, timeout: build(self.chat_model(task, model, timeout, **options)).invoke(input)
+        )
+
+    def streaming_model(self, task: str, **options):
+        """스트리밍용 모델. 첫 토큰 전에 실패하면 대체 모델로 넘어갑니다. (with_fallbacks)"""
+        first, second = self.models_for(task)
+        return self.chat_model(task, first, streaming=True, **options).with_fallbacks(
+            [self.chat_model(task, second, streaming=True, **options)]
+        )
+
+
+_router = None
+_router_lock = threading.Lock()
+
+
+def get_router() -> ModelRouter:
+    global _router
+    if _router is None:
+        with _router_lock:
+            if _router is None:
+                _router = ModelRouter()
+    return _router
@@ -0,0 +1,265 @@
+# app/rag/local_index.py
+"""
+Chroma 컬렉션을 미러링한 로컬 메모리 맵 벡터 인덱스
+
+dementia_gemini_v1 컬렉션은 app/rag/pipeline.py에서만 쓰이는 작고 정적인 데이터입니다.
+컬렉션의 임베딩을 float32 행렬 파일로 스냅샷하고, 각 워커는 np.memmap으로 읽어
+NumPy 내적으로 top-k를 계산합니다. (페이지 캐시를 워커끼리 공유)
+
+- 파일 구성: {dir}/current.json (현재 버전 포인터),
+             {dir}/embeddings-{version}.f32 (정규화된 임베딩 행렬),
+             {dir}/meta-{version}.json (ids/documents/metadatas 사이드 테이블)
+- 갱신: 컬렉션 metadata의 "version" 값이 바뀌면 다시 스냅샷합니다.
+  스냅샷은 {dir}/snapshot.lock 임대 파일을 잡은 워커 하나만 만들고, 기다린 워커는 그 결과를 씁니다.
+  새 포인터를 쓴 뒤에는 현재/직전 버전이 아닌 파일을 지웁니다.
+"""
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+import numpy as np
+from langchain_core.documents import Document
+
+from app.clients import COLLECTION_NAME, get_chroma_client
+
+logger = logging.getLogger(__name__)
+
+LOCAL_INDEX_DIR = os.getenv("LOCAL_INDEX_DIR", "data/vector_index")
+LOCAL_INDEX_REFRESH_SECONDS = int(os.getenv("LOCAL_INDEX_REFRESH_SECONDS", "300"))
+SNAPSHOT_PAGE_SIZE = 1000
+# 스냅샷 임대 파일이 이보다 오래되면 죽은 워커가 남긴 것으로 보고 가져옵니다.
+SNAPSHOT_LEASE_SECONDS = int(os.getenv("LOCAL_INDEX_SNAPSHOT_LEASE_SECONDS", "600"))
+
+
+def new_version() -> str:
+    return f"{int(time.time())}-{uuid.uuid4().hex[:8]}"
+
+
+def collection_version(collection) -> str:
+    return (collection.metadata or {}).get("version", "unversioned")
+
+
+def bump_collection_version(collection) -> str:
+    """컬렉션 내용이 바뀌었음을 로컬 인덱스에 알리기 위해 version 값을 갱신합니다."""
+    version = new_version()
+    # hnsw:* 설정은 생성 이후 변경할 수 없으므로 제외합니다.
+    metadata = {k: v for k, v in (collection.metadata or {}).items() if not k.startswith("hnsw:")}
+    metadata["version"] = version
+    collection.modify(metadata=metadata)
+    return version
+
+
+def _write_json_atomic(path: str, data):
+    tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+def _read_pointer(index_dir: str):
+    try:
+        with open(os.path.join(index_dir, "current.json"), encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+@contextmanager
+def _snapshot_lease(index_dir: str):
+    """여러 워커가 같은 스냅샷을 동시에 만들지 않도록 임대 파일을 잡습니다."""
+    path = os.path.join(index_dir, "snapshot.lock")
+    while True:
+        try:
+            fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            break
+        except FileExistsError:
+            try:
+                age = time.time() - os.path.getmtime(path)
+            except FileNotFoundError:
+                continue
+            if age > SNAPSHOT_LEASE_SECONDS:
+                logger.warning(f"만료된 스냅샷 임대 파일을 지웁니다 - {age:.0f}초")
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                continue
+            time.sleep(0.5)
+    try:
+        os.write(fd, str(os.getpid()).encode())
+        os.close(fd)
+        yield
+    finally:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+def _remove_stale_files(index_dir: str, keep: set):
+    """현재/직전 포인터가 가리키지 않는 스냅샷 파일(남은 .tmp 포함)을 지웁니다.
+
+    직전 버전은 포인터를 막 읽은 다른 워커가 열 수 있도록 한 번 더 남겨 둡니다.
+    이미 memmap으로 연 파일은 지워도 닫을 때까지 읽을 수 있습니다.
+    """
+    for name in os.listdir(index_dir):
+        if not name.startswith(("embeddings-", "meta-", "current.json.")) or name in keep:
+            continue
+        try:
+            os.remove(os.path.join(index_dir, name))
+        except OSError as e:
+            logger.warning(f"오래된 스냅샷 파일 삭제 실패 - {name}: {e}")
+
+
+def snapshot_collection(collection_name: str = COLLECTION_NAME, index_dir: str = LOCAL_INDEX_DIR,
+                        force: bool = False) -> dict:
+    """컬렉션 전체를 float32 행렬 파일 + 사이드 테이블로 내려받습니다.
+
+    임대를 기다리는 동안 다른 워커가 같은 version을 스냅샷했다면 (force가 아니면) 그 포인터를 돌려줍니다.
+    """
+    collection = get_chroma_client().get_collection(name=collection_name)
+    version = collection_version(collection)
+    os.makedirs(index_dir, exist_ok=True)
+    with _snapshot_lease(index_dir):
+        previous = _read_pointer(index_dir)
+        if not force and previous and previous["version"] == version:
+            return previous
+        pointer = _write_snapshot(collection, version, index_dir)
+        keep = {pointer["matrix"], pointer["meta"]}
+        if previous:
+            keep.update((previous.get("matrix"), previous.get("meta")))
+        _remove_stale_files(index_dir, keep)
+    return pointer
+
+
+def _write_snapshot(collection, version: str, index_dir: str) -> dict:
+    total = collection.count()
+
+    ids, documents, metadatas, vectors = [], [], [], []
+    for offset in range(0, total, SNAPSHOT_PAGE_SIZE):
+        page = collection.get(
+            include=["embeddings", "documents", "metadatas"],
+            limit=SNAPSHOT_PAGE_SIZE,
+            offset=offset,
+        )
+        ids.extend(page["ids"])
+        documents.extend(page["documents"])
+        metadatas.extend(page["metadatas"])
+        vectors.extend(page["embeddings"])
+
+    matrix = np.asarray(vectors, dtype=np.float32).reshape(len(ids), -1)
+    # 정규화해 두면 내적 = 코사인 유사도
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    matrix /= np.where(norms == 0, 1, norms)
+
+    file_tag = f"{version}-{uuid.uuid4().hex[:8]}"
+    matrix_path = os.path.join(index_dir, f"embeddings-{file_tag}.f32")
+    meta_path = os.path.join(index_dir, f"meta-{file_tag}.json")
+    matrix.tofile(matrix_path)
+    _write_json_atomic(meta_path, {"ids": ids, "documents": documents, "metadatas": metadatas})
+
+    pointer = {
+        "version": version,
+        "count": int(matrix.shape[0]),
+        "dim": int(matrix.shape[1]) if matrix.size else 0,
+        "matrix": os.path.basename(matrix_path),
+        "meta": os.path.basename(meta_path),
+    }
+    _write_json_atomic(os.path.join(index_dir, "current.json"), pointer)
+    logger.info(f"로컬 벡터 인덱스 스냅샷 완료 - version: {version}, count: {pointer['count']}")
+    return pointer
+
+
+class LocalVectorIndex:
+    def __init__(self, collection_name: str = COLLECTION_NAME, index_dir: str = LOCAL_INDEX_DIR,
+                 refresh_seconds: int = LOCAL_INDEX_REFRESH_SECONDS):
+        self.collection_name = collection_name
+        self.index_dir = index_dir
+        self.refresh_seconds = refresh_seconds
+        self.version = None
+        self._matrix = None
+        self._meta = None
+        self._pointer_mtime = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def _pointer_path(self):
+        return os.path.join(self.index_dir, "current.json")
+
+    def _load(self):
+        """current.json이 가리키는 스냅샷을 memmap으로 엽니다."""
+        with open(self._pointer_path, encoding="utf-8") as f:
+            pointer = json.load(f)
+        with open(os.path.join(self.index_dir, pointer["meta"]), encoding="utf-8") as f:
+            meta = json.load(f)
+        if pointer["count"]:
+            matrix = np.memmap(
+                os.path.join(self.index_dir, pointer["matrix"]),
+                dtype=np.float32, mode="r", shape=(pointer["count"], pointer["dim"]),
+            )
+        else:
+            matrix = np.zeros((0, 0), dtype=np.float32)
+        self._matrix, self._meta, self.version = matrix, meta, pointer["version"]
+        self._pointer_mtime = os.path.getmtime(self._pointer_path)
+
+    def refresh(self, force: bool = False):
+        """다른 워커가 만든 새 스냅샷을 읽고, 컬렉션 version이 바뀌었으면 다시 스냅샷합니다."""
+        now = time.monotonic()
+        if not force and self._matrix is not None and now - self._checked_at < self.refresh_seconds:
+            return
+        with self._lock:
+            if not force and self._matrix is not None and now - self._checked_at < self.refresh_seconds:
+                return
+            self._checked_at = now
+
+            if os.path.exists(self._pointer_path) and os.path.getmtime(self._pointer_path) != self._pointer_mtime:
+                self._load()
+
+            collection = get_chroma_client().get_collection(name=self.collection_name)
+            if self._matrix is None or collection_version(collection) != self.version:
+                snapshot_collection(self.collection_name, self.index_dir)
+                self._load()
+
+    def search(self, query_vector, k: int = 4) -> list[Document]:
+        self.refresh()
+        matrix = self._matrix
+        if matrix is None or matrix.shape[0] == 0:
+            return []
+
+        query = np.asarray(query_vector, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        if norm:
+            query = query / norm
+        scores = matrix @ query
+        k = min(k, scores.shape[0])
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [
+            Document(
+                page_content=self._meta["documents"][i] or "",
+                metadata=self._meta["metadatas"][i] or {},
+            )
+            for i in top
+        ]
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_local_index() -> LocalVectorIndex:
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = LocalVectorIndex()
+    return _index
+
+
+if __name__ == "__main__":
+    print(snapshot_collection(force=True))
@@ -1,10 +1,10 @@
 # app/rag/service.py
 import os
 import uuid
-import chromadb
 from langchain_community.document_loaders import PyPDFLoader
 from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain_google_genai import GoogleGenerativeAIEmbeddings
+from app.clients import get_chroma_client, get_embeddings
+from app.rag.local_index import bump_collection_version
 
 google_api_key = os.environ.get("GOOGLE_API_KEY")
 
@@ -18,7 +18,7 @@ def embed_pdf_to_chroma(pdf_path: str, title: str = "제목 없음", chroma_host
     split_docs = splitter.split_documents(docs)
 
     # 3. 임베딩 생성 (Gemini 모델로 변경)
-    embedding = GoogleGenerativeAIEmbeddings(model="models/embedding-001", google_api_key=google_api_key)
+    embedding = get_embeddings()
     texts = [d.page_content for d in split_docs]
 
     # 모든 chunk에 동일한 제목을 metadata로 부여
@@ -29,10 +29,7 @@ def embed_pdf_to_chroma(pdf_path: str, title: str = "제목 없음", chroma_host
     ids = [str(uuid.uuid4()) for _ in split_docs]
 
     # 4. REST API 모드로 ChromaDB 접속
-    client = chromadb.HttpClient(
-        host=chroma_host,
-        port=chroma_port,
-    )
+    client = get_chroma_client(host=chroma_host, port=chroma_port)
 
     # 5. 컬렉션 생성 또는 가져오기
     collection = client.get_or_create_collection(name=collection_name)
@@ -45,6 +42,9 @@ def embed_pdf_to_chroma(pdf_path: str, title: str = "제목 없음", chroma_host
         ids=ids
     )
 
+    # 7. 로컬 벡터 인덱스가 다시 스냅샷하도록 컬렉션 version 갱신
+    bump_collection_version(collection)
+
     return f"{len(split_docs)} chunks embedded for '{title}'"
 
     #return f"{len(split_docs)} chunks embedded to Chroma REST ({chroma_host}:{chroma_port})"
@@ -1,20 +1,22 @@
 from fastapi import APIRouter, Depends, HTTPException
+import asyncio
 from sqlalchemy.orm import Session
-from app.database import get_db
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.database import get_db, get_async_db
 from . import schemas, service, crud
 from app.auth.utils import get_current_user
 from app.auth.models import User
 import logging
 from .models import RiskLevel
 from .service import determine_final_risk, generate_final_report_with_gpt
-from .crud import update_final_result_and_risk
+from .crud import update_final_result_and_risk_async
 
 router = APIRouter()
 
 @router.post("/reports/empty", response_model=schemas.SimpleReportResponse)
-def create_empty_report(
+async def create_empty_report(
     report: schemas.EmptyReportCreate, 
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ):
     """현재 로그인한 유저를 위한 빈 리포트를 생성합니다."""
@@ -42,8 +44,8 @@ def create_empty_report(
         final_risk=None
     )
     db.add(new_report)
-    db.commit()
-    db.refresh(new_report)
+    await db.commit()
+    await db.refresh(new_report)
 
     logging.info(f"✅ 새 리포트 생성됨: ID={new_report.report_id}, User={current_user.id}")
 
@@ -68,12 +70,12 @@ def get_report_detail(
     return report
 
 @router.put("/reports/{report_id}/finalize", response_model=schemas.DetailedReportResponse)
-def finalize_report(
+async def finalize_report(
     report_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ):
-    report = crud.get_report(db, report_id)
+    report = await crud.get_report_row_async(db, report_id)
     if not report:
         raise HTTPException(status_code=404, detail="Report not found")
 
@@ -85,7 +87,9 @@ def finalize_report(
 
     final_risk = determine_final_risk(report.ad8_risk, report.drawing_risk, report.chat_risk)
 
-    final_result = generate_final_report_with_gpt(
+    # Gemini 호출은 블로킹이므로 스레드에서 실행합니다.
+    final_result = await asyncio.to_thread(
+        generate_final_report_with_gpt,
         ad8_score=report.ad8_score,
         drawing_score=report.drawing_score,
         chat_risk=report.chat_risk,
@@ -94,5 +98,5 @@ def finalize_report(
         total_score=report.total_score
     )
 
-    updated = update_final_result_and_risk(db, report_id, final_risk, final_result)
+    updated = await update_final_result_and_risk_async(db, report_id, final_risk, final_result)
     return updated
\ No newline at end of file
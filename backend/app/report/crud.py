@@ -1,5 +1,6 @@
 #app/report/crud.py
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from . import models, schemas
 from app.drawing.models import DrawingTest
 from app.ad8 import crud as ad8_crud
@@ -86,4 +87,22 @@ def update_final_result_and_risk(
     report.final_result = final_result
     db.commit()
     db.refresh(report)
-    return report
\ No newline at end of file
+    return report
+
+async def get_report_row_async(db: AsyncSession, report_id: int):
+    """리포트 행만 조회합니다. (비동기 세션)"""
+    return await db.get(models.Report, report_id)
+
+async def update_final_result_and_risk_async(
+    db: AsyncSession, report_id: int,
+    final_risk: RiskLevel, final_result: str
+):
+    report = await db.get(models.Report, report_id)
+    if not report:
+        raise HTTPException(status_code=404, detail="Report not found")
+
+    report.final_risk = final_risk
+    report.final_result = final_result
+    await db.commit()
+    await db.refresh(report)
+    return report
@@ -3,15 +3,11 @@ from . import crud, schemas
 from .models import RiskLevel
 import os
 from collections import Counter
-import google.generativeai as genai
 from dotenv import load_dotenv
+from app.llm_router import get_router
 
 load_dotenv(dotenv_path="./backend/.env")  # ✅ 경로 명시!!
 
-genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
-print("✅ 적용된 API 키:", os.getenv("GEMINI_API_KEY"))
-model = genai.GenerativeModel("gemini-2.5-flash")
-print("✅ Gemini 모델 로딩됨:", model)
 
 def create_empty_report_service(db: Session, report: schemas.ReportCreate):
     empty_report_data = schemas.ReportCreate(
@@ -62,6 +58,10 @@ def generate_final_report_with_gpt(
     ad8_risk: str,
     total_score: int
 ) -> str:
+    # ORM 행에서 넘어온 RiskLevel enum은 "위험"/"경계" 같은 값으로 바꿔 프롬프트에 넣습니다.
+    chat_risk, drawing_risk, ad8_risk = (
+        risk.value if isinstance(risk, RiskLevel) else risk for risk in (chat_risk, drawing_risk, ad8_risk)
+    )
     prompt = f"""
 다음은 환자의 인지 기능 선별 검사 결과입니다. 이 검사 결과를 바탕으로 전문의 소견서를 작성해주세요.  
 총 6문장 이상, 8문장 이하로 구성하며, 너무 장황하거나 연결어 위주의 문장은 피하고,  
@@ -76,8 +76,10 @@ def generate_final_report_with_gpt(
 
     try:
         print("🧪 Gemini 보고서 생성 시도 중입니다...")  # ✅ 실제 호출되는지 확인용
-        response = model.generate_content(prompt.strip())
-        return response.text.strip()
+        # 모델 선택/마감 시간/대체 모델은 LLM 라우터의 report 정책을 따릅니다.
+        # 생성 설정은 기존 genai 호출(설정 없음)과 같게 둡니다. (Gemini 기본 temperature 1.0)
+        response = get_router().invoke("report", lambda llm: llm, prompt.strip(), temperature=1.0)
+        return response.content.strip()
     except Exception as e:
         print(f"❌ Gemini 에러 발생: {e}")
         return f"❌ Gemini 호출 실패: {str(e)}"
\ No newline at end of file
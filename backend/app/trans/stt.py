@@ -1,40 +1,82 @@
 from fastapi import APIRouter, UploadFile, File, HTTPException
+import asyncio
+import io
+import logging
 import openai
-import shutil
 import os
-import uuid
+import subprocess
 from dotenv import load_dotenv
 
+from app.clients import get_openai_client
+
 load_dotenv()
 openai.api_key = os.getenv("OPENAI_API_KEY")
 if not openai.api_key:
     raise RuntimeError("OPENAI_API_KEY 환경변수가 설정되어 있지 않습니다.")
 
 router = APIRouter()
+logger = logging.getLogger(__name__)
+
+# 업로드 전 정규화(앞뒤 무음 제거 + 16kHz 모노 opus 변환) 사용 여부. ffmpeg가 필요합니다.
+STT_NORMALIZE = os.getenv("STT_NORMALIZE", "false").lower() == "true"
+FFMPEG_BIN = os.getenv("FFMPEG_BIN", "ffmpeg")
+STT_NORMALIZE_TIMEOUT = float(os.getenv("STT_NORMALIZE_TIMEOUT", "10"))
+
+ALLOWED_EXTS = (".webm", ".mp3", ".wav", ".m4a", ".mp4")
+
+# 앞부분 무음을 잘라내고, 뒤집어서 같은 방법으로 끝부분 무음을 잘라냅니다. (발화 중간의 쉼은 그대로 둡니다)
+_TRIM_LEADING_SILENCE = "silenceremove=start_periods=1:start_duration=0.2:start_threshold=-45dB:start_silence=0.3"
+_SILENCE_FILTER = f"{_TRIM_LEADING_SILENCE},areverse,{_TRIM_LEADING_SILENCE},areverse"
 
 async def transcribe_audio(file: UploadFile) -> str:
     """음성 파일을 텍스트로 변환하는 핵심 로직"""
-    allowed_exts = (".webm", ".mp3", ".wav", ".m4a", ".mp4")
-    if not file.filename or not file.filename.lower().endswith(allowed_exts):
-        raise HTTPException(status_code=400, detail="지원하지 않는 오디오 형식입니다.")
+    # Whisper 호출은 블로킹이므로 스레드에서 실행합니다.
+    # 업로드 파일(일정 크기까지 메모리, 넘으면 디스크에 스풀)을 복사하지 않고 그대로 넘깁니다.
+    return await asyncio.to_thread(transcribe_file, file.file, file.filename)
 
-    ext = os.path.splitext(file.filename)[-1].lower()
-    temp_dir = "temp"
-    os.makedirs(temp_dir, exist_ok=True)
-    temp_filename = os.path.join(temp_dir, f"temp_{uuid.uuid4().hex}{ext}")
+def transcribe_bytes(content: bytes, filename: str) -> str:
+    """음성 바이트를 텍스트로 변환합니다. (동기, 음성 WebSocket/Celery 공용)"""
+    return transcribe_file(io.BytesIO(content), filename)
 
+def normalize_audio(content: bytes):
+    """ffmpeg로 무음 제거 + 16kHz 모노 opus(ogg)로 변환합니다. 실패하면 None (원본 사용)"""
+    command = [
+        FFMPEG_BIN, "-hide_banner", "-loglevel", "error", "-i", "pipe:0",
+        "-af", _SILENCE_FILTER, "-ac", "1", "-ar", "16000",
+        "-c:a", "libopus", "-b:a", "24k", "-f", "ogg", "pipe:1",
+    ]
     try:
-        # 파일 저장
-        with open(temp_filename, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
+        result = subprocess.run(command, input=content, capture_output=True, timeout=STT_NORMALIZE_TIMEOUT)
+    except (OSError, subprocess.TimeoutExpired) as e:
+        logger.warning(f"음성 정규화 실패, 원본을 사용합니다: {e}")
+        return None
+    if result.returncode != 0 or not result.stdout:
+        logger.warning(f"음성 정규화 실패, 원본을 사용합니다: {result.stderr.decode(errors='ignore')[:200]}")
+        return None
+    return result.stdout
 
+def transcribe_file(fileobj, filename: str) -> str:
+    """파일 객체(메모리/스풀 버퍼)의 음성을 디스크에 다시 쓰지 않고 Whisper로 보냅니다."""
+    if not filename or not filename.lower().endswith(ALLOWED_EXTS):
+        raise HTTPException(status_code=400, detail="지원하지 않는 오디오 형식입니다.")
+
+    upload = (os.path.basename(filename), fileobj)
+    if STT_NORMALIZE:
+        content = fileobj.read()
+        normalized = normalize_audio(content)
+        if normalized:
+            logger.info(f"음성 정규화: {len(content)} -> {len(normalized)} bytes")
+            upload = ("voice.ogg", normalized)
+        else:
+            upload = (os.path.basename(filename), content)
+
+    try:
         # Whisper API 호출 (한국어 지정)
-        with open(temp_filename, "rb") as audio_file:
-            result = openai.audio.transcriptions.create(
-                model="whisper-1",
-                file=audio_file,
-                language="ko"
-            )
+        result = get_openai_client().audio.transcriptions.create(
+            model="whisper-1",
+            file=upload,
+            language="ko"
+        )
 
         text = result.text
         if not text:
@@ -44,9 +86,6 @@ async def transcribe_audio(file: UploadFile) -> str:
 
     except openai.OpenAIError as oe:
         raise HTTPException(status_code=502, detail=f"OpenAI API 오류: {str(oe)}")
-    finally:
-        if os.path.exists(temp_filename):
-            os.remove(temp_filename)
 
 @router.post("/stt")
 async def speech_to_text(file: UploadFile = File(...)):
@@ -0,0 +1,241 @@
+# app/trans/stt_stream.py
+"""
+증분(스트리밍) STT
+
+녹음 중인 음성(PCM16 little-endian, 16kHz 모노)을 조각 단위로 받아
+에너지 기반 VAD로 발화 구간을 나누고, 구간이 닫히는 즉시 Whisper로 동시에 전사합니다.
+사용자가 말을 마쳤을 때는 마지막 구간만 남아 있어 전사 대기 시간이 짧습니다.
+
+- 음성 판정: 프레임(30ms) RMS 가 STT_VAD_THRESHOLD_DB 이상이고, 주변 소음보다 10dB 이상 클 때
+- 구간 종료: STT_VAD_SILENCE_MS 동안 무음이거나 STT_VAD_MAX_SEGMENT_SECONDS를 넘을 때
+"""
+import asyncio
+import io
+import json
+import logging
+import math
+import os
+import wave
+from collections import deque
+
+import numpy as np
+from fastapi import APIRouter, HTTPException, WebSocket, WebSocketDisconnect
+
+from app.trans.stt import transcribe_bytes
+
+router = APIRouter()
+logger = logging.getLogger(__name__)
+
+STT_SAMPLE_RATE = 16000
+STT_VAD_FRAME_MS = 30
+STT_VAD_THRESHOLD_DB = float(os.getenv("STT_VAD_THRESHOLD_DB", "-45"))
+STT_VAD_SILENCE_MS = int(os.getenv("STT_VAD_SILENCE_MS", "600"))
+STT_VAD_MIN_SPEECH_MS = int(os.getenv("STT_VAD_MIN_SPEECH_MS", "200"))
+STT_VAD_MAX_SEGMENT_SECONDS = float(os.getenv("STT_VAD_MAX_SEGMENT_SECONDS", "15"))
+# 말이 시작되기 직전 음성을 구간 앞에 붙여 첫 음절이 잘리지 않게 합니다.
+STT_VAD_PRE_ROLL_MS = 300
+STT_STREAM_CONCURRENCY = int(os.getenv("STT_STREAM_CONCURRENCY", "3"))
+# 발화 하나(end 까지)에 받을 최대 음성 크기 (기본 10MB ≈ PCM16 16kHz 5분)
+STT_STREAM_MAX_AUDIO_BYTES = int(os.getenv("STT_STREAM_MAX_AUDIO_BYTES", str(10 * 1024 * 1024)))
+# 주변 소음 대비 음성으로 판정할 차이(dB)
+NOISE_MARGIN_DB = 10
+NOISE_EWMA_ALPHA = 0.05
+
+
+def frame_db(frame: bytes) -> float:
+    samples = np.frombuffer(frame, dtype="<i2").astype(np.float32)
+    if samples.size == 0:
+        return -100.0
+    rms = math.sqrt(float(np.mean(samples * samples)))
+    return 20 * math.log10(rms / 32768 + 1e-10)
+
+
+def pcm_to_wav(pcm: bytes, sample_rate: int = STT_SAMPLE_RATE) -> bytes:
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(sample_rate)
+        wav.writeframes(pcm)
+    return buffer.getvalue()
+
+
+class EnergyVAD:
+    """PCM16 조각을 받아 닫힌 발화 구간(PCM 바이트) 목록을 돌려줍니다."""
+
+    def __init__(self, sample_rate: int = STT_SAMPLE_RATE, frame_ms: int = STT_VAD_FRAME_MS):
+        self.frame_ms = frame_ms
+        self.frame_bytes = sample_rate * frame_ms // 1000 * 2
+        self.max_segment_bytes = int(sample_rate * STT_VAD_MAX_SEGMENT_SECONDS) * 2
+        self.noise_db = None
+        self._buffer = bytearray()
+        self._pre_roll = deque(maxlen=max(STT_VAD_PRE_ROLL_MS // frame_ms, 1))
+        self._reset_segment()
+
+    def _reset_segment(self):
+        self.segment = bytearray()
+        self.in_speech = False
+        self.speech_frames = 0
+        self.silence_frames = 0
+
+    def _is_speech(self, db: float) -> bool:
+        if db < STT_VAD_THRESHOLD_DB:
+            speech = False
+        else:
+            speech = self.noise_db is None or db > self.noise_db + NOISE_MARGIN_DB
+        if not speech:
+            self.noise_db = db if self.noise_db is None else (
+                NOISE_EWMA_ALPHA * db + (1 - NOISE_EWMA_ALPHA) * self.noise_db
+            )
+        return speech
+
+    def feed(self, chunk: bytes) -> list[bytes]:
+        self._buffer.extend(chunk)
+        closed = []
+        while len(self._buffer) >= self.frame_bytes:
+            frame = bytes(self._buffer[:self.frame_bytes])
+            del self._buffer[:self.frame_bytes]
+            segment = self._process(frame)
+            if segment:
+                closed.append(segment)
+        return closed
+
+    def _process(self, frame: bytes):
+        speech = self._is_speech(frame_db(frame))
+        if not self.in_speech:
+            if speech:
+                self.in_speech = True
+                self.segment.extend(b"".join(self._pre_roll))
+                self.segment.extend(frame)
+                self.speech_frames = 1
+                self._pre_roll.clear()
+            else:
+                self._pre_roll.append(frame)
+            return None
+
+        self.segment.extend(frame)
+        if speech:
+            self.speech_frames += 1
+            self.silence_frames = 0
+        else:
+            self.silence_frames += 1
+        if (self.silence_frames * self.frame_ms >= STT_VAD_SILENCE_MS
+                or len(self.segment) >= self.max_segment_bytes):
+            return self.close()
+        return None
+
+    def close(self):
+        """진행 중인 구간을 닫습니다. 음성이 너무 짧으면(잡음) None"""
+        segment, speech_ms = bytes(self.segment), self.speech_frames * self.frame_ms
+        self._reset_segment()
+        if speech_ms < STT_VAD_MIN_SPEECH_MS:
+            return None
+        return segment
+
+
+class IncrementalTranscriber:
+    """발화 구간을 동시에 전사하고, 앞에서부터 이어지는 부분 전사 결과를 유지합니다."""
+
+    def __init__(self, on_partial=None, concurrency: int = STT_STREAM_CONCURRENCY):
+        self.vad = EnergyVAD()
+        self.on_partial = on_partial
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._tasks = []
+        self._results = {}
+
+    async def feed(self, chunk: bytes):
+        for segment in self.vad.feed(chunk):
+            self._schedule(segment)
+
+    def _schedule(self, segment: bytes):
+        index = len(self._tasks)
+        self._tasks.append(asyncio.create_task(self._transcribe(index, segment)))
+
+    async def _transcribe(self, index: int, segment: bytes):
+        async with self._semaphore:
+            try:
+                text = await asyncio.to_thread(transcribe_bytes, pcm_to_wav(segment), "segment.wav")
+            except HTTPException as e:
+                # 구간에 말소리가 없으면 Whisper가 빈 결과를 돌려줍니다.
+                if e.status_code != 500:
+                    raise
+                text = ""
+        self._results[index] = text.strip()
+        if self.on_partial:
+            await self.on_partial(self.partial_text())
+
+    def partial_text(self) -> str:
+        """앞에서부터 전사가 끝난 구간까지 이어 붙인 텍스트"""
+        parts = []
+        for index in range(len(self._tasks)):
+            if index not in self._results:
+                break
+            parts.append(self._results[index])
+        return " ".join(part for part in parts if part)
+
+    async def finish(self) -> str:
+        """남은 구간을 닫고 모든 전사가 끝나면 전체 텍스트를 반환합니다."""
+        segment = self.vad.close()
+        if segment:
+            self._schedule(segment)
+        try:
+            await asyncio.gather(*self._tasks)
+        finally:
+            self.cancel()
+        return self.partial_text()
+
+    def cancel(self):
+        for task in self._tasks:
+            if not task.done():
+                task.cancel()
+
+
+@router.websocket("/stt/stream")
+async def stream_speech_to_text(websocket: WebSocket):
+    """WebSocket 엔드포인트: 녹음 중인 PCM16 조각을 받아 부분 전사 결과를 계속 보냅니다.
+
+    클라이언트 → binary(PCM16 16kHz 모노), {"type": "end"}
+    서버 → {"type": "partial", "text"}, {"type": "final", "text"}, {"type": "error", "message"}
+    발화 하나가 STT_STREAM_MAX_AUDIO_BYTES를 넘으면 그 발화는 버리고 end 에서 error 를 보냅니다.
+    """
+    await websocket.accept()
+
+    async def send_partial(text: str):
+        await websocket.send_json({"type": "partial", "text": text})
+
+    transcriber = IncrementalTranscriber(on_partial=send_partial)
+    received = 0
+    try:
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                return
+            if message.get("bytes") is not None:
+                received += len(message["bytes"])
+                if received > STT_STREAM_MAX_AUDIO_BYTES:
+                    transcriber.cancel()
+                    continue
+                await transcriber.feed(message["bytes"])
+            elif message.get("text"):
+                try:
+                    data = json.loads(message["text"])
+                except ValueError:
+                    data = None
+                if not isinstance(data, dict):
+                    await websocket.send_json({"type": "error", "message": "잘못된 메시지 형식입니다."})
+                    continue
+                if data.get("type") != "end":
+                    continue
+                if received > STT_STREAM_MAX_AUDIO_BYTES:
+                    await websocket.send_json({"type": "error", "message": "음성이 너무 깁니다."})
+                else:
+                    text = await transcriber.finish()
+                    await websocket.send_json({"type": "final", "text": text})
+                transcriber = IncrementalTranscriber(on_partial=send_partial)
+                received = 0
+    except WebSocketDisconnect:
+        return
+    except HTTPException as e:
+        await websocket.send_json({"type": "error", "message": str(e.detail)})
+    finally:
+        transcriber.cancel()
@@ -1,11 +1,17 @@
+import asyncio
 import os
+import re
 import logging
 import json
-from fastapi import APIRouter, HTTPException, Response
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, field_validator
 from dotenv import load_dotenv
 import httpx
 
+from app.clients import get_async_http_client
+from app.trans.tts_cache import get_tts_cache, tts_cache_key
+
 router = APIRouter()
 
 load_dotenv()
@@ -19,12 +25,38 @@ MAX_TEXT_LENGTH = 2500 # ElevenLabs API의 무료 티어 최대 2500자 (유료
 MIN_TEXT_LENGTH = 1
 
 VOICE_ID = os.getenv("ELEVENLABS_VOICE_ID", "YBRudLRm83BV5Mazcr42")
+# 긴 응답을 문장 단위로 나눠 동시에 합성할 때의 최대 동시 요청 수
+TTS_PIPELINE_CONCURRENCY = int(os.getenv("TTS_PIPELINE_CONCURRENCY", "3"))
+# 이보다 짧은 문장은 다음 문장과 합쳐 한 번에 합성합니다.
+TTS_MIN_SEGMENT_LENGTH = int(os.getenv("TTS_MIN_SEGMENT_LENGTH", "15"))
+# 로컬 대체 서버로 바꿔 테스트할 수 있도록 주소를 분리
+ELEVENLABS_BASE_URL = os.getenv("ELEVENLABS_BASE_URL", "https://api.elevenlabs.io")
 
 # ⭐ ⭐ 추가된 부분!
 # 파일 상단에 환경 변수 키와 기본 모델 정의
 ELEVENLABS_MODEL_ID_KEY = "ELEVENLABS_MODEL_ID"
 DEFAULT_TTS_MODEL = "eleven_flash_v2_5"
 
+VOICE_SETTINGS = {
+    "stability": 0.7,
+    "similarity_boost": 0.7,
+    "style": 0.3,
+    "use_speaker_boost": True,
+    "speed": 0.88
+}
+
+# 문장 경계: 공백이 뒤따르는 문장부호 또는 줄바꿈 ("100.5" 같은 숫자는 나누지 않음)
+_SENTENCE = re.compile(r".*?(?:[.?!。…]+(?=\s)|\n)")
+
+def split_sentences(buffer: str) -> tuple[list[str], str]:
+    """스트리밍 중인 텍스트에서 완성된 문장들과 아직 끝나지 않은 나머지를 분리합니다."""
+    sentences, end = [], 0
+    for m in _SENTENCE.finditer(buffer):
+        if m.group().strip():
+            sentences.append(m.group().strip())
+        end = m.end()
+    return sentences, buffer[end:]
+
 class TTSRequest(BaseModel):
     text: str
 
@@ -36,13 +68,89 @@ class TTSRequest(BaseModel):
         return v
 
 async def synthesize_speech(text: str) -> bytes:
-    """텍스트를 음성으로 변환하는 핵심 로직"""
+    """텍스트를 음성으로 변환하는 핵심 로직 (같은 텍스트/보이스/설정은 캐시에서 바로 반환)"""
+    model_id = os.getenv(ELEVENLABS_MODEL_ID_KEY, DEFAULT_TTS_MODEL)
+    key = tts_cache_key(text, VOICE_ID, model_id, VOICE_SETTINGS)
+    cache = get_tts_cache()
+    audio = cache.get_memory(key)
+    if audio is None:
+        audio = await asyncio.to_thread(cache.get, key)
+    if audio is not None:
+        return audio
+
+    audio = await _request_speech(text, model_id)
+    await asyncio.to_thread(cache.put, key, audio)
+    return audio
+
+def split_segments(text: str) -> list[str]:
+    """합성 단위로 나눕니다. 문장 경계로 자르고, 너무 짧은 문장은 다음 문장과 합칩니다."""
+    sentences, rest = split_sentences(text)
+    if rest.strip():
+        sentences.append(rest.strip())
+    segments, pending = [], ""
+    for sentence in sentences:
+        pending = f"{pending} {sentence}".strip()
+        if len(pending) >= TTS_MIN_SEGMENT_LENGTH:
+            segments.append(pending)
+            pending = ""
+    if pending:
+        if segments:
+            segments[-1] = f"{segments[-1]} {pending}"
+        else:
+            segments.append(pending)
+    return segments
+
+async def synthesize_segments(text: str, concurrency: int = TTS_PIPELINE_CONCURRENCY):
+    """문장 단위로 동시에 합성하고, 앞 문장부터 순서대로 mp3 조각을 넘겨줍니다.
+
+    첫 음성이 나오는 시간은 전체 응답이 아니라 첫 문장의 합성 시간에 좌우됩니다.
+    전체 문장이 캐시에 있으면(고정 문구) 그대로 한 번에 넘겨줍니다.
+    """
+    model_id = os.getenv(ELEVENLABS_MODEL_ID_KEY, DEFAULT_TTS_MODEL)
+    cached = await asyncio.to_thread(get_tts_cache().get, tts_cache_key(text, VOICE_ID, model_id, VOICE_SETTINGS))
+    segments = split_segments(text)
+    if cached is not None or len(segments) <= 1:
+        yield cached if cached is not None else await synthesize_speech(text)
+        return
+
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def synthesize(segment: str) -> bytes:
+        async with semaphore:
+            return await synthesize_speech(segment)
+
+    tasks = [asyncio.create_task(synthesize(segment)) for segment in segments]
+    try:
+        for task in tasks:
+            yield await task
+    finally:
+        for task in tasks:
+            task.cancel()
+
+async def synthesize_pipelined(text: str) -> bytes:
+    """synthesize_segments 결과를 하나의 mp3로 이어 붙입니다. (Celery tts_task 등 전체 파일이 필요한 경우)"""
+    return b"".join([segment async for segment in synthesize_segments(text)])
+
+async def presynthesize(texts) -> int:
+    """고정 문구를 미리 합성해 캐시에 채워 둡니다. 새로 합성한 개수를 반환합니다."""
+    created = 0
+    model_id = os.getenv(ELEVENLABS_MODEL_ID_KEY, DEFAULT_TTS_MODEL)
+    for text in texts:
+        key = tts_cache_key(text, VOICE_ID, model_id, VOICE_SETTINGS)
+        if await asyncio.to_thread(get_tts_cache().get, key) is not None:
+            continue
+        await synthesize_speech(text)
+        created += 1
+    return created
+
+def _build_request(text: str, model_id: str, stream: bool = False):
+    """ElevenLabs 요청 (url, headers, payload)"""
     api_key = os.getenv("ELEVENLABS_API_KEY")
     if not api_key:
         logger.error(".env 파일에 ELEVENLABS_API_KEY가 설정되지 않았습니다.")
         raise HTTPException(status_code=500, detail="서버 설정 오류: ElevenLabs API 키가 없습니다.")
     
-    logger.info(f"TTS 요청 수신: 텍스트 길이 {len(text)}, VOICE_ID: {VOICE_ID}")
+    logger.info(f"TTS 요청 수신: 텍스트 길이 {len(text)}, VOICE_ID: {VOICE_ID}, stream: {stream}")
 
     headers = {
         "xi-api-key": api_key,
@@ -51,26 +159,15 @@ async def synthesize_speech(text: str) -> bytes:
 
     payload = {
         "text": text,
-        "model_id": os.getenv(ELEVENLABS_MODEL_ID_KEY, DEFAULT_TTS_MODEL), 
-        "voice_settings": {
-            "stability": 0.7,
-            "similarity_boost": 0.7,
-            "style": 0.3,
-            "use_speaker_boost": True,
-            "speed": 0.88
-        }
+        "model_id": model_id,
+        "voice_settings": VOICE_SETTINGS
     }
 
-    url = f"https://api.elevenlabs.io/v1/text-to-speech/{VOICE_ID}"
-
-    try:
-        async with httpx.AsyncClient(timeout=60.0) as client:
-            res = await client.post(url, headers=headers, json=payload)
-            res.raise_for_status()
-        
-        return res.content
+    url = f"{ELEVENLABS_BASE_URL}/v1/text-to-speech/{VOICE_ID}" + ("/stream" if stream else "")
+    return url, headers, payload
 
-    except httpx.HTTPStatusError as e:
+def _api_error(e: httpx.HTTPError) -> HTTPException:
+    if isinstance(e, httpx.HTTPStatusError):
         status_code = e.response.status_code
         error_message = "알 수 없는 ElevenLabs API 오류"
         try:
@@ -79,22 +176,66 @@ async def synthesize_speech(text: str) -> bytes:
         except json.JSONDecodeError:
             error_message = e.response.text
         logger.error(f"🚫 ElevenLabs API 응답 오류 ({status_code}): {error_message}")
-        raise HTTPException(status_code=502, detail=f"ElevenLabs API 오류: {error_message}")
+        return HTTPException(status_code=502, detail=f"ElevenLabs API 오류: {error_message}")
+
+    logger.error(f"🌐 ElevenLabs TTS 서버 연결 실패: {e}")
+    return HTTPException(status_code=504, detail=f"TTS 서버 연결 실패: {str(e)}")
+
+async def _request_speech(text: str, model_id: str) -> bytes:
+    """ElevenLabs API 호출 (전체 mp3)"""
+    url, headers, payload = _build_request(text, model_id)
+    try:
+        # 공용 커넥션 풀을 재사용해 호출마다 TLS 연결을 새로 맺지 않습니다.
+        res = await get_async_http_client().post(url, headers=headers, json=payload, timeout=60.0)
+        res.raise_for_status()
+        
+        return res.content
+
+    except httpx.HTTPError as e:
+        raise _api_error(e)
 
-    except httpx.RequestError as e:
-        logger.error(f"🌐 ElevenLabs TTS 서버 연결 실패: {e}")
-        raise HTTPException(status_code=504, detail=f"TTS 서버 연결 실패: {str(e)}")
+async def stream_speech(text: str):
+    """텍스트를 음성으로 변환하며 mp3 조각을 받는 대로 넘겨줍니다. 다 받으면 캐시에 저장합니다."""
+    model_id = os.getenv(ELEVENLABS_MODEL_ID_KEY, DEFAULT_TTS_MODEL)
+    key = tts_cache_key(text, VOICE_ID, model_id, VOICE_SETTINGS)
+    cache = get_tts_cache()
+    audio = cache.get_memory(key)
+    if audio is None:
+        audio = await asyncio.to_thread(cache.get, key)
+    if audio is not None:
+        yield audio
+        return
+
+    url, headers, payload = _build_request(text, model_id, stream=True)
+    chunks = []
+    try:
+        async with get_async_http_client().stream("POST", url, headers=headers, json=payload, timeout=60.0) as res:
+            if res.is_error:
+                await res.aread()
+            res.raise_for_status()
+            async for chunk in res.aiter_bytes():
+                chunks.append(chunk)
+                yield chunk
+    except httpx.HTTPError as e:
+        raise _api_error(e)
+    await asyncio.to_thread(cache.put, key, b"".join(chunks))
 
 @router.post("/tts")
 async def generate_tts(data: TTSRequest):
-    """FastAPI 엔드포인트: 텍스트를 음성으로 변환"""
+    """FastAPI 엔드포인트: 텍스트를 음성으로 변환 (문장별로 합성되는 대로 순서대로 전송)"""
     try:
-        audio_content = await synthesize_speech(data.text)
-        logger.info("ElevenLabs TTS API 호출 성공")
-        logger.info(f"🎧 응답 오디오 크기: {len(audio_content)} bytes")
+        segments = synthesize_segments(data.text)
+        # 첫 문장이 합성된 뒤 응답을 시작해야 API 오류를 상태 코드로 돌려줄 수 있습니다.
+        first = await anext(segments)
+        logger.info(f"🎧 첫 음성 조각 크기: {len(first)} bytes")
+
+        async def body():
+            yield first
+            async for segment in segments:
+                yield segment
 
-        return Response(
-            content=audio_content,
+        return StreamingResponse(
+            body(),
             media_type="audio/mpeg",
             headers={"Content-Disposition": "inline; filename=output.mp3"}
         )
@@ -102,4 +243,25 @@ async def generate_tts(data: TTSRequest):
         if isinstance(e, HTTPException):
             raise e
         logger.critical(f"🔥 예상치 못한 서버 오류 발생: {e}", exc_info=True)
-        raise HTTPException(status_code=500, detail=f"예상치 못한 서버 오류가 발생했습니다: {e}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"예상치 못한 서버 오류가 발생했습니다: {e}")
+
+@router.post("/tts/stream")
+async def stream_tts(data: TTSRequest):
+    """FastAPI 엔드포인트: 음성을 합성되는 대로 chunked 응답으로 전송 (첫 조각부터 재생 가능)"""
+    chunks = stream_speech(data.text)
+    # 첫 조각을 받은 뒤 응답을 시작해야 API 오류를 상태 코드로 돌려줄 수 있습니다.
+    try:
+        first = await anext(chunks)
+    except StopAsyncIteration:
+        raise HTTPException(status_code=502, detail="ElevenLabs API 오류: 음성 데이터가 없습니다.")
+
+    async def body():
+        yield first
+        async for chunk in chunks:
+            yield chunk
+
+    return StreamingResponse(
+        body(),
+        media_type="audio/mpeg",
+        headers={"Content-Disposition": "inline; filename=output.mp3"}
+    )
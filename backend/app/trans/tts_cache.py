@@ -0,0 +1,134 @@
+# app/trans/tts_cache.py
+"""
+TTS 음성 캐시 (내용 주소 기반)
+
+키: sha256(텍스트 + 보이스 ID + 모델 ID + 보이스 설정) → 같은 조건의 같은 문장은 한 번만 합성합니다.
+- 메모리: 최근 사용한 TTS_CACHE_MEMORY_ITEMS개 (LRU)
+- 디스크: TTS_CACHE_DIR/{key}.mp3, 전체 크기가 TTS_CACHE_MAX_BYTES를 넘으면 오래 안 쓴 파일부터 삭제
+  (읽을 때 mtime을 갱신해 LRU 순서로 사용)
+"""
+import hashlib
+import json
+import logging
+import os
+import threading
+import uuid
+
+from prometheus_client import Counter
+
+from app.cache import LRUCache
+
+logger = logging.getLogger(__name__)
+
+TTS_CACHE_DIR = os.getenv("TTS_CACHE_DIR", "data/tts_cache")
+TTS_CACHE_MEMORY_ITEMS = int(os.getenv("TTS_CACHE_MEMORY_ITEMS", "256"))
+TTS_CACHE_MAX_BYTES = int(os.getenv("TTS_CACHE_MAX_BYTES", str(200 * 1024 * 1024)))
+
+TTS_CACHE_LOOKUPS = Counter("tts_cache_lookups_total", "TTS 캐시 조회 결과", ["tier"])
+
+
+def tts_cache_key(text: str, voice_id: str, model_id: str, voice_settings: dict) -> str:
+    raw = json.dumps([text, voice_id, model_id, voice_settings], ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class TTSCache:
+    def __init__(self, directory: str = TTS_CACHE_DIR, max_bytes: int = TTS_CACHE_MAX_BYTES,
+                 memory_items: int = TTS_CACHE_MEMORY_ITEMS):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.memory = LRUCache(maxsize=memory_items)
+        self._disk_bytes = None
+        self._lock = threading.Lock()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.mp3")
+
+    def get_memory(self, key: str):
+        audio = self.memory.get(key)
+        if audio is not None:
+            TTS_CACHE_LOOKUPS.labels("memory").inc()
+        return audio
+
+    def get(self, key: str):
+        """메모리 → 디스크 순으로 찾습니다. 디스크에서 찾으면 메모리에도 올립니다. (디스크 I/O 포함)"""
+        audio = self.get_memory(key)
+        if audio is not None:
+            return audio
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                audio = f.read()
+            os.utime(path)
+        except OSError:
+            TTS_CACHE_LOOKUPS.labels("miss").inc()
+            return None
+        TTS_CACHE_LOOKUPS.labels("disk").inc()
+        self.memory.set(key, audio)
+        return audio
+
+    def put(self, key: str, audio: bytes):
+        self.memory.set(key, audio)
+        if self.max_bytes <= 0:
+            return
+        path = self._path(key)
+        with self._lock:
+            self._ensure_size_loaded()
+            previous = os.path.getsize(path) if os.path.exists(path) else 0
+            os.makedirs(self.directory, exist_ok=True)
+            tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(audio)
+            os.replace(tmp_path, path)
+            self._disk_bytes += len(audio) - previous
+            if self._disk_bytes > self.max_bytes:
+                self._evict()
+
+    def _ensure_size_loaded(self):
+        if self._disk_bytes is None:
+            self._disk_bytes = sum(size for _, _, size in self._entries())
+
+    def _entries(self):
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            return []
+        entries = []
+        for name in names:
+            if not name.endswith(".mp3"):
+                continue
+            try:
+                stat = os.stat(os.path.join(self.directory, name))
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, name, stat.st_size))
+        return entries
+
+    def _evict(self):
+        """상한의 90%까지 오래 안 쓴 파일부터 지웁니다."""
+        entries = sorted(self._entries())
+        total = sum(size for _, _, size in entries)
+        target = self.max_bytes * 0.9
+        for _, name, size in entries:
+            if total <= target:
+                break
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except OSError:
+                continue
+            total -= size
+        self._disk_bytes = total
+        logger.info(f"TTS 디스크 캐시 정리 - {total} bytes")
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_tts_cache() -> TTSCache:
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = TTSCache()
+    return _cache
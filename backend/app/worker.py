@@ -4,15 +4,19 @@ from dotenv import load_dotenv
 from prometheus_fastapi_instrumentator import Instrumentator
 import tempfile
 import asyncio
-import base64
-from fastapi import UploadFile
-from io import BytesIO
+import threading
+from celery.signals import worker_init, worker_process_init
 
+from app.blobstore import get_blob_store, put_blob
 from app.celery import celery_app
+from app.chat.task_events import publish_event
 from app.database import session_scope
-from app.chat.service import chat_with_ai
-from app.trans.stt import transcribe_audio
-from app.trans.tts import synthesize_speech
+from app.chat.service import chat_with_ai, evaluate_and_save_chat_result
+from app.trans.stt import transcribe_bytes
+from app.trans.tts import presynthesize, synthesize_pipelined
+from app.chat.state import FIXED_MESSAGES
+from app.clients import get_async_http_client, get_chroma_client, get_openai_client, get_vectordb
+from app.llm_router import get_router
 
 load_dotenv()
 
@@ -24,24 +28,84 @@ async def health_check():
 
 Instrumentator().instrument(app).expose(app)
 
-@celery_app.task(name="stt_task", bind=True)
-def stt_task(self, audio_content: bytes, original_filename: str):
-    """STT를 수행하고 텍스트를 반환합니다."""
-    # Celery 태스크는 비동기 컨텍스트에서 직접 UploadFile을 다룰 수 없으므로,
-    # 파일 내용을 바이트로 받아 처리하는 것이 더 안정적입니다.
-    file_like_object = BytesIO(audio_content)
-    fake_upload_file = UploadFile(filename=original_filename, file=file_like_object)
+# 워커 프로세스마다 하나의 상주 이벤트 루프 (태스크마다 asyncio.run으로 루프를 만들고 닫지 않음)
+_loop = None
+_loop_lock = threading.Lock()
+
+def get_worker_loop() -> asyncio.AbstractEventLoop:
+    """백그라운드 스레드에서 계속 도는 프로세스 전용 이벤트 루프"""
+    global _loop
+    if _loop is None:
+        with _loop_lock:
+            if _loop is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name="worker-loop", daemon=True).start()
+                _loop = loop
+    return _loop
+
+def run_async(coro, timeout: float = None):
+    """코루틴을 상주 루프에서 실행하고 결과를 기다립니다. (여러 스레드 태스크가 동시에 호출 가능)"""
+    return asyncio.run_coroutine_threadsafe(coro, get_worker_loop()).result(timeout)
+
+async def _warm_async_clients():
+    get_async_http_client()
+    # 고정 문구 음성은 캐시에 없을 때만 합성합니다. (디스크 캐시를 공유하면 바로 끝남)
+    try:
+        await presynthesize(FIXED_MESSAGES)
+    except Exception as e:
+        print(f"Fixed message TTS pre-synthesis failed: {e}")
+
+def warm_up_clients():
+    """외부 API 클라이언트(OpenAI, ElevenLabs, Gemini, Chroma)를 미리 만들어 둡니다."""
+    try:
+        get_openai_client()
+        # 사전 합성은 기다리지 않고 상주 루프에서 진행합니다.
+        asyncio.run_coroutine_threadsafe(_warm_async_clients(), get_worker_loop())
+        router = get_router()
+        # chat_with_ai가 사용하는 것과 같은 설정으로 만들어 둬야 캐시를 그대로 재사용합니다.
+        for model in router.models_for("chat"):
+            router.chat_model("chat", model, temperature=0.5)
+        get_chroma_client()
+        get_vectordb()
+        print("Worker clients warmed up")
+    except Exception as e:
+        # 미리 만들지 못해도 첫 태스크에서 다시 만들기 때문에 워커는 계속 띄웁니다.
+        print(f"Worker client warm-up failed: {e}")
 
+@worker_process_init.connect
+def init_worker_process(**kwargs):
+    """(prefork) 자식 프로세스가 만들어질 때 루프와 클라이언트를 준비합니다."""
+    get_worker_loop()
+    warm_up_clients()
+
+@worker_init.connect
+def init_worker(sender=None, **kwargs):
+    """(threads/solo 풀) 워커 프로세스 하나가 태스크를 모두 처리하므로 여기서 준비합니다."""
+    if celery_app.conf.worker_pool != "prefork":
+        get_worker_loop()
+        warm_up_clients()
+
+@celery_app.task(name="stt_task", bind=True)
+def stt_task(self, audio_key: str, original_filename: str, job_id: str = None):
+    """저장소에 올라간 음성(audio_key)으로 STT를 수행하고 텍스트를 반환합니다."""
     try:
-        text = asyncio.run(transcribe_audio(fake_upload_file))
+        store = get_blob_store()
+        audio_content = store.get(audio_key)
+        if audio_content is None:
+            raise FileNotFoundError(f"음성 파일이 만료되었거나 없습니다: {audio_key}")
+        text = transcribe_bytes(audio_content, original_filename)
+        # 업로드 음성은 전사 후에는 필요 없으므로 바로 지웁니다.
+        store.delete(audio_key)
         print(f"STT Result: {text}")
+        publish_event(job_id, "stt_done", transcript=text)
         return text
     except Exception as e:
+        publish_event(job_id, "failed", stage="stt", message=str(e))
         self.update_state(state='FAILURE', meta={'exc_type': type(e).__name__, 'exc_message': str(e)})
         raise e
 
 @celery_app.task(name="ai_chat_task", bind=True)
-def ai_chat_task(self, text: str, report_id: int, chat_id: int):
+def ai_chat_task(self, text: str, report_id: int, chat_id: int, job_id: str = None):
     """AI 채팅을 수행하고 응답 텍스트를 반환합니다."""
     try:
         with session_scope() as db:
@@ -52,22 +116,39 @@ def ai_chat_task(self, text: str, report_id: int, chat_id: int):
                 db=db
             )
         print(f"AI Response: {ai_response}")
+        publish_event(job_id, "ai_done", response=ai_response)
         return ai_response
+    except Exception as e:
+        publish_event(job_id, "failed", stage="ai_chat", message=str(e))
+        self.update_state(state='FAILURE', meta={'exc_type': type(e).__name__, 'exc_message': str(e)})
+        raise e
+
+@celery_app.task(name="evaluate_chat_task", bind=True)
+def evaluate_chat_task(self, chat_id: int, report_id: int):
+    """대화 평가(소견/위험도)를 수행하고 저장합니다. 같은 대화는 캐시된 결과를 반환합니다."""
+    try:
+        with session_scope() as db:
+            chat_result, chat_risk = evaluate_and_save_chat_result(db, chat_id, report_id)
+        print(f"Evaluation Result: chat_id={chat_id}, risk={chat_risk.value}")
+        return {"chat_result": chat_result, "chat_risk": chat_risk.value}
     except Exception as e:
         self.update_state(state='FAILURE', meta={'exc_type': type(e).__name__, 'exc_message': str(e)})
         raise e
 
 @celery_app.task(name="tts_task", bind=True)
-def tts_task(self, text: str):
-    """TTS를 수행하고 최종 오디오 데이터를 반환합니다."""
+def tts_task(self, text: str, job_id: str = None):
+    """TTS를 수행하고 음성은 저장소에 올린 뒤 참조 키를 반환합니다."""
     try:
-        audio_content = asyncio.run(synthesize_speech(text))
-        print(f"TTS Result: Audio content generated ({len(audio_content)} bytes)")
+        audio_content = run_async(synthesize_pipelined(text))
+        audio_key = put_blob("voice-out", audio_content, ".mp3")
+        print(f"TTS Result: Audio content generated ({len(audio_content)} bytes) -> {audio_key}")
+        publish_event(job_id, "done", response=text, audio_key=audio_key)
         return {
             "status": "SUCCESS",
             "ai_response_text": text,
-            "audio_content_base64": base64.b64encode(audio_content).decode('utf-8')
+            "audio_key": audio_key,
         }
     except Exception as e:
+        publish_event(job_id, "failed", stage="tts", message=str(e))
         self.update_state(state='FAILURE', meta={'exc_type': type(e).__name__, 'exc_message': str(e)})
         raise e 
\ No newline at end of file
@@ -4,6 +4,8 @@ from fastapi.staticfiles import StaticFiles
 from fastapi.responses import JSONResponse
 import logging
 import traceback
+import os
+import asyncio
 from contextlib import asynccontextmanager
 from dotenv import load_dotenv
 from prometheus_fastapi_instrumentator import Instrumentator
@@ -16,11 +18,16 @@ from app.auth import models
 from app.auth import api as auth_api
 from app.report import api as report_api
 from app.trans import stt as stt_api
+from app.trans import stt_stream as stt_stream_api
 from app.ad8 import api as ad8_api
 from app.chat import api as chat_api
 from app.drawing import api as drawing_api
 from app.trans import tts as tts_api
 from app.mypage import api as mypage_api
+from app.chat.log_writer import flush_pending_async
+from app.clients import get_query_embeddings
+from app.chat.state import FIXED_MESSAGES
+from app.drawing.reference_images import get_reference_block
 from sqlalchemy.exc import OperationalError
 from tenacity import retry, stop_after_attempt, wait_fixed
 
@@ -41,11 +48,46 @@ def create_tables():
     database.create_tables()
     print("DB 테이블 생성 완료.")
 
+def prewarm_query_embeddings():
+    try:
+        count = get_query_embeddings().prewarm()
+        print(f"질의 임베딩 캐시 사전 적재 완료: {count}건")
+    except Exception as e:
+        print(f"질의 임베딩 캐시 사전 적재 실패: {e}")
+
+def load_drawing_reference_block():
+    try:
+        block = get_reference_block()
+        print(f"시계 예시 이미지 블록 준비 완료: {len(block) // 2}장")
+    except Exception as e:
+        print(f"시계 예시 이미지 블록 준비 실패: {e}")
+
+async def presynthesize_fixed_messages():
+    try:
+        count = await tts_api.presynthesize(FIXED_MESSAGES)
+        print(f"고정 문구 음성 사전 합성 완료: {count}건 새로 합성")
+    except Exception as e:
+        print(f"고정 문구 음성 사전 합성 실패: {e}")
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     connect_to_db()
     create_tables()
+    if os.getenv("EMBEDDING_PREWARM", "1") == "1":
+        # 자주 나오는 발화 임베딩은 서버 기동을 막지 않도록 백그라운드에서 채웁니다.
+        asyncio.get_running_loop().run_in_executor(None, prewarm_query_embeddings)
+    asyncio.get_running_loop().run_in_executor(None, load_drawing_reference_block)
+    presynth_task = None
+    if os.getenv("TTS_PRESYNTH", "1") == "1":
+        # 고정 문구(첫 인사/첫 질문/종료 안내) 음성을 캐시에 미리 채웁니다. (기동을 막지 않음)
+        presynth_task = asyncio.create_task(presynthesize_fixed_messages())
     yield
+    # 사전 합성이 아직 진행 중이면 취소합니다.
+    if presynth_task and not presynth_task.done():
+        presynth_task.cancel()
+        await asyncio.gather(presynth_task, return_exceptions=True)
+    # 종료 시 아직 저장되지 않은 chat_log 배치를 flush 합니다.
+    await flush_pending_async()
 
 app = FastAPI(
     docs_url="/docs",
@@ -80,6 +122,7 @@ async def global_exception_handler(request: Request, exc: Exception):
 app.include_router(auth_api.router, prefix="/user", tags=["User"])
 app.include_router(report_api.router)
 app.include_router(stt_api.router,tags=["STT"])
+app.include_router(stt_stream_api.router, tags=["STT"])
 app.include_router(tts_api.router, tags=["TTS"])
 app.include_router(drawing_api.router, prefix="/drawing", tags=["Drawing"])
 app.include_router(ad8_api.router, prefix="/ad8", tags=["AD8"])
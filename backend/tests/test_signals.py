@@ -0,0 +1,89 @@
+from datetime import datetime
+
+from app.chat.signals import extract_numbers, extract_signals
+
+# 2025-08-06은 수요일
+TODAY = datetime(2025, 8, 6)
+SEVENS_QUESTION = [("ai", "100에서 7을 빼면 얼마일까요?")]
+SEVENS_FOLLOWUP = [("ai", "100에서 7을 빼면 93이죠. 그럼 93에서 7을 빼면 얼마일까요?")]
+WEEKDAY_QUESTION = [("ai", "오늘은 무슨 요일인지 말씀해주시겠어요?")]
+
+
+def test_extract_numbers_sino_korean():
+    assert extract_numbers("구십삼이요") == [93]
+    assert extract_numbers("백에서 칠을 빼면 구십삼") == [100, 93]
+    assert extract_numbers("백이요") == [100]
+
+
+def test_extract_numbers_native_korean():
+    assert extract_numbers("아흔셋") == [93]
+    assert extract_numbers("여든여섯이요") == [86]
+    assert extract_numbers("여든 여섯") == [86]
+    assert extract_numbers("일흔아홉이에요") == [79]
+
+
+def test_extract_numbers_ignores_words_containing_number_syllables():
+    assert extract_numbers("백화점 갔어요") == []
+    assert extract_numbers("오십견이 있어요") == []
+    assert extract_numbers("열심히 했어요") == []
+    assert extract_numbers("네 맞아요") == []
+
+
+def test_serial_sevens_correct_answers():
+    assert extract_signals("93이요", SEVENS_QUESTION, TODAY) == []
+    assert extract_signals("구십삼이요", SEVENS_QUESTION, TODAY) == []
+    assert extract_signals("아흔셋", SEVENS_QUESTION, TODAY) == []
+    assert extract_signals("93, 86, 79", SEVENS_QUESTION, TODAY) == []
+
+
+def test_serial_sevens_uses_last_number_in_question():
+    assert extract_signals("86이요", SEVENS_FOLLOWUP, TODAY) == []
+    assert extract_signals("여든여섯", SEVENS_FOLLOWUP, TODAY) == []
+    assert "serial_sevens_error" in extract_signals("93이요", SEVENS_FOLLOWUP, TODAY)
+
+
+def test_serial_sevens_wrong_answer():
+    assert "serial_sevens_error" in extract_signals("95요", SEVENS_QUESTION, TODAY)
+
+
+def test_calculation_off_topic_without_false_number():
+    tags = extract_signals("백화점 갔어요", SEVENS_QUESTION, TODAY)
+    assert "serial_sevens_error" not in tags
+    assert "off_topic" in tags
+
+
+def test_dont_know_is_not_off_topic():
+    assert extract_signals("잘 모르겠어요", SEVENS_QUESTION, TODAY) == ["dont_know"]
+
+
+def test_weekday_answers():
+    assert extract_signals("오늘은 수요일이에요", WEEKDAY_QUESTION, TODAY) == []
+    assert extract_signals("금요일인가요", WEEKDAY_QUESTION, TODAY) == ["wrong_weekday"]
+    assert extract_signals("밥 먹었어요", WEEKDAY_QUESTION, TODAY) == ["off_topic"]
+
+
+def test_repetition():
+    history = [("user", "수요일이에요"), ("ai", "어디에 살고 계신가요?")]
+    assert "repetition" in extract_signals("수요일이에요", history, TODAY)
+
+
+def test_everyday_questions_with_today_are_not_checked():
+    assert extract_signals("김치찌개 먹었어요", [("ai", "오늘 점심은 뭐 드셨어요?")], TODAY) == []
+    assert extract_signals("산책하면서 시작했어요", [("ai", "오늘 하루는 어떻게 시작하셨어요?")], TODAY) == []
+    assert extract_signals("좀 덥네요", [("ai", "오늘 날씨는 어떤가요?")], TODAY) == []
+
+
+def test_day_counts_are_not_dates():
+    assert extract_signals("3일 전이 일요일이었으니 수요일이에요", WEEKDAY_QUESTION, TODAY) == []
+    assert extract_signals("3일 전에 병원 갔어요", [("ai", "며칠 전에 뭐 하셨어요?")], TODAY) == []
+
+
+def test_date_answers():
+    question = [("ai", "오늘은 몇 월 며칠인가요?")]
+    assert extract_signals("8월 6일이요", question, TODAY) == []
+    assert extract_signals("8월 7일이요", question, TODAY) == ["wrong_date"]
+    assert extract_signals("밥 먹었어요", question, TODAY) == ["off_topic"]
+
+
+def test_hedging_is_not_dont_know():
+    assert extract_signals("글쎄요 집에 있어요", [("ai", "지금 어디에 계세요?")], TODAY) == []
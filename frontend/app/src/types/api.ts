@@ -122,8 +122,10 @@ export interface ChatResponse {
 }
 
 export interface EvaluateChatResponse {
-  chat_result: string;
-  chat_risk: RiskLevel;
+  status?: string;
+  task_id?: string;
+  chat_result?: string;
+  chat_risk?: RiskLevel;
   message: string;
 }
 
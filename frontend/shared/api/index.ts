@@ -176,14 +176,24 @@ export const streamChat = async (chatRequest: ChatRequest, onData: (data: any) =
 };
 
 
+// 채팅 평가 작업 상태 조회 간격/횟수 (최대 약 2분)
+const EVALUATE_POLL_INTERVAL_MS = 2000;
+const EVALUATE_POLL_MAX_ATTEMPTS = 60;
+
 // 채팅 평가 및 결과 저장 API
 export const evaluateChat = async (chatId: number, reportId: number) => {
-  const response = await axiosInstance.post<EvaluateChatResponse>(
-    `/chat/chats/${chatId}/evaluate`,
-    null, // 요청 본문은 비워둡니다.
-    { params: { report_id: reportId } } // report_id를 쿼리 매개변수로 전달합니다.
-  );
-  return response.data;
+  const url = `/chat/chats/${chatId}/evaluate`;
+  const params = { report_id: reportId }; // report_id를 쿼리 매개변수로 전달합니다.
+  // 평가는 백그라운드 작업으로 진행되므로, 작업을 시작한 뒤 끝날 때까지 상태를 조회합니다.
+  let { data } = await axiosInstance.post<EvaluateChatResponse>(url, null, { params });
+  for (let attempt = 0; data.status !== 'SUCCESS'; attempt++) {
+    if (data.status === 'FAILURE' || attempt >= EVALUATE_POLL_MAX_ATTEMPTS) {
+      throw new Error(data.message || '채팅 평가에 실패했습니다.');
+    }
+    await new Promise((resolve) => setTimeout(resolve, EVALUATE_POLL_INTERVAL_MS));
+    ({ data } = await axiosInstance.get<EvaluateChatResponse>(url, { params }));
+  }
+  return data;
 };
 
 /**